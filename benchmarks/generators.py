@@ -0,0 +1,84 @@
+# === Imports ===
+import csv
+import random
+from datetime import date, timedelta
+from types import SimpleNamespace
+from benchmarks.meta_graph_stub import make_campaign, make_adset, make_insight
+
+# === Size Parsing ===
+
+def parse_size(value):
+    # "10k", "2.5M" or a plain integer
+    value = str(value).strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+# === Shopify CSV Exports ===
+# Values follow each spec column's converter, including the thousands separators and
+# percent signs Shopify exports, so the converters' slower fallback paths are exercised too.
+
+def shopify_value(converter, csv_column, i, rng, first_day, days):
+    if csv_column == "Day":
+        return (first_day + timedelta(days=i % days)).isoformat()
+    name = converter.__name__
+    if name == "to_float":
+        amount = rng.uniform(0, 5000)
+        return f"{amount:,.2f}" if amount >= 1000 else f"{amount:.2f}"
+    if name == "to_int":
+        count = rng.randint(0, 5000)
+        return f"{count:,}"
+    if name == "to_ratio":
+        return f"{rng.uniform(0, 10):.2f}%"
+    return f"{csv_column} {i % 997}"
+
+def write_shopify_csv(spec, path, rows, days=28, seed=7):
+    rng = random.Random(seed)
+    first_day = date(2025, 2, 1)
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow([csv_column for csv_column, _, _ in spec["columns"]])
+        for i in range(rows):
+            writer.writerow([
+                shopify_value(converter, csv_column, i, rng, first_day, days)
+                for csv_column, _, converter in spec["columns"]
+            ])
+
+# === Meta Graph API Pages ===
+
+def meta_raw_account(account_id, rows):
+    # (account_id, campaigns, adsets, insights) as the fetchers return them
+    return (
+        account_id,
+        [make_campaign(account_id, i) for i in range(rows)],
+        [make_adset(account_id, i) for i in range(rows)],
+        [make_insight(account_id, i) for i in range(rows)]
+    )
+
+# === Google Ads Rows ===
+# Attribute-compatible stand-ins for GoogleAdsRow, yielded in search_stream-sized batches.
+
+def google_row(customer_id, i):
+    return SimpleNamespace(
+        campaign=SimpleNamespace(
+            id=i,
+            name=f"Campaign {i}",
+            status=SimpleNamespace(name="ENABLED"),
+            bidding_strategy_type=SimpleNamespace(name="MAXIMIZE_CONVERSIONS")
+        ),
+        customer=SimpleNamespace(id=customer_id),
+        campaign_budget=SimpleNamespace(amount_micros=5_000_000 + i % 1000 * 1000),
+        metrics=SimpleNamespace(
+            impressions=1000 + i % 500,
+            clicks=50 + i % 40,
+            ctr=0.05,
+            average_cpc=450_000,
+            cost_micros=22_500_000 + i % 100 * 10_000,
+            conversions=float(i % 7),
+            conversions_value=float(i % 7) * 40.0,
+            interaction_rate=0.05
+        )
+    )
+
+def google_row_batches(rows, customer_id=1234567890, batch_size=10_000):
+    for start in range(0, rows, batch_size):
+        yield [google_row(customer_id, i) for i in range(start, min(start + batch_size, rows))]
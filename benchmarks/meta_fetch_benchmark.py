@@ -0,0 +1,65 @@
+# === Imports ===
+import os
+import json
+import time
+import argparse
+from urllib.request import urlopen
+from urllib.parse import urlencode
+from benchmarks.meta_graph_stub import start_stub_server, GraphStubHandler
+
+# === Sequential Baseline ===
+# Mirrors fetch_meta_ads_data: one connection per call, one cursor page of page_limit rows at a time.
+
+def fetch_sequential(base_url, account_ids, start_date, end_date, page_limit):
+    results = []
+    for account_id in account_ids:
+        rows = {}
+        for edge, extra in (
+            ("campaigns", {}),
+            ("adsets", {}),
+            ("insights", {"time_range": json.dumps({"since": start_date, "until": end_date}), "level": "campaign"})
+        ):
+            url = f"{base_url}/{account_id}/{edge}?{urlencode({'limit': page_limit, **extra})}"
+            rows[edge] = []
+            while url:
+                with urlopen(url) as response:
+                    payload = json.load(response)
+                rows[edge].extend(payload.get("data", []))
+                url = payload.get("paging", {}).get("next")
+        results.append((account_id, rows["campaigns"], rows["adsets"], rows["insights"]))
+    return results
+
+# === Benchmark ===
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Meta Graph fetchers against a local stub server.")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=1000, help="campaigns/adsets/insights per account")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response latency in seconds")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.rows, args.latency)
+    os.environ["META_GRAPH_BASE_URL"] = base_url
+    # Measures the fetchers themselves, not the Graph API rate limit
+    os.environ.setdefault("META_RATE_PER_SECOND", "0")
+    from utils.meta_async_fetcher import fetch_raw_accounts, PAGE_LIMIT
+    from utils.meta_batch_fetcher import fetch_raw_accounts_batched
+
+    account_ids = [f"act_{100 + i}" for i in range(args.accounts)]
+    try:
+        for name, fetch in (
+            ("sequential", lambda: fetch_sequential(base_url, account_ids, "2025-02-22", "2025-02-28", PAGE_LIMIT)),
+            ("async", lambda: fetch_raw_accounts(account_ids, "2025-02-22", "2025-02-28", access_token="stub")),
+            ("batch", lambda: fetch_raw_accounts_batched(account_ids, "2025-02-22", "2025-02-28", access_token="stub"))
+        ):
+            GraphStubHandler.calls = 0
+            started = time.perf_counter()
+            results = fetch()
+            elapsed = time.perf_counter() - started
+            rows = sum(len(r[1]) + len(r[2]) + len(r[3]) for r in results)
+            print(f"{name:>10}: {elapsed:7.2f}s  {GraphStubHandler.calls:5d} calls  {rows / elapsed:10.0f} rows/s")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# === Imports ===
+import json
+import time
+import threading
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+# === Synthetic Graph API Data ===
+
+# Every campaign and adset was last changed at UPDATED_TIME, so updated_time filters later
+# than that return nothing (as a delta refresh with no changes would)
+UPDATED_TIME = "2025-01-01T00:00:00+0000"
+UPDATED_EPOCH = 1735689600
+
+def make_campaign(account_id, i):
+    return {
+        "id": f"{account_id[4:]}{i:06d}", "name": f"Campaign {i}", "status": "ACTIVE",
+        "daily_budget": str(1000 + i), "updated_time": UPDATED_TIME
+    }
+
+def make_adset(account_id, i):
+    return {
+        "id": f"9{i:06d}", "campaign_id": f"{account_id[4:]}{i:06d}", "attribution_setting": "7d_click_1d_view",
+        "updated_time": UPDATED_TIME
+    }
+
+def filtered_out(query):
+    # Only the updated_time GREATER_THAN filter used by delta refreshes is understood
+    for rule in json.loads(query.get("filtering", "[]")):
+        if rule["field"] == "updated_time" and rule["operator"] == "GREATER_THAN" and int(rule["value"]) >= UPDATED_EPOCH:
+            return True
+    return False
+
+def make_insight(account_id, i):
+    return {
+        "campaign_id": f"{account_id[4:]}{i:06d}",
+        "spend": f"{10 + i % 90}.25",
+        "reach": str(1000 + i),
+        "impressions": str(5000 + i),
+        "clicks": str(100 + i % 50),
+        "ctr": "2.1",
+        "cpc": "0.45",
+        "cpm": "7.8",
+        "purchase_roas": [{"action_type": "omni_purchase", "value": "3.2"}],
+        "actions": [
+            {"action_type": "link_click", "value": str(80 + i % 40)},
+            {"action_type": "purchase", "value": str(i % 7)}
+        ]
+    }
+
+def make_report_row(account_id, i, query):
+    # One row per entity and day (time_increment=1) at the requested level and breakdowns
+    time_range = json.loads(query["time_range"])
+    since, until = date.fromisoformat(time_range["since"]), date.fromisoformat(time_range["until"])
+    days = (until - since).days + 1 if query.get("time_increment") == "1" else 1
+    entity = i // days
+    row = make_insight(account_id, entity)
+    row["campaign_name"] = f"Campaign {entity}"
+    row["date_start"] = (since + timedelta(days=i % days)).isoformat()
+    row["date_stop"] = row["date_start"] if days > 1 else until.isoformat()
+    if query.get("level") in ("adset", "ad"):
+        row.update(adset_id=f"9{entity:06d}", adset_name=f"Adset {entity}")
+    if query.get("level") == "ad":
+        row.update(ad_id=f"8{entity:06d}", ad_name=f"Ad {entity}")
+    for name in filter(None, query.get("breakdowns", "").split(",")):
+        row[name] = f"{name}_{entity % 3}"
+    return row
+
+BUILDERS = {"campaigns": make_campaign, "adsets": make_adset, "insights": make_insight}
+
+# === Stub Server ===
+
+class GraphStubHandler(BaseHTTPRequestHandler):
+    rows_per_account = 1000
+    latency = 0.05
+    calls = 0
+    lock = threading.Lock()
+    # Async report runs: report_run_id -> account, query and status polls so far
+    reports = {}
+    report_polls = 2
+
+    def do_GET(self):
+        self.count_call()
+        self.send_json(*self.build_response(self.path))
+
+    def do_POST(self):
+        # Graph API batch endpoint: form field "batch" holds the sub-requests;
+        # any other POST to /act_<id>/insights starts an async report run
+        self.count_call()
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8"))
+        if "batch" not in form:
+            self.send_json(*self.start_report_run(urlparse(self.path)))
+            return
+        prefix = urlparse(f"http://{self.headers['Host']}{self.path}").path.rstrip("/")
+        results = []
+        for request in json.loads(form["batch"][0]):
+            status, payload = self.build_response(f"{prefix}/{request['relative_url']}")
+            results.append({"code": status, "headers": [], "body": json.dumps(payload)})
+        self.send_json(200, results)
+
+    def count_call(self):
+        with GraphStubHandler.lock:
+            GraphStubHandler.calls += 1
+        time.sleep(self.latency)
+
+    def start_report_run(self, url):
+        parts = url.path.strip("/").split("/")
+        if parts[-1] != "insights":
+            return 404, {"error": {"code": 100, "message": f"Cannot POST to {url.path}"}}
+        with GraphStubHandler.lock:
+            report_run_id = str(len(GraphStubHandler.reports) + 1)
+            GraphStubHandler.reports[report_run_id] = {
+                "account_id": parts[-2],
+                "query": {k: v[0] for k, v in parse_qs(url.query).items()},
+                "polls": 0
+            }
+        return 200, {"report_run_id": report_run_id}
+
+    def report_status(self, report_run_id):
+        with GraphStubHandler.lock:
+            run = GraphStubHandler.reports[report_run_id]
+            run["polls"] += 1
+            done = run["polls"] > self.report_polls
+        return 200, {
+            "id": report_run_id,
+            "async_status": "Job Completed" if done else "Job Running",
+            "async_percent_completion": 100 if done else 50
+        }
+
+    def build_response(self, path):
+        url = urlparse(path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/")
+        account_id, edge = parts[-2], parts[-1]
+        if edge in self.reports:
+            return self.report_status(edge)
+        if account_id in self.reports and edge == "insights":
+            run = self.reports[account_id]
+            builder = lambda _, i: make_report_row(run["account_id"], i, run["query"])
+        elif edge in BUILDERS:
+            builder = BUILDERS[edge]
+        else:
+            return 404, {"error": {"code": 100, "message": f"Unknown edge {edge}"}}
+
+        limit = int(query.get("limit", 25))
+        offset = int(query.get("after", 0))
+        total = 0 if filtered_out(query) else self.rows_per_account
+        end = min(offset + limit, total)
+        payload = {"data": [builder(account_id, i) for i in range(offset, end)]}
+        if end < total:
+            query["after"] = end
+            payload["paging"] = {
+                "cursors": {"after": str(end)},
+                "next": f"http://{self.headers['Host']}{url.path}?{urlencode(query)}"
+            }
+        return 200, payload
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Ad-Account-Usage", json.dumps({"acc_id_util_pct": 5, "reset_time_duration": 0}))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(rows_per_account=1000, latency=0.05, port=0):
+    # Returns (server, base_url); base_url stands in for META_GRAPH_BASE_URL
+    GraphStubHandler.rows_per_account = rows_per_account
+    GraphStubHandler.latency = latency
+    GraphStubHandler.calls = 0
+    GraphStubHandler.reports = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), GraphStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v22.0"
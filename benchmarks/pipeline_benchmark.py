@@ -0,0 +1,221 @@
+# === Imports ===
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from contextlib import contextmanager
+from benchmarks import sqlite_sink
+from utils.metrics import peak_rss_mb
+from benchmarks.generators import parse_size, write_shopify_csv, meta_raw_account, google_row_batches
+
+# === Stage Timing ===
+# Stages nest: time spent inside an inner stage or a timed() generator is charged to that
+# stage only, so streaming pipelines (generate -> transform -> load) split cleanly.
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+        self.children = []
+
+    def add(self, name, seconds, rows):
+        stage = self.stages.setdefault(name, {"rows": 0, "seconds": 0.0})
+        stage["rows"] += rows
+        stage["seconds"] += seconds
+        stage["peak_rss_mb"] = peak_rss_mb()
+
+    def measure(self, func):
+        self.children.append(0.0)
+        started = time.perf_counter()
+        try:
+            result = func()
+        finally:
+            elapsed = time.perf_counter() - started
+            child = self.children.pop()
+            if self.children:
+                self.children[-1] += elapsed
+        return result, elapsed - child
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        # Yields a dict whose "rows" may be filled in once the stage knows its count
+        counter = {"rows": rows}
+        self.children.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield counter
+        finally:
+            elapsed = time.perf_counter() - started
+            child = self.children.pop()
+            if self.children:
+                self.children[-1] += elapsed
+            self.add(name, elapsed - child, counter["rows"] or 0)
+
+    def timed(self, iterable, name, count=len):
+        iterator = iter(iterable)
+        while True:
+            try:
+                item, seconds = self.measure(lambda: next(iterator))
+            except StopIteration:
+                return
+            self.add(name, seconds, count(item))
+            yield item
+
+# === Benchmarks ===
+
+def bench_shopify(timer, rows, workdir, concurrent=False):
+    # concurrent loads every table at once, as the orchestrator's Shopify tasks do
+    from scripts import shopify_etl_pipeline as shopify
+
+    for spec in shopify.TABLE_SPECS:
+        table = spec["table"]
+        path = os.path.join(workdir, spec["file_name"])
+        with timer.stage(f"shopify.generate.{table}", rows):
+            write_shopify_csv(spec, path, rows)
+        sqlite_sink.create_table(table, [db_column for _, db_column, _ in spec["columns"]])
+
+        with timer.stage(f"shopify.parse.{table}") as counter:
+            counter["rows"] = sum(1 for _ in shopify.read_spec_rows(spec, path))
+        if concurrent:
+            continue
+        with timer.stage(f"shopify.load.{table}") as counter:
+            counter["rows"] = shopify.process_table(spec)
+        if counter["rows"] is None:
+            raise RuntimeError(f"Shopify {table} load failed; see the Shopify log")
+
+    if concurrent:
+        from concurrent.futures import ThreadPoolExecutor
+        specs = shopify.TABLE_SPECS
+        with timer.stage("shopify.load.concurrent") as counter:
+            with ThreadPoolExecutor(max_workers=len(specs)) as executor:
+                totals = list(executor.map(shopify.process_table, specs))
+            counter["rows"] = sum(total or 0 for total in totals)
+        failed = [spec["table"] for spec, total in zip(specs, totals) if total is None]
+        if failed:
+            raise RuntimeError(f"Shopify {', '.join(failed)} load failed; see the Shopify log")
+
+def bench_meta(timer, rows, accounts):
+    from scripts import metads_etl_pipeline as meta
+    from utils.meta_async_fetcher import fetch_raw_accounts
+
+    per_account = max(1, rows // accounts)
+    account_ids = [f"act_{100 + i}" for i in range(accounts)]
+    sqlite_sink.create_table(meta.FACT_TABLE, meta.FACT_COLUMNS)
+
+    with timer.stage("meta.generate", per_account * accounts):
+        raw = [meta_raw_account(account_id, per_account) for account_id in account_ids]
+    with timer.stage("meta.fetch") as counter:
+        fetched = fetch_raw_accounts(account_ids, "2025-02-22", "2025-02-28", access_token="stub")
+        counter["rows"] = sum(len(insights) for _, _, _, insights in fetched)
+    del fetched
+
+    with timer.stage("meta.transform", per_account * accounts):
+        data = meta.combine_frames(
+            meta.transform_meta_ads_data(account_id, "2025-02-22", "2025-02-28", campaigns, adsets, insights)
+            for account_id, campaigns, adsets, insights in raw
+        )
+    with timer.stage("meta.load", len(data)):
+        meta.load_data_into_mysql(data)
+
+def bench_google(timer, rows):
+    from scripts import googleads_etl_pipeline as google
+
+    sqlite_sink.create_table(google.FACT_TABLE, google.FACT_COLUMNS)
+    with timer.stage("google.load") as counter:
+        batches = timer.timed(google_row_batches(rows), "google.generate")
+        tuples = timer.timed(google.transform_batches(batches, "2025-02-22", "2025-02-28"), "google.transform")
+        counter["rows"] = google.insert_batches(tuples, [(1234567890, "2025-02-22", "2025-02-28")])
+
+# === Report ===
+
+def print_report(stages, baseline=None, tolerance=0.2):
+    # Returns the stages whose rows/sec fell more than `tolerance` below the baseline
+    regressions = []
+    print(f"{'stage':<42} {'rows':>11} {'seconds':>9} {'rows/s':>12} {'peak RSS MB':>12}")
+    for name, stage in stages.items():
+        note = ""
+        previous = (baseline or {}).get(name)
+        if previous and previous["rows_per_sec"] and stage["rows_per_sec"] < previous["rows_per_sec"] * (1 - tolerance):
+            regressions.append(name)
+            note = f"  REGRESSION (was {previous['rows_per_sec']:.0f} rows/s)"
+        peak = f"{stage['peak_rss_mb']:.0f}" if stage["peak_rss_mb"] is not None else "n/a"
+        print(f"{name:<42} {stage['rows']:>11} {stage['seconds']:>9.2f} {stage['rows_per_sec']:>12.0f} {peak:>12}{note}")
+    return regressions
+
+# === Main ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipelines on synthetic data with local fakes.")
+    parser.add_argument("--rows", default="10k", help="rows per table/source, e.g. 10k, 1M, 10M")
+    parser.add_argument("--source", action="append", choices=("shopify", "meta", "google"),
+                        help="benchmark only this source (repeatable; default: all)")
+    parser.add_argument("--shopify-load-mode", choices=("bulk", "executemany"), default="bulk",
+                        help="SHOPIFY_LOAD_MODE for the Shopify loads")
+    parser.add_argument("--shopify-concurrent", action="store_true",
+                        help="load all Shopify tables at once, as the orchestrator does")
+    parser.add_argument("--accounts", type=int, default=10, help="Meta ad accounts to spread rows over")
+    parser.add_argument("--sink", choices=("file", "memory"), default="file",
+                        help="SQLite file in the work directory, or a shared in-memory database")
+    parser.add_argument("--workdir", help="where generated files go (default: a temporary directory)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare rows/sec against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed rows/sec drop before flagging")
+    args = parser.parse_args(argv)
+
+    rows = parse_size(args.rows)
+    sources = args.source or ["shopify", "meta", "google"]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="etl_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+
+    # Pipelines read these at import time, so they are set before any pipeline is imported
+    os.environ.update({
+        "LOG_DIR": workdir,
+        "STAGING_DIR": workdir,
+        "PROCESSED_DIR": workdir,
+        "ETL_STATE_DB": os.path.join(workdir, f"bench_state_{os.getpid()}.sqlite3"),
+        "RAW_CACHE_ENABLED": "0",
+        "SHOPIFY_LOAD_MODE": args.shopify_load_mode,
+        "META_FETCH_MODE": "async",
+        "META_ACCESS_TOKEN": "stub",
+        # The stubs are local, so API rate limits would only measure the token buckets
+        "META_RATE_PER_SECOND": "0",
+        "GOOGLE_RATE_PER_SECOND": "0"
+    })
+    server = None
+    if "meta" in sources:
+        from benchmarks.meta_graph_stub import start_stub_server
+        server, base_url = start_stub_server(max(1, rows // args.accounts), latency=0)
+        os.environ["META_GRAPH_BASE_URL"] = base_url
+    sqlite_sink.install(os.path.join(workdir, "bench_sink.sqlite3") if args.sink == "file" else None)
+
+    timer = StageTimer()
+    try:
+        if "shopify" in sources:
+            bench_shopify(timer, rows, workdir, args.shopify_concurrent)
+        if "meta" in sources:
+            bench_meta(timer, rows, args.accounts)
+        if "google" in sources:
+            bench_google(timer, rows)
+    finally:
+        if server:
+            server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for stage in timer.stages.values():
+        stage["rows_per_sec"] = stage["rows"] / stage["seconds"] if stage["seconds"] else 0.0
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)["stages"]
+    regressions = print_report(timer.stages, baseline, args.tolerance)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"rows": rows, "sources": sources, "stages": timer.stages}, handle, indent=2)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# === Imports ===
+import re
+import csv
+import sys
+import types
+import sqlite3
+import threading
+
+# === SQLite Stand-In for mysql.connector ===
+# install() registers mysql.connector / .pooling / .errors modules backed by SQLite so the
+# pipelines' real load code (executemany, LOAD DATA LOCAL INFILE, staging swaps) can be
+# timed without a MySQL server. Only the statements the pipelines issue are translated.
+
+MAX_ALLOWED_PACKET = 64 * 1024 * 1024
+
+class Error(Exception):
+    def __init__(self, msg="", errno=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.errno = errno
+
+class PoolError(Error):
+    pass
+
+LOAD_DATA = re.compile(r"LOAD DATA LOCAL INFILE %s (?:REPLACE )?INTO TABLE (\w+).*\(([^)]*)\)\s*$", re.S)
+CREATE_LIKE = re.compile(r"CREATE TABLE (\w+) LIKE (\w+)")
+RENAME = re.compile(r"RENAME TABLE (.+)", re.S)
+
+def translate(query):
+    query = " ".join(query.split())
+    if " ON DUPLICATE KEY UPDATE " in query:
+        query = "INSERT OR REPLACE" + query[len("INSERT"):query.index(" ON DUPLICATE KEY UPDATE ")]
+    return query.replace("%s", "?")
+
+class SinkCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self.result = []
+
+    def execute(self, query, params=None):
+        flat = " ".join(query.split())
+        self.result = []
+        if flat.startswith("SET SESSION"):
+            return
+        if "max_allowed_packet" in flat:
+            self.result = [(MAX_ALLOWED_PACKET,)]
+            return
+        if "information_schema" in flat:
+            return
+        if "PARTITION" in flat:
+            raise Error("Partitioning is not supported by the SQLite sink", 1505)
+
+        match = LOAD_DATA.match(flat)
+        if match:
+            table, columns = match.group(1), [c.strip() for c in match.group(2).split(",")]
+            with open(params[0], newline="", encoding="utf-8") as handle:
+                self.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                    csv.reader(handle)
+                )
+            return
+
+        match = CREATE_LIKE.match(flat)
+        if match:
+            flat = f"CREATE TABLE {match.group(1)} AS SELECT * FROM {match.group(2)} WHERE 0"
+        # MySQL commits implicitly around DDL
+        ddl = flat.startswith(("CREATE", "DROP", "ALTER", "RENAME"))
+        if ddl:
+            self.conn.raw.commit()
+        try:
+            match = RENAME.match(flat)
+            if match:
+                for pair in match.group(1).split(","):
+                    old, new = pair.split(" TO ")
+                    self.conn.raw.execute(f"ALTER TABLE {old.strip()} RENAME TO {new.strip()}")
+            else:
+                cursor = self.conn.raw.execute(translate(flat), params or ())
+                self.rowcount = cursor.rowcount
+                self.result = cursor.fetchall()
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+        if ddl:
+            self.conn.raw.commit()
+
+    def executemany(self, query, seq):
+        try:
+            cursor = self.conn.raw.executemany(translate(query), seq)
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+        self.rowcount = cursor.rowcount
+
+    def fetchone(self):
+        return self.result.pop(0) if self.result else None
+
+    def fetchall(self):
+        result, self.result = self.result, []
+        return result
+
+    def close(self):
+        pass
+
+class SinkConnection:
+    def __init__(self, database, pool=None):
+        self.raw = sqlite3.connect(database, uri=True, timeout=60, check_same_thread=False)
+        self.autocommit = False
+        self.pool = pool
+
+    def cursor(self, *args, **kwargs):
+        return SinkCursor(self)
+
+    def start_transaction(self, **kwargs):
+        pass
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.raw.close()
+        # Closing twice must not free a second pool slot
+        pool, self.pool = self.pool, None
+        if pool:
+            pool.release()
+
+class SinkPool:
+    # Hands out at most pool_size connections at once, like MySQLConnectionPool
+    def __init__(self, pool_name=None, pool_size=5, pool_reset_session=True, **config):
+        self.pool_name = pool_name
+        self.pool_size = pool_size
+        self.in_use = 0
+        self.lock = threading.Lock()
+
+    def get_connection(self):
+        with self.lock:
+            if self.in_use >= self.pool_size:
+                raise PoolError("Failed getting connection; pool exhausted")
+            self.in_use += 1
+        return SinkConnection(_state["database"], self)
+
+    def release(self):
+        with self.lock:
+            self.in_use -= 1
+
+# === Installation ===
+
+_state = {"database": None, "anchor": None}
+_lock = threading.Lock()
+
+def install(path=None):
+    # path=None keeps everything in a shared in-memory database for the life of the process
+    database = f"file:{path}" if path else "file:etl_benchmark?mode=memory&cache=shared"
+    with _lock:
+        _state["database"] = database
+        # An open connection keeps a shared in-memory database alive
+        _state["anchor"] = sqlite3.connect(database, uri=True, check_same_thread=False)
+
+    errors = types.ModuleType("mysql.connector.errors")
+    errors.Error, errors.PoolError = Error, PoolError
+    pooling = types.ModuleType("mysql.connector.pooling")
+    pooling.MySQLConnectionPool = SinkPool
+    connector = types.ModuleType("mysql.connector")
+    connector.Error, connector.errors, connector.pooling = Error, errors, pooling
+    connector.connect = lambda **config: SinkConnection(_state["database"])
+    mysql = types.ModuleType("mysql")
+    mysql.connector = connector
+    sys.modules.update({
+        "mysql": mysql, "mysql.connector": connector,
+        "mysql.connector.errors": errors, "mysql.connector.pooling": pooling
+    })
+
+def create_table(table, columns):
+    with _lock:
+        _state["anchor"].execute(f"DROP TABLE IF EXISTS {table}")
+        _state["anchor"].execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        _state["anchor"].commit()
+
+def count_rows(table):
+    return _state["anchor"].execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
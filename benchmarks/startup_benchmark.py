@@ -0,0 +1,140 @@
+# === Imports ===
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+# === Startup Settings ===
+# Each pipeline module is imported in a fresh interpreter under `python -X importtime`, as the
+# scheduler does for every single-source run or --list dry run. Heavy client libraries must
+# load only on the code paths that use them, so any of HEAVY_MODULES showing up at import
+# time fails the run, as does an import time more than --tolerance above the baseline.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = {
+    "shopify": "scripts.shopify_etl_pipeline",
+    "meta": "scripts.metads_etl_pipeline",
+    "google": "scripts.googleads_etl_pipeline",
+    "orchestrator": "scripts.etl_orchestrator"
+}
+HEAVY_MODULES = (
+    "pandas", "numpy", "pyarrow", "requests", "aiohttp", "mysql.connector",
+    "google.ads", "google.protobuf", "grpc"
+)
+
+# === Import Profiling ===
+
+def parse_importtime(stderr):
+    # [(module, depth, self_us, cumulative_us)] from the "import time:" lines
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+def profile_import(module, env):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    return parse_importtime(result.stderr)
+
+def summarize(module, entries, top=5):
+    # Totals for the module itself, its slowest direct imports and any heavy modules it pulled in.
+    # -X importtime prints children before their parent, so the module's imports are the deeper
+    # entries just above its own line; interpreter and site startup imports come before them.
+    index = max(i for i, entry in enumerate(entries) if entry[0] == module)
+    own = entries[index]
+    start = index
+    while start > 0 and entries[start - 1][1] > own[1]:
+        start -= 1
+    subtree = entries[start:index + 1]
+    children = [entry for entry in subtree if entry[1] == own[1] + 1]
+    heavy = sorted({
+        heavy for name, _, _, _ in subtree for heavy in HEAVY_MODULES
+        if name == heavy or name.startswith(heavy + ".")
+    })
+    return {
+        "ms": own[3] / 1000,
+        "slowest": [(name, cumulative / 1000) for name, _, _, cumulative in sorted(children, key=lambda e: -e[3])[:top]],
+        "heavy": heavy
+    }
+
+def measure(module, env, repeat):
+    # Best of `repeat` runs; the first run also compiles bytecode, so it is rarely the best
+    runs = [summarize(module, profile_import(module, env)) for _ in range(repeat)]
+    best = min(runs, key=lambda run: run["ms"])
+    best["heavy"] = sorted(set().union(*(run["heavy"] for run in runs)))
+    return best
+
+# === Report ===
+
+def print_report(results, baseline=None, tolerance=0.25, budget_ms=None):
+    # Returns the sources that imported heavy modules, went over budget or regressed
+    failures = []
+    print(f"{'source':<14} {'import ms':>10}  slowest direct imports")
+    for source, result in results.items():
+        notes = []
+        if result["heavy"]:
+            notes.append(f"HEAVY IMPORTS {', '.join(result['heavy'])}")
+        previous = (baseline or {}).get(source)
+        if previous and result["ms"] > previous["ms"] * (1 + tolerance):
+            notes.append(f"REGRESSION (was {previous['ms']:.1f} ms)")
+        if budget_ms and result["ms"] > budget_ms:
+            notes.append(f"OVER BUDGET ({budget_ms:.0f} ms)")
+        if notes:
+            failures.append(source)
+        slowest = ", ".join(f"{name} {ms:.1f}" for name, ms in result["slowest"])
+        print(f"{source:<14} {result['ms']:>10.1f}  {slowest}")
+        for note in notes:
+            print(f"{'':<14} {'':>10}  {note}")
+    return failures
+
+# === Main ===
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure pipeline import time with -X importtime and flag regressions.")
+    parser.add_argument("--source", action="append", choices=tuple(MODULES),
+                        help="measure only this module (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module; the best run counts")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier --json output to compare import times against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed import time increase before failing")
+    parser.add_argument("--budget-ms", type=float, help="fail any module whose import takes longer than this")
+    args = parser.parse_args(argv)
+
+    sources = args.source or list(MODULES)
+    workdir = tempfile.mkdtemp(prefix="etl_startup_")
+    # Modules read these at import time; nothing is loaded, so the values only need to be valid
+    env = dict(os.environ, **{
+        "LOG_DIR": workdir,
+        "STAGING_DIR": workdir,
+        "PROCESSED_DIR": workdir,
+        "ETL_STATE_DB": os.path.join(workdir, "startup_state.sqlite3"),
+        "ETL_METRICS_ENABLED": "0"
+    })
+    try:
+        results = {source: measure(MODULES[source], env, args.repeat) for source in sources}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)["modules"]
+    failures = print_report(results, baseline, args.tolerance, args.budget_ms)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump({"python": sys.version.split()[0], "modules": results}, handle, indent=2)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+# === Imports ===
+import os
+import logging
+
+# === Logging Setup ===
+# Same layout as the Meta and Google pipelines: one file per pipeline in LOG_DIR, opened on
+# the first record so importing the pipeline does not create it.
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+def setup_logging(name="shopify_etl", file_name="shopify_etl.log"):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+
+    # Called again when the pipeline is re-imported (spawned workers, benchmarks)
+    if not logger.handlers:
+        log_file_path = os.path.join(os.getenv("LOG_DIR") or ".", file_name)
+        file_handler = logging.FileHandler(log_file_path, delay=True, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(file_handler)
+    return logger
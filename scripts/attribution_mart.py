@@ -0,0 +1,198 @@
+# === Import Required Libraries ===
+import os
+import sys
+import logging
+import argparse
+from datetime import date, timedelta
+from dotenv import load_dotenv
+from utils.db_pool import get_connection
+from utils.metrics import stage
+from utils.state_store import pending_ranges, mark_ranges_refreshed
+
+load_dotenv()
+
+# === Logging Setup ===
+logger = logging.getLogger("attribution_mart")
+logger.setLevel(logging.INFO)
+
+log_file_path = os.path.join(os.getenv("LOG_DIR"), 'attribution_mart.log')
+file_handler = logging.FileHandler(log_file_path, delay=True)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+file_handler.setFormatter(formatter)
+logger.addHandler(file_handler)
+
+# === Mart Settings ===
+# attribution_daily_mart holds one row per (day, channel, campaign): ad spend, impressions,
+# clicks and conversions from the Google and Meta campaign facts, Shopify revenue from
+# sales_fact by UTM source/campaign, and blended ROAS (Shopify revenue / ad spend). Ad facts
+# cover a load window rather than a day, so their metrics are spread evenly over its days.
+# Windows can overlap (lookbacks, backfill slices followed by incremental loads), so each
+# campaign's day is taken from exactly one window: the covering window that starts latest.
+# Only days logged by the loaders since the last refresh (utils.state_store loaded ranges)
+# are recomputed, so dashboards read the mart instead of joining the fact tables.
+MART_TABLE = "attribution_daily_mart"
+SOURCE_TABLES = ("sales_fact", "google_ads_campaigns_fact", "meta_ads_campaigns_fact")
+GOOGLE_SOURCES = [s.strip().lower() for s in os.getenv("ATTRIBUTION_GOOGLE_SOURCES", "google,adwords").split(",") if s.strip()]
+META_SOURCES = [s.strip().lower() for s in os.getenv("ATTRIBUTION_META_SOURCES", "facebook,fb,instagram,ig,meta").split(",") if s.strip()]
+REVENUE_COLUMN = os.getenv("ATTRIBUTION_REVENUE_COLUMN", "net_sales").strip().lower()
+# Days per DELETE + INSERT transaction; also keeps the recursive day list far below
+# MySQL's cte_max_recursion_depth
+SPAN_DAYS = int(os.getenv("ATTRIBUTION_SPAN_DAYS", "31"))
+
+if REVENUE_COLUMN not in ("net_sales", "total_sales", "gross_sales"):
+    raise ValueError(f"ATTRIBUTION_REVENUE_COLUMN must be net_sales, total_sales or gross_sales, not '{REVENUE_COLUMN}'")
+
+# === Mart SQL ===
+
+CREATE_MART = f"""
+    CREATE TABLE IF NOT EXISTS {MART_TABLE} (
+        day DATE NOT NULL,
+        channel VARCHAR(64) NOT NULL,
+        campaign VARCHAR(255) NOT NULL,
+        spend DOUBLE NOT NULL,
+        impressions DOUBLE NOT NULL,
+        clicks DOUBLE NOT NULL,
+        conversions DOUBLE NOT NULL,
+        revenue DOUBLE NOT NULL,
+        roas DOUBLE NULL,
+        refreshed_at DATETIME NOT NULL,
+        PRIMARY KEY (day, channel, campaign)
+    )
+"""
+
+def spread(column, alias):
+    # A window's metric divided evenly over the days it covers
+    return f"{alias}.{column} / (DATEDIFF({alias}.end_date, {alias}.start_date) + 1)"
+
+def latest_window(alias, keys):
+    # 1 for the window a campaign's day is taken from: the latest start, then the latest end
+    partition = ", ".join(f"{alias}.{key}" for key in keys)
+    return f"ROW_NUMBER() OVER (PARTITION BY {partition}, d.day ORDER BY {alias}.start_date DESC, {alias}.end_date DESC)"
+
+def refresh_statement():
+    # Parameters: span start and end, GOOGLE_SOURCES, META_SOURCES, span start and end
+    source = "LOWER(TRIM(s.order_utm_source))"
+    google = ", ".join(["%s"] * len(GOOGLE_SOURCES)) or "NULL"
+    meta = ", ".join(["%s"] * len(META_SOURCES)) or "NULL"
+    return f"""
+        INSERT INTO {MART_TABLE}
+            (day, channel, campaign, spend, impressions, clicks, conversions, revenue, roas, refreshed_at)
+        WITH RECURSIVE days (day) AS (
+            SELECT CAST(%s AS DATE)
+            UNION ALL
+            SELECT day + INTERVAL 1 DAY FROM days WHERE day < CAST(%s AS DATE)
+        ),
+        google_days AS (
+            SELECT d.day, LOWER(TRIM(g.campaign_name)) AS campaign,
+                   {spread("cost", "g")} AS spend, {spread("impressions", "g")} AS impressions,
+                   {spread("clicks", "g")} AS clicks, {spread("conversions", "g")} AS conversions,
+                   {latest_window("g", ("customer_id", "campaign_id"))} AS pick
+            FROM days d JOIN google_ads_campaigns_fact g ON d.day BETWEEN g.start_date AND g.end_date
+        ),
+        meta_days AS (
+            SELECT d.day, LOWER(TRIM(m.campaign_name)) AS campaign,
+                   {spread("amount_spent", "m")} AS spend, {spread("impressions", "m")} AS impressions,
+                   {spread("clicks", "m")} AS clicks, {spread("conversions", "m")} AS conversions,
+                   {latest_window("m", ("customer_id", "campaign_id"))} AS pick
+            FROM days d JOIN meta_ads_campaigns_fact m ON d.day BETWEEN m.start_date AND m.end_date
+        ),
+        activity AS (
+            SELECT day, 'google' AS channel, campaign, spend, impressions, clicks, conversions, 0 AS revenue
+            FROM google_days WHERE pick = 1
+            UNION ALL
+            SELECT day, 'meta', campaign, spend, impressions, clicks, conversions, 0
+            FROM meta_days WHERE pick = 1
+            UNION ALL
+            SELECT s.day,
+                   CASE WHEN {source} IN ({google}) THEN 'google'
+                        WHEN {source} IN ({meta}) THEN 'meta'
+                        ELSE COALESCE(NULLIF({source}, ''), '(none)') END,
+                   LOWER(TRIM(COALESCE(s.order_utm_campaign, ''))),
+                   0, 0, 0, 0, COALESCE(s.{REVENUE_COLUMN}, 0)
+            FROM sales_fact s WHERE s.day BETWEEN %s AND %s
+        )
+        SELECT day, LEFT(channel, 64), LEFT(campaign, 255), SUM(spend), SUM(impressions), SUM(clicks),
+               SUM(conversions), SUM(revenue), SUM(revenue) / NULLIF(SUM(spend), 0), NOW()
+        FROM activity
+        GROUP BY day, LEFT(channel, 64), LEFT(campaign, 255)
+    """
+
+# === Date Spans ===
+
+def merge_ranges(ranges):
+    # Overlapping or adjacent (start, end) ISO date ranges merged into sorted spans
+    spans = []
+    for start, end in sorted((date.fromisoformat(str(start)[:10]), date.fromisoformat(str(end)[:10])) for start, end in ranges):
+        if spans and start <= spans[-1][1] + timedelta(days=1):
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return [(start, end) for start, end in spans]
+
+def split_span(start, end, days=SPAN_DAYS):
+    while start <= end:
+        stop = min(start + timedelta(days=days - 1), end)
+        yield start.isoformat(), stop.isoformat()
+        start = stop + timedelta(days=1)
+
+# === Refresh ===
+
+def refresh_mart(start_date=None, end_date=None):
+    # Recomputes the given days, or every day the loaders logged since the last refresh.
+    # Returns the number of mart rows written.
+    if start_date:
+        range_ids, spans = [], merge_ranges([(start_date, end_date)])
+    else:
+        pending = pending_ranges(SOURCE_TABLES)
+        if not pending:
+            logger.info("Attribution mart is up to date.")
+            return 0
+        range_ids = [range_id for range_id, _, _, _ in pending]
+        spans = merge_ranges((start, end) for _, _, start, end in pending)
+
+    days = sum((end - start).days + 1 for start, end in spans)
+    logger.info(f"Refreshing {MART_TABLE} for {days} day(s) in {len(spans)} span(s).")
+    statement = refresh_statement()
+    total = 0
+    with stage("mart", "refresh", table=MART_TABLE, days=days) as refresh:
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CREATE_MART)
+            for span_start, span_end in spans:
+                for start, end in split_span(span_start, span_end):
+                    cursor.execute(f"DELETE FROM {MART_TABLE} WHERE day BETWEEN %s AND %s", (start, end))
+                    cursor.execute(statement, (start, end, *GOOGLE_SOURCES, *META_SOURCES, start, end))
+                    total += max(cursor.rowcount, 0)
+                    conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Attribution mart refresh failed: {e}")
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+        refresh.add(rows_out=total)
+
+    # Ranges logged while this ran keep refreshed_at empty and are picked up next time
+    mark_ranges_refreshed(range_ids)
+    logger.info(f"{total} rows written to {MART_TABLE}.")
+    return total
+
+# === Main ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the daily cross-source attribution mart")
+    parser.add_argument("--start-date", help="recompute from this day instead of the logged load ranges")
+    parser.add_argument("--end-date", help="recompute up to this day (required with --start-date)")
+    args = parser.parse_args(argv)
+    if bool(args.start_date) != bool(args.end_date):
+        parser.error("--start-date and --end-date must be given together")
+
+    try:
+        refresh_mart(args.start_date, args.end_date)
+    except Exception:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
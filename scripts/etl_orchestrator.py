@@ -0,0 +1,117 @@
+# === Import Required Libraries ===
+import os
+import sys
+import logging
+import argparse
+from functools import partial
+from dotenv import load_dotenv
+from utils.task_graph import run_graph
+from utils.backfill import SLICE_UNITS
+
+load_dotenv()
+
+# === Logging Setup ===
+logger = logging.getLogger("etl_orchestrator")
+logger.setLevel(logging.INFO)
+
+log_file_path = os.path.join(os.getenv("LOG_DIR"), 'etl_orchestrator.log')
+file_handler = logging.FileHandler(log_file_path, delay=True)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+file_handler.setFormatter(formatter)
+logger.addHandler(file_handler)
+
+# === Orchestrator Settings ===
+# One process runs every selected source as a task graph, so a full refresh shares the
+# MySQL pools and API sessions instead of starting three pipelines one after another.
+WORKERS = int(os.getenv("ETL_ORCHESTRATOR_WORKERS", "3"))
+SOURCES = ("shopify", "meta", "google")
+
+# === Task Builders ===
+# Pipeline modules are imported only for the selected sources, since each one loads its
+# environment and logging on import. Every builder returns {name: (callable, dependencies)}.
+
+def run_shopify_table(shopify, spec):
+    # process_table logs and swallows its own errors, returning None on failure
+    total = shopify.process_table(spec)
+    if total is None:
+        raise RuntimeError(f"{spec['name']} ETL failed")
+    return total
+
+def shopify_tasks(account_ids, start_date, end_date, slice_unit=None):
+    from scripts import shopify_etl_pipeline as shopify
+
+    if account_ids or start_date:
+        logger.warning("Shopify loads the staged exports as-is; account and date filters are ignored.")
+    if shopify.WORKERS > 1:
+        return {"shopify": (partial(shopify.run_parallel, shopify.TABLE_SPECS, shopify.WORKERS, shopify.CHUNK_BYTES), [])}
+    return {f"shopify:{spec['table']}": (partial(run_shopify_table, shopify, spec), []) for spec in shopify.TABLE_SPECS}
+
+def meta_tasks(account_ids, start_date, end_date, slice_unit=None):
+    from scripts import metads_etl_pipeline as meta
+    return {"meta": (partial(meta.run_accounts, account_ids, start_date, end_date, slice_unit), [])}
+
+def google_tasks(account_ids, start_date, end_date, slice_unit=None):
+    from scripts import googleads_etl_pipeline as google
+    return {"google": (partial(google.run_clients, account_ids, start_date, end_date, slice_unit), [])}
+
+TASK_BUILDERS = {"shopify": shopify_tasks, "meta": meta_tasks, "google": google_tasks}
+
+def mart_task(load_tasks):
+    # Runs once every load succeeded; days loaded by a run that failed stay logged as
+    # pending and are recomputed by the next refresh
+    from scripts import attribution_mart
+    return {"attribution_mart": (attribution_mart.refresh_mart, list(load_tasks))}
+
+def build_tasks(sources, account_ids=None, start_date=None, end_date=None, mart=True, slice_unit=None):
+    tasks = {}
+    for source in sources:
+        tasks.update(TASK_BUILDERS[source](account_ids, start_date, end_date, slice_unit))
+    if mart:
+        tasks.update(mart_task(tasks))
+    return tasks
+
+# === Main ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the marketing ETL pipelines as one task graph")
+    parser.add_argument("--source", action="append", choices=SOURCES,
+                        help="run only this source (repeatable; default: all)")
+    parser.add_argument("--account-id", action="append", default=[],
+                        help="Meta ad account or Google Ads client to load (repeatable; needs a single --source)")
+    parser.add_argument("--start-date", help="load from this date instead of the watermarks")
+    parser.add_argument("--end-date", help="load up to this date (required with --start-date)")
+    parser.add_argument("--slice", choices=SLICE_UNITS,
+                        help="backfill the ad sources' --start-date..--end-date in date slices fetched in parallel")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="tasks to run at the same time")
+    parser.add_argument("--no-mart", action="store_true",
+                        help="skip the attribution mart refresh after the loads")
+    parser.add_argument("--list", action="store_true", help="print the task graph and exit")
+    args = parser.parse_args(argv)
+
+    sources = args.source or list(SOURCES)
+    if args.account_id and (len(sources) != 1 or sources[0] == "shopify"):
+        parser.error("--account-id needs exactly one --source (meta or google)")
+    if bool(args.start_date) != bool(args.end_date):
+        parser.error("--start-date and --end-date must be given together")
+    if args.slice and not args.start_date:
+        parser.error("--slice needs --start-date and --end-date")
+
+    tasks = build_tasks(sources, args.account_id, args.start_date, args.end_date, not args.no_mart, args.slice)
+    if args.list:
+        for name, (_, deps) in tasks.items():
+            print(f"{name}" + (f" <- {', '.join(deps)}" if deps else ""))
+        return 0
+
+    logger.info(f"ETL run started: {len(tasks)} tasks, {args.workers} workers.")
+    results = run_graph(tasks, args.workers)
+
+    failed = [name for name, (status, _, _) in results.items() if status != "ok"]
+    for name, (status, _, seconds) in results.items():
+        logger.info(f"{name}: {status} ({seconds:.1f}s)")
+    if failed:
+        logger.error(f"ETL run finished with failed or skipped tasks: {failed}")
+        return 1
+    logger.info("ETL run completed successfully!")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
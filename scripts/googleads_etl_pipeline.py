@@ -1,10 +1,29 @@
 # === Import Required Libraries ===
 import os
-import mysql.connector
+import time
+import queue
+import argparse
+import threading
+from types import SimpleNamespace
+from itertools import chain
+from collections import Counter
 import logging
-from google.ads.googleads.client import GoogleAdsClient
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from utils.state_store import incremental_window, set_watermark, record_loaded_range
+from utils.streaming import chunked, prefetch
+from utils.raw_cache import cache_batches, read_batches, list_windows
+from utils.db_pool import get_connection, bulk_session, packet_chunks
+from utils.metrics import Stage, stage, timed, count
+from utils.api_limits import rate_limiter, backoff_seconds, call_with_retries
+from utils.checkpoint import job_checkpoint
+from utils.backfill import SLICE_UNITS, BACKFILL_WORKERS, date_slices, ordered_results
+from utils.dimension_cache import refresh_plan, cached_entities, store_entities
+from utils.load_strategy import (
+    table_strategy, insert_statement, prepare_target, finish_load, abort_load, check_upsert_key,
+    merge_windows, replay_strategy
+)
 load_dotenv()
 
 # === Logging Setup ===
@@ -12,23 +31,17 @@ logger = logging.getLogger("google_ads_etl")
 logger.setLevel(logging.INFO)
 
 log_file_path = os.path.join(os.getenv("LOG_DIR"), 'google_ads_etl.log')
-file_handler = logging.FileHandler(log_file_path)
+file_handler = logging.FileHandler(log_file_path, delay=True)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
-logger.info("Google Ads ETL Pipeline started.")
-
 # === Secure MySQL Connection ===
+# Pooled via utils.db_pool (database from MYSQL_DB); close() returns the connection to the pool
 def create_secure_db_connection():
+    import mysql.connector
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            port=os.getenv("MYSQL_PORT"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database="shopify_etl"
-        )
+        conn = get_connection()
         logger.info("Successfully connected to MySQL.")
         return conn
     except mysql.connector.Error as err:
@@ -37,6 +50,7 @@ def create_secure_db_connection():
 
 # === Google Ads API Connection ===
 def create_google_ads_client():
+    from google.ads.googleads.client import GoogleAdsClient
     try:
         config_dict = {
             "developer_token": os.getenv("GOOGLE_DEVELOPER_TOKEN"),
@@ -55,7 +69,14 @@ def create_google_ads_client():
         raise
 
 # === List all linked client accounts under MCC ===
+# The client list is cached with utils.dimension_cache; customer_client has no updated_time,
+# so an expired list is refetched in full
 def list_linked_client_accounts(client, manager_id):
+    mode, _ = refresh_plan("google_ads", manager_id, "customer_clients", delta=False)
+    if mode == "cached":
+        linked_clients = [(c["name"], c["id"]) for c in cached_entities("google_ads", manager_id, "customer_clients")]
+        logger.info(f"{len(linked_clients)} linked clients of {manager_id} read from the dimension cache.")
+        return linked_clients
     try:
         query = """
             SELECT
@@ -66,14 +87,21 @@ def list_linked_client_accounts(client, manager_id):
             WHERE customer_client.manager = false
         """
         service = client.get_service("GoogleAdsService")
-        response = service.search_stream(customer_id=str(manager_id), query=query)
-        
-        linked_clients = []
-        for batch in response:
-            for row in batch.results:
-                linked_clients.append((row.customer_client.descriptive_name, row.customer_client.id))
-                logger.info(f"Found client: {row.customer_client.descriptive_name} (ID: {row.customer_client.id})")
-        
+
+        def search():
+            response = service.search_stream(customer_id=str(manager_id), query=query)
+            return [
+                (row.customer_client.descriptive_name, row.customer_client.id)
+                for batch in response for row in batch.results
+            ]
+
+        linked_clients = call_with_retries(
+            search, "google", MAX_RETRIES, google_retryable, f"Listing clients of {manager_id}"
+        )
+        for name, client_id in linked_clients:
+            logger.info(f"Found client: {name} (ID: {client_id})")
+        store_entities("google_ads", manager_id, "customer_clients",
+                       [{"id": client_id, "name": name} for name, client_id in linked_clients], full=True)
         return linked_clients
 
     except Exception as e:
@@ -81,95 +109,542 @@ def list_linked_client_accounts(client, manager_id):
         raise
 
 # === Fetch Data from Google Ads ===
-def fetch_google_ads_data(client, chosen_client_id, start_date, end_date):
+# Rows are streamed with search_stream, converted to tuples per stream batch and
+# loaded while later batches are still arriving.
+LOAD_BATCH_SIZE = int(os.getenv("GOOGLE_LOAD_BATCH_SIZE", "5000"))
+PREFETCH_BATCHES = int(os.getenv("GOOGLE_PREFETCH_BATCHES", "4"))
+
+FACT_TABLE = "google_ads_campaigns_fact"
+FACT_COLUMNS = [
+    "campaign_id", "campaign_name", "status", "start_date", "end_date", "customer_id",
+    "bid_strategy_type", "budget", "impressions", "clicks", "ctr", "avg_cost", "cost",
+    "conversions", "conv_value", "interaction_rate", "ROAS"
+]
+KEY_COLUMNS = ["campaign_id", "customer_id", "start_date", "end_date"]
+
+def build_campaign_query(start_date, end_date):
+    return f"""
+        SELECT 
+            campaign.id, 
+            campaign.name, 
+            campaign.status, 
+            customer.id,  
+            campaign.bidding_strategy_type,  
+            campaign_budget.amount_micros,
+            metrics.impressions, 
+            metrics.clicks, 
+            metrics.ctr, 
+            metrics.average_cpc,  
+            metrics.cost_micros, 
+            metrics.conversions, 
+            metrics.conversions_value, 
+            metrics.interaction_rate 
+        FROM campaign 
+        WHERE campaign.status = 'ENABLED'
+        AND segments.date BETWEEN '{start_date}' AND '{end_date}'
+    """
+
+def stream_google_ads_batches(client, chosen_client_id, start_date, end_date):
+    # Yields one list of GoogleAdsRow per search_stream response batch
     try:
-        query = f"""
-            SELECT 
-                campaign.id, 
-                campaign.name, 
-                campaign.status, 
-                customer.id,  
-                campaign.bidding_strategy_type,  
-                campaign_budget.amount_micros,
-                metrics.impressions, 
-                metrics.clicks, 
-                metrics.ctr, 
-                metrics.average_cpc,  
-                metrics.cost_micros, 
-                metrics.conversions, 
-                metrics.conversions_value, 
-                metrics.interaction_rate 
-            FROM campaign 
-            WHERE campaign.status = 'ENABLED'
-            AND segments.date BETWEEN '{start_date}' AND '{end_date}'
-        """
         google_ads_service = client.get_service("GoogleAdsService")
-        response = google_ads_service.search(customer_id=str(chosen_client_id), query=query)
-        results = list(response)
-        logger.info(f"{len(results)} rows fetched for period {start_date} to {end_date}")
-        return results
+        rate_limiter("google").wait()
+        stream = google_ads_service.search_stream(
+            customer_id=str(chosen_client_id), query=build_campaign_query(start_date, end_date)
+        )
+        count(api_calls=1)
+        for batch in stream:
+            yield batch.results
     except Exception as e:
         logger.error(f"Error fetching data from Google Ads: {e}")
         raise
 
+def fetch_google_ads_data(client, chosen_client_id, start_date, end_date):
+    results = [
+        row
+        for batch in stream_google_ads_batches(client, chosen_client_id, start_date, end_date)
+        for row in batch
+    ]
+    logger.info(f"{len(results)} rows fetched for period {start_date} to {end_date}")
+    return results
+
+# === Transform ===
+def row_to_tuple(row, start_date, end_date):
+    budget = row.campaign_budget.amount_micros / 1_000_000
+    cost = row.metrics.cost_micros / 1_000_000
+    avg_cost = row.metrics.average_cpc / 1_000_000
+    roas = row.metrics.conversions_value / cost if cost > 0 else 0
+
+    return (
+        row.campaign.id,
+        row.campaign.name,
+        row.campaign.status.name,
+        start_date,
+        end_date,
+        row.customer.id,
+        row.campaign.bidding_strategy_type.name,
+        budget,
+        row.metrics.impressions,
+        row.metrics.clicks,
+        row.metrics.ctr,
+        avg_cost,
+        cost,
+        row.metrics.conversions,
+        row.metrics.conversions_value,
+        row.metrics.interaction_rate,
+        roas
+    )
+
+# === Raw Response Cache ===
+# Streamed rows are flattened into Parquet columns under PROCESSED_DIR/raw_cache as they
+# pass through, so --replay can rebuild them without calling the API.
+def flatten_row(row):
+    return {
+        "campaign_id": row.campaign.id,
+        "campaign_name": row.campaign.name,
+        "campaign_status": row.campaign.status.name,
+        "customer_id": row.customer.id,
+        "bidding_strategy_type": row.campaign.bidding_strategy_type.name,
+        "budget_amount_micros": row.campaign_budget.amount_micros,
+        "impressions": row.metrics.impressions,
+        "clicks": row.metrics.clicks,
+        "ctr": row.metrics.ctr,
+        "average_cpc": row.metrics.average_cpc,
+        "cost_micros": row.metrics.cost_micros,
+        "conversions": row.metrics.conversions,
+        "conversions_value": row.metrics.conversions_value,
+        "interaction_rate": row.metrics.interaction_rate
+    }
+
+def cached_row(record):
+    # Rebuilds the attribute shape row_to_tuple reads from a GoogleAdsRow
+    return SimpleNamespace(
+        campaign=SimpleNamespace(
+            id=record["campaign_id"],
+            name=record["campaign_name"],
+            status=SimpleNamespace(name=record["campaign_status"]),
+            bidding_strategy_type=SimpleNamespace(name=record["bidding_strategy_type"])
+        ),
+        customer=SimpleNamespace(id=record["customer_id"]),
+        campaign_budget=SimpleNamespace(amount_micros=record["budget_amount_micros"]),
+        metrics=SimpleNamespace(**{
+            key: record[key] for key in (
+                "impressions", "clicks", "ctr", "average_cpc", "cost_micros",
+                "conversions", "conversions_value", "interaction_rate"
+            )
+        })
+    )
+
+def cached_stream(client, client_id, start_date, end_date):
+    return cache_batches(
+        stream_google_ads_batches(client, client_id, start_date, end_date),
+        "google_ads", client_id, "campaign_metrics", start_date, end_date,
+        lambda rows: [flatten_row(row) for row in rows]
+    )
+
+def replay_from_cache(start_date=None, end_date=None, client_ids=None):
+    # Every cached window is reloaded in one load, so staging swaps copy the live table once
+    windows = []
+    for client_id, window_start, window_end, _ in list_windows("google_ads"):
+        if client_ids and client_id not in client_ids:
+            continue
+        if (start_date and window_end < start_date) or (end_date and window_start > end_date):
+            continue
+        windows.append((client_id, window_start, window_end))
+    if not windows:
+        return 0
+
+    def cached_batches():
+        for client_id, window_start, window_end in windows:
+            batches = timed((
+                [cached_row(record) for record in records]
+                for records in read_batches("google_ads", client_id, "campaign_metrics", window_start, window_end)
+            ), "google", "extract", size=len, client_id=client_id, source="cache")
+            yield from transform_batches(batches, window_start, window_end)
+
+    total = insert_batches(cached_batches(), windows, replay_strategy(FACT_TABLE))
+    logger.info(f"Replayed {len(windows)} client window(s) from cache ({total} rows).")
+    return len(windows)
+
+def transform_batches(row_batches, start_date, end_date, batch_size=LOAD_BATCH_SIZE, **labels):
+    # Only the conversion is timed; pulling row_batches is the extract stage's time
+    transform = Stage("google", "transform", **labels)
+    try:
+        for rows in row_batches:
+            transform.add(rows_in=len(rows))
+            for part in chunked(rows, batch_size):
+                with transform.measure():
+                    batch = [row_to_tuple(row, start_date, end_date) for row in part]
+                transform.add(rows_out=len(batch))
+                yield batch
+    finally:
+        transform.emit()
+
 # === Data Loading ===
-def load_data_into_mysql(data, start_date, end_date):
+# GOOGLE_ADS_CAMPAIGNS_FACT_LOAD_STRATEGY (or ETL_LOAD_STRATEGY) picks append, upsert or staging_swap
+def retain_clause(windows):
+    # Staging swaps keep every live row except the (client, window) slices that were reloaded
+    if not windows:
+        return None, ()
+    windows = merge_windows(windows)
+    slices = " OR ".join(["(customer_id = %s AND start_date >= %s AND end_date <= %s)"] * len(windows))
+    return f"NOT ({slices})", tuple(value for window in windows for value in window)
+
+def insert_batches(tuple_batches, windows=(), strategy=None, discarded=()):
+    # `windows` lists the (customer_id, start_date, end_date) slices being loaded and
+    # `discarded` the slices of clients that failed part-way; both are read after the batches
+    # are drained, so MCC loads can fill them in as clients finish.
+    strategy = strategy or table_strategy(FACT_TABLE)
     try:
-        conn = create_secure_db_connection()
-        cursor = conn.cursor()
-        
-        insert_query = """
-        INSERT INTO google_ads_campaigns_fact (
-            campaign_id, campaign_name, status, start_date, end_date, customer_id,
-            bid_strategy_type, budget, impressions, clicks, ctr, avg_cost, cost,
-            conversions, conv_value, interaction_rate, ROAS
-        ) 
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
-        """
-        
-        for row in data:
-            budget = row.campaign_budget.amount_micros / 1_000_000
-            cost = row.metrics.cost_micros / 1_000_000
-            avg_cost = row.metrics.average_cpc / 1_000_000
-            roas = row.metrics.conversions_value / cost if cost > 0 else 0
-            
-            cursor.execute(insert_query, (
-                row.campaign.id,
-                row.campaign.name,
-                row.campaign.status.name,
-                start_date,
-                end_date,
-                row.customer.id,
-                row.campaign.bidding_strategy_type.name,
-                budget,
-                row.metrics.impressions,
-                row.metrics.clicks,
-                row.metrics.ctr,
-                avg_cost,
-                cost,
-                row.metrics.conversions,
-                row.metrics.conversions_value,
-                row.metrics.interaction_rate,
-                roas
-            ))
-        
-        conn.commit()
-        logger.info(f"{cursor.rowcount} rows inserted in google_ads_campaigns_fact table.")
-        cursor.close()
-        conn.close()
-        
+        with stage("google", "load", table=FACT_TABLE) as load:
+            conn = create_secure_db_connection()
+            try:
+                if strategy == "upsert":
+                    check_upsert_key(conn, FACT_TABLE, KEY_COLUMNS)
+                target = prepare_target(conn, FACT_TABLE, strategy)
+                insert_query = insert_statement(target, FACT_COLUMNS, strategy, KEY_COLUMNS)
+                cursor = conn.cursor()
+                total = 0
+
+                # Time spent blocked on extraction and conversion is the "wait" stage, not MySQL's
+                tuple_batches = timed(tuple_batches, "google", "wait", size=len)
+                try:
+                    # Each batch is committed before the next item is pulled, so a client's end
+                    # marker (and its watermark) is only read once its rows are committed. Within
+                    # a batch rows are re-cut so each multi-row INSERT fits in max_allowed_packet.
+                    with bulk_session(conn, strategy):
+                        for batch in tuple_batches:
+                            for part in packet_chunks(conn, batch, LOAD_BATCH_SIZE):
+                                cursor.executemany(insert_query, part)
+                            conn.commit()
+                            total += len(batch)
+                except Exception:
+                    abort_load(conn, FACT_TABLE, strategy)
+                    raise
+
+                if total:
+                    # Rows a failed client already committed would be loaded again by the rerun
+                    for window in discarded:
+                        cursor.execute(
+                            f"DELETE FROM {target} WHERE customer_id = %s AND start_date >= %s AND end_date <= %s",
+                            window
+                        )
+                    conn.commit()
+                    finish_load(conn, FACT_TABLE, strategy, *retain_clause(windows))
+                    for start_date, end_date in sorted({window[1:] for window in windows}):
+                        record_loaded_range(FACT_TABLE, start_date, end_date, total)
+                else:
+                    abort_load(conn, FACT_TABLE, strategy)
+
+                load.add(rows_in=total, rows_out=total)
+                logger.info(f"{total} rows written to google_ads_campaigns_fact table ({strategy}).")
+                cursor.close()
+            finally:
+                conn.close()
+            return total
+
     except Exception as e:
         logger.error(f"Error inserting data into MySQL: {e}")
         raise
 
+def load_data_into_mysql(data, start_date, end_date):
+    windows = sorted({(row.customer.id, start_date, end_date) for row in data})
+    return insert_batches(transform_batches([data], start_date, end_date), windows)
+
+def extract_and_load(client, chosen_client_id, start_date, end_date):
+    # Extraction and tuple conversion run on a background thread; only PREFETCH_BATCHES
+    # converted batches are held in memory at once.
+    batches = timed(cached_stream(client, chosen_client_id, start_date, end_date),
+                    "google", "extract", size=len, client_id=chosen_client_id)
+    return insert_batches(
+        prefetch(transform_batches(batches, start_date, end_date, client_id=chosen_client_id), PREFETCH_BATCHES),
+        [(chosen_client_id, start_date, end_date)]
+    )
+
+# === MCC-Wide Extraction ===
+# Every client is extracted on a bounded thread pool sharing one GoogleAdsClient;
+# converted batches flow through one queue into a single MySQL loader.
+MAX_WORKERS = int(os.getenv("GOOGLE_MAX_WORKERS", "8"))
+MAX_RETRIES = int(os.getenv("GOOGLE_MAX_RETRIES", "3"))
+# gRPC statuses that fail the same way on every attempt (bad query, credentials, access)
+PERMANENT_GRPC_CODES = {"INVALID_ARGUMENT", "PERMISSION_DENIED", "UNAUTHENTICATED", "NOT_FOUND", "FAILED_PRECONDITION"}
+
+def google_retryable(error):
+    # GoogleAdsException keeps the failed gRPC call in .error; other errors (network) are retried
+    code = getattr(getattr(error, "error", None), "code", None)
+    return getattr(code(), "name", None) not in PERMANENT_GRPC_CODES if callable(code) else True
+
+def extract_client(client, client_id, out, stop, retry_partial=False, window=None):
+    def put(item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("loader stopped")
+
+    sent = 0
+    try:
+        # An explicit (start_date, end_date) window replaces the watermark window
+        window = window or incremental_window("google_ads", client_id, "google_ads_campaigns_fact")
+        if window is None:
+            put(("done", client_id, None, 0))
+            return
+        start_date, end_date = window
+
+        # One extract stage per client across attempts; queue waits are not timed
+        extract = Stage("google", "extract", client_id=client_id)
+        for attempt in range(MAX_RETRIES + 1):
+            emitted = 0
+            try:
+                batches = extract.timed(cached_stream(client, client_id, start_date, end_date), size=len)
+                for batch in transform_batches(batches, start_date, end_date, client_id=client_id):
+                    put(("batch", client_id, batch, len(batch)))
+                    emitted += len(batch)
+                    sent += len(batch)
+                extract.emit()
+                put(("done", client_id, window, emitted))
+                return
+            except Exception as e:
+                # Rows already handed to the loader cannot be taken back, so unless the
+                # load is an upsert only attempts that failed before emitting anything are retried.
+                if ((emitted and not retry_partial) or attempt == MAX_RETRIES or stop.is_set()
+                        or not google_retryable(e)):
+                    extract.status = "failed"
+                    extract.emit()
+                    raise
+                extract.add(retries=1)
+                delay = backoff_seconds(attempt)
+                logger.warning(f"Client {client_id} failed ({e}); retry {attempt + 1} in {delay:.1f}s.")
+                time.sleep(delay)
+
+    except Exception as e:
+        if not stop.is_set():
+            put(("failed", client_id, (e, window), sent))
+
+def drain_client_batches(out, client_count, summary, defer_watermarks=False, checkpoint=None):
+    # Yields batches for insert_batches; end markers arrive after a client's last batch,
+    # so by the time one is read every earlier batch of that client is committed.
+    # Staging swaps defer watermarks (and checkpoints) until the swap has published the rows.
+    finished = 0
+    while finished < client_count:
+        kind, client_id, payload, rows = out.get()
+        if kind == "batch":
+            yield payload
+            continue
+
+        finished += 1
+        if kind == "failed":
+            error, window = payload
+            summary["failed"].append(client_id)
+            if rows:
+                summary["partial"].append((client_id,) + tuple(window))
+            logger.error(f"Client {client_id} failed: {error}")
+        elif payload is None:
+            logger.info(f"Client {client_id} is already up to date.")
+        else:
+            if not defer_watermarks:
+                set_watermark("google_ads", client_id, "google_ads_campaigns_fact", payload[1])
+                if checkpoint:
+                    checkpoint.save(client_id, rows)
+            summary["windows"].append((client_id,) + payload)
+            summary["loaded"][client_id] = rows
+            logger.info(f"Client {client_id}: {rows} rows loaded for {payload[0]} to {payload[1]}.")
+
+def load_clients(client, client_ids, workers=MAX_WORKERS, window=None):
+    # Watermark windows resume per client on their own. An explicit window (backfills, the
+    # orchestrator) checkpoints each loaded client instead, so rerunning it after a failure
+    # only extracts the clients that did not finish.
+    checkpoint = job_checkpoint("google_ads", f"{FACT_TABLE}.{window[0]}.{window[1]}") if window else None
+    if checkpoint:
+        done = [client_id for client_id in client_ids if checkpoint.get(client_id) is not None]
+        if done:
+            logger.info(f"{len(done)} client(s) already loaded for {window[0]} to {window[1]}; skipped.")
+            client_ids = [client_id for client_id in client_ids if client_id not in done]
+
+    out = queue.Queue(maxsize=PREFETCH_BATCHES * workers)
+    stop = threading.Event()
+    summary = {"loaded": {}, "failed": [], "windows": [], "partial": []}
+    strategy = table_strategy(FACT_TABLE)
+    staged = strategy == "staging_swap"
+    # Upserts overwrite a failed client's partial rows on the rerun; other strategies delete them
+    discarded = [] if strategy == "upsert" else summary["partial"]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for client_id in client_ids:
+            pool.submit(extract_client, client, client_id, out, stop, strategy == "upsert", window)
+        try:
+            insert_batches(
+                drain_client_batches(out, len(client_ids), summary, defer_watermarks=staged, checkpoint=checkpoint),
+                summary["windows"], strategy, discarded
+            )
+        finally:
+            stop.set()
+
+    if staged:
+        for client_id, _, end_date in summary["windows"]:
+            set_watermark("google_ads", client_id, "google_ads_campaigns_fact", end_date)
+            if checkpoint:
+                checkpoint.save(client_id, summary["loaded"][client_id])
+    if checkpoint and not summary["failed"]:
+        checkpoint.clear()
+
+    logger.info(
+        f"{len(summary['loaded'])} of {len(client_ids)} clients loaded, "
+        f"{len(summary['failed'])} failed."
+    )
+    return summary
+
+# === Date-Sliced Backfill ===
+# --slice splits an explicit range into day, week or month slices (utils.backfill). Every
+# (slice, client) pair is extracted on BACKFILL_WORKERS threads, and slices are loaded in date
+# order as soon as they are ready. Loaded slices are checkpointed, so rerunning the same
+# backfill after a failure starts at the first slice that did not load. Staging swaps
+# publish every slice in one swap at the end instead.
+
+def extract_slice(client, client_id, start_date, end_date):
+    # Converted batches for one client and slice, retried like extract_client
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            batches = timed(cached_stream(client, client_id, start_date, end_date),
+                            "google", "extract", size=len, client_id=client_id, start_date=start_date)
+            return list(transform_batches(batches, start_date, end_date, client_id=client_id))
+        except Exception as e:
+            if attempt == MAX_RETRIES or not google_retryable(e):
+                raise
+            delay = backoff_seconds(attempt)
+            logger.warning(f"Client {client_id} {start_date} to {end_date} failed ({e}); retry {attempt + 1} in {delay:.1f}s.")
+            time.sleep(delay)
+
+def backfill_clients(client, client_ids, start_date, end_date, unit, workers=BACKFILL_WORKERS):
+    strategy = table_strategy(FACT_TABLE)
+    staged = strategy == "staging_swap"
+    checkpoint = None if staged else job_checkpoint("google_ads", f"backfill.{FACT_TABLE}.{start_date}.{end_date}.{unit}")
+    slices = date_slices(start_date, end_date, unit)
+    units = [
+        (client_id, window) for window in slices for client_id in client_ids
+        if not (checkpoint and checkpoint.get(f"{client_id}.{window[0]}") is not None)
+    ]
+    logger.info(
+        f"Backfilling {len(client_ids)} client(s) from {start_date} to {end_date} in {len(slices)} {unit} slice(s); "
+        f"{len(units)} client slice(s) to extract with {workers} workers."
+    )
+    summary = {"loaded": {}, "failed": [], "windows": []}
+    results = ordered_results(lambda item: extract_slice(client, item[0], *item[1]), units, workers)
+
+    def loaded(client_id, window, batches):
+        rows = sum(map(len, batches))
+        summary["loaded"][client_id] = summary["loaded"].get(client_id, 0) + rows
+        summary["windows"].append((client_id, *window))
+        return rows
+
+    if staged:
+        def staged_batches():
+            for (client_id, window), batches in results:
+                loaded(client_id, window, batches)
+                yield from batches
+        insert_batches(staged_batches(), summary["windows"], strategy)
+        for client_id, _, end in summary["windows"]:
+            set_watermark("google_ads", client_id, "google_ads_campaigns_fact", end)
+    else:
+        # A slice is loaded once its last client arrives, before the next slice is waited on
+        expected = Counter(window for _, window in units)
+        group = []
+        for (client_id, window), batches in results:
+            group.append((client_id, batches))
+            if len(group) < expected[window]:
+                continue
+            windows = [(client_id, *window) for client_id, _ in group]
+            insert_batches(chain.from_iterable(batches for _, batches in group), windows, strategy)
+            rows = 0
+            for client_id, batches in group:
+                client_rows = loaded(client_id, window, batches)
+                rows += client_rows
+                set_watermark("google_ads", client_id, "google_ads_campaigns_fact", window[1])
+                if checkpoint:
+                    checkpoint.save(f"{client_id}.{window[0]}", client_rows)
+            logger.info(f"Slice {window[0]} to {window[1]}: {rows} rows loaded for {len(group)} client(s).")
+            group = []
+        if checkpoint:
+            checkpoint.clear()
+
+    logger.info(f"Backfill of {len(client_ids)} client(s) from {start_date} to {end_date} completed.")
+    return summary
+
+def configured_client_ids(client, all_clients=False):
+    # GOOGLE_CLIENT_IDS lets the scheduler pick "all" or a comma-separated list
+    configured = os.getenv("GOOGLE_CLIENT_IDS", "").strip()
+    if configured and configured.lower() != "all":
+        return [c.strip() for c in configured.split(",") if c.strip()]
+    if all_clients or configured.lower() == "all":
+        manager_id = os.getenv("GOOGLE_CUSTOMER_ID").strip()
+        return [client_id for _, client_id in list_linked_client_accounts(client, manager_id)]
+    return []
+
+def run_clients(client_ids=None, start_date=None, end_date=None, slice_unit=None):
+    # Unattended load of the given clients, GOOGLE_CLIENT_IDS, or every linked client;
+    # used by the orchestrator. A slice_unit backfills the explicit range in date slices.
+    # Raises when any client failed.
+    client = create_google_ads_client()
+    client_ids = client_ids or configured_client_ids(client, all_clients=True)
+    window = (start_date, end_date) if start_date and end_date else None
+    if window and slice_unit:
+        return backfill_clients(client, client_ids, start_date, end_date, slice_unit)
+    summary = load_clients(client, client_ids, window=window)
+    if summary["failed"]:
+        raise RuntimeError(f"Google Ads clients failed: {summary['failed']}")
+    return summary
+
 # === Pipeline Main ===
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Google Ads ETL pipeline")
+    parser.add_argument("--all-clients", action="store_true",
+                        help="load every linked client without prompting")
+    parser.add_argument("--client-id", action="append", default=[],
+                        help="load this client without prompting (repeatable)")
+    parser.add_argument("--replay", action="store_true",
+                        help="rerun transform and load from the raw cache without calling the API")
+    parser.add_argument("--start-date",
+                        help="load from this date instead of the watermark (with --replay: windows ending on or after it)")
+    parser.add_argument("--end-date",
+                        help="load up to this date (with --replay: windows starting on or before it)")
+    parser.add_argument("--slice", choices=SLICE_UNITS,
+                        help="backfill --start-date..--end-date in day, week or month slices extracted in parallel")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="slices extracted at the same time with --slice")
+    args = parser.parse_args(argv)
+    if not args.replay and bool(args.start_date) != bool(args.end_date):
+        parser.error("--start-date and --end-date must be given together")
+    if args.slice and (args.replay or not args.start_date):
+        parser.error("--slice needs --start-date and --end-date and cannot be used with --replay")
+    window = (args.start_date, args.end_date) if args.start_date else None
+
     try:
+        if args.replay:
+            logger.info("Replaying Google Ads data from the raw cache.")
+            replayed = replay_from_cache(args.start_date, args.end_date, args.client_id)
+            logger.info(f"Google Ads replay completed ({replayed} windows).")
+            return
+
         logger.info("Starting Google Ads data extraction.")
         client = create_google_ads_client()
+        client_ids = args.client_id or configured_client_ids(client, args.all_clients)
+
+        if client_ids and args.slice:
+            backfill_clients(client, client_ids, args.start_date, args.end_date, args.slice, args.workers)
+            logger.info("Google Ads ETL pipeline completed successfully!")
+            return
+
+        if client_ids:
+            summary = load_clients(client, client_ids, window=window)
+            if summary["failed"]:
+                logger.error(f"Google Ads ETL pipeline finished with failed clients: {summary['failed']}")
+            else:
+                logger.info("Google Ads ETL pipeline completed successfully!")
+            return
+
         manager_id = os.getenv("GOOGLE_CUSTOMER_ID").strip()
         linked_clients = list_linked_client_accounts(client, manager_id)
-
         print("\nAvailable linked client accounts:")
         for i, (name, client_id) in enumerate(linked_clients, 1):
             print(f"{i}. {name} (ID: {client_id})")
@@ -183,18 +658,24 @@ def main():
                 print("Invalid input. Please enter a valid number from the list.")
 
         chosen_client_id = linked_clients[choice - 1][1]
+        if args.slice:
+            backfill_clients(client, [chosen_client_id], args.start_date, args.end_date, args.slice, args.workers)
+            logger.info("Google Ads ETL pipeline completed successfully!")
+            return
 
-        start_date = "2025-03-01"
-        end_date = "2025-03-07"
-
-        data = fetch_google_ads_data(client, chosen_client_id, start_date, end_date)
+        window = window or incremental_window("google_ads", chosen_client_id, "google_ads_campaigns_fact")
+        if window is None:
+            logger.info(f"Client {chosen_client_id} is already up to date.")
+            return
+        start_date, end_date = window
 
-        if data:
-            logger.info("Loading data into MySQL.")
-            load_data_into_mysql(data, start_date, end_date)
+        logger.info(f"Streaming {start_date} to {end_date} into MySQL.")
+        total = extract_and_load(client, chosen_client_id, start_date, end_date)
+        if total:
             logger.info("Google Ads ETL pipeline completed successfully!")
         else:
             logger.info("No data found for the given period.")
+        set_watermark("google_ads", chosen_client_id, "google_ads_campaigns_fact", end_date)
 
     except Exception as e:
         logger.error(f"Google Ads ETL pipeline failed: {e}")
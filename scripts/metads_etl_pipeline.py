@@ -1,12 +1,22 @@
 # === Import Required Libraries ===
 import os
 import logging
-import requests
-import pandas as pd
-import mysql.connector
+import argparse
 from datetime import datetime
+from collections import defaultdict
 from dotenv import load_dotenv
 import json
+from utils.state_store import incremental_window, set_watermark, record_loaded_range
+from utils.raw_cache import store_records, read_records, list_windows
+from utils.db_pool import get_connection, bulk_session, packet_chunks
+from utils.metrics import Stage, stage, timed
+from utils.checkpoint import job_checkpoint
+from utils.backfill import SLICE_UNITS, BACKFILL_WORKERS, date_slices, ordered_results
+from utils.dimension_cache import refresh_plan, cached_entities, store_entities
+from utils.load_strategy import (
+    table_strategy, insert_statement, prepare_target, finish_load, abort_load, check_upsert_key,
+    merge_windows, replay_strategy
+)
 
 load_dotenv()
 
@@ -15,23 +25,17 @@ logger = logging.getLogger("meta_ads_etl")
 logger.setLevel(logging.INFO)
 
 log_file_path = os.path.join(os.getenv("LOG_DIR"), 'meta_ads_etl.log')
-file_handler = logging.FileHandler(log_file_path)
+file_handler = logging.FileHandler(log_file_path, delay=True)
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
-logger.info("Meta Ads ETL Pipeline started.")
-
 # === Secure MySQL Connection ===
+# Pooled via utils.db_pool (database from MYSQL_DB); close() returns the connection to the pool
 def create_secure_db_connection():
+    import mysql.connector
     try:
-        conn = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            port=os.getenv("MYSQL_PORT"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database="shopify_etl"
-        )
+        conn = get_connection()
         logger.info("Successfully connected to MySQL.")
         return conn
     except mysql.connector.Error as err:
@@ -39,44 +43,78 @@ def create_secure_db_connection():
         raise
 
 # === Fetch Data from Meta Ads API ===
-def fetch_meta_ads_data(account_id, start_date, end_date):
+# "sync" follows each endpoint one page at a time; "async" fetches all endpoint
+# families concurrently over a pooled session (utils.meta_async_fetcher);
+# "batch" groups every account's calls into Graph API batch requests (utils.meta_batch_fetcher);
+# "report" runs async insights report jobs at finer levels (see Async Report Mode below).
+FETCH_MODE = os.getenv("META_FETCH_MODE", "sync").strip().lower()
+GRAPH_BASE_URL = os.getenv("META_GRAPH_BASE_URL", "https://graph.facebook.com/v22.0")
+
+def graph_get(url, params=None):
+    # Rate limited and retried like every other Graph API call (utils.meta_batch_fetcher)
+    from utils.meta_batch_fetcher import graph_get as get_json
+    return get_json(url, params)
+
+def without_token(url):
+    # A paging.next URL minus its access_token, for storing in a checkpoint
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+    if not url:
+        return url
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != "access_token"]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def graph_pages(url, params, checkpoint=None, item=None):
+    # Follows paging.next and returns every row. With a checkpoint each page is saved as it
+    # arrives, and a rerun continues from the last saved cursor.
+    rows, cursor, finished = checkpoint.pages(item) if checkpoint else ([], None, False)
+    if finished:
+        return rows
+    if cursor:
+        logger.info(f"Resuming {item} after {len(rows)} checkpointed rows.")
+        url, params = cursor, {"access_token": params["access_token"]}
+
+    while url:
+        response = graph_get(url, params)
+        page = response.get("data", [])
+        rows.extend(page)
+        url = response.get("paging", {}).get("next")
+        params = None
+        if checkpoint:
+            checkpoint.add_page(item, page, without_token(url))
+    return rows
+
+def fetch_meta_ads_data(account_id, start_date, end_date, checkpoint=None):
+    # Pages are META_PAGE_LIMIT rows, as in the async and batch engines
+    from utils.meta_async_fetcher import PAGE_LIMIT
     try:
         access_token = os.getenv("META_ACCESS_TOKEN")
-        base_url = f"https://graph.facebook.com/v22.0/{account_id}"
+        base_url = f"{GRAPH_BASE_URL}/{account_id}"
 
         # Fetch campaign-level metadata
         campaigns_url = f"{base_url}/campaigns"
         campaign_params = {
-            "fields": "id,name,status,daily_budget",
+            "fields": "id,name,status,daily_budget,updated_time",
+            "limit": PAGE_LIMIT,
             "access_token": access_token
         }
-        campaigns_response = requests.get(campaigns_url, params=campaign_params).json()
-        all_campaigns = campaigns_response.get("data", [])
-        while "paging" in campaigns_response and "next" in campaigns_response["paging"]:
-            next_url = campaigns_response["paging"]["next"]
-            campaigns_response = requests.get(next_url).json()
-            all_campaigns.extend(campaigns_response.get("data", []))
-
-        campaign_info = {
-            str(c["id"]): {
-                "name": c.get("name", "MISSING_NAME"),
-                "status": c.get("status", "MISSING_STATUS"),
-                "daily_budget": float(c.get("daily_budget", 0)) / 100
-            }
-            for c in all_campaigns
-        }
+        dimensions = dimension_requests(account_id)
+        all_campaigns = []
+        if dimensions["campaigns"] is not None:
+            campaign_params.update(dimensions["campaigns"])
+            all_campaigns = graph_pages(campaigns_url, campaign_params, checkpoint, dimension_item(account_id, "campaigns", dimensions))
 
         # Attribution settings
         adsets_url = f"{base_url}/adsets"
         adsets_params = {
-            "fields": "id,campaign_id,attribution_setting",
+            "fields": "id,campaign_id,attribution_setting,updated_time",
+            "limit": PAGE_LIMIT,
             "access_token": access_token
         }
-        adsets_response = requests.get(adsets_url, params=adsets_params).json()
-        adset_attribution = {
-            adset.get("campaign_id"): adset.get("attribution_setting", "UNKNOWN")
-            for adset in adsets_response.get("data", [])
-        }
+        adsets = []
+        if dimensions["adsets"] is not None:
+            adsets_params.update(dimensions["adsets"])
+            adsets = graph_pages(adsets_url, adsets_params, checkpoint, dimension_item(account_id, "adsets", dimensions))
 
         # Campaign insights with purchase ROAS
         insights_url = f"{base_url}/insights"
@@ -84,149 +122,571 @@ def fetch_meta_ads_data(account_id, start_date, end_date):
             "fields": "campaign_id,spend,reach,impressions,clicks,ctr,cpc,cpm,purchase_roas,actions",
             "time_range": json.dumps({"since": start_date, "until": end_date}),
             "level": "campaign",
+            "limit": PAGE_LIMIT,
             "access_token": access_token
         }
-        insights_response = requests.get(insights_url, params=insights_params).json()
-        data = []
-
-        for campaign in insights_response.get("data", []):
-            campaign_id = campaign.get("campaign_id")
-            spend = float(campaign.get("spend", 0))
-            roas_value = float(next((roas.get("value", 0) for roas in campaign.get("purchase_roas", [])), 0))
-            revenue = spend * roas_value
-
-            logger.info(f"Campaign {campaign_id} | Spend: {spend} | ROAS: {roas_value} | Revenue: {revenue}")
-
-            conversions = int(next(
-                (x.get("value", 0) for x in campaign.get("actions", [])
-                 if x.get("action_type") in ["purchase", "offsite_conversion.fb_pixel_purchase"]),
-                0
-            ))
-            link_clicks = int(next(
-                (x.get("value", 0) for x in campaign.get("actions", [])
-                 if x.get("action_type") in ["link_click", "onsite_link_click"]),
-                0
-            ))
-            cost_per_result = spend / conversions if conversions > 0 else 0
-
-            campaign_name = campaign_info.get(str(campaign_id), {}).get("name", "MISSING_NAME")
-            campaign_status = campaign_info.get(str(campaign_id), {}).get("status", "MISSING_STATUS")
-            budget = campaign_info.get(str(campaign_id), {}).get("daily_budget", 0)
-            attribution_setting = adset_attribution.get(campaign_id, "UNKNOWN")
-            customer_id = account_id.replace("act_", "")
-
-            data.append({
-                "campaign_id": campaign_id,
-                "customer_id": customer_id,
-                "campaign_name": campaign_name,
-                "status": campaign_status,
-                "attribution_setting": attribution_setting,
-                "start_date": start_date,
-                "end_date": end_date,
-                "budget": budget,
-                "amount_spent": spend,
-                "reach": campaign.get("reach", 0),
-                "impressions": campaign.get("impressions", 0),
-                "clicks": campaign.get("clicks", 0),
-                "ctr": campaign.get("ctr", 0),
-                "cpc": campaign.get("cpc", 0),
-                "cpm": campaign.get("cpm", 0),
-                "conversions": conversions,
-                "purchase_roas": roas_value,
-                "revenue": revenue,
-                "link_clicks": link_clicks,
-                "cost_per_result": cost_per_result
-            })
-
-        logger.info(f"{len(data)} campaigns fetched from Meta Ads API.")
-        return data
+        insights = graph_pages(insights_url, insights_params, checkpoint, f"{account_id}.insights")
+
+        all_campaigns, adsets = merge_dimensions(account_id, dimensions, all_campaigns, adsets)
+        cache_raw_responses(account_id, start_date, end_date, all_campaigns, adsets, insights)
+        return transform_meta_ads_data(account_id, start_date, end_date, all_campaigns, adsets, insights)
 
     except Exception as e:
         logger.error(f"Error fetching data from Meta Ads API: {e}")
         raise
 
-# === Load Data into MySQL ===
-def load_data_into_mysql(data):
+def fetch_meta_ads_accounts(account_ids, start_date, end_date, checkpoint=None):
     try:
-        conn = create_secure_db_connection()
-        cursor = conn.cursor()
-
-        insert_query = """
-        INSERT INTO meta_ads_campaigns_fact (
-            campaign_id, customer_id, campaign_name, status, attribution_setting,
-            start_date, end_date, budget, amount_spent, reach, impressions, clicks, ctr, cpc, cpm,
-            conversions, purchase_roas, revenue, link_clicks, cost_per_result
+        if FETCH_MODE == "batch":
+            from utils.meta_batch_fetcher import fetch_raw_accounts_batched as fetch_raw
+        else:
+            from utils.meta_async_fetcher import fetch_raw_accounts as fetch_raw
+
+        # Accounts finished by an earlier, interrupted run come from the checkpoint, together
+        # with the dimension requests they were fetched with
+        dimensions = {account_id: dimension_requests(account_id) for account_id in account_ids}
+        fetched, on_fetched = {}, None
+        if checkpoint:
+            for account_id in account_ids:
+                saved = checkpoint.get(account_id)
+                if saved is not None:
+                    dimensions[account_id], *fetched[account_id] = saved
+            on_fetched = lambda account_id, *edges: checkpoint.save(account_id, [dimensions[account_id], *edges])
+            if fetched:
+                logger.info(f"{len(fetched)} account(s) restored from the checkpoint.")
+        remaining = [account_id for account_id in account_ids if account_id not in fetched]
+        if remaining:
+            for account_id, *edges in fetch_raw(remaining, start_date, end_date, on_fetched=on_fetched, dimensions=dimensions):
+                fetched[account_id] = edges
+
+        frames = []
+        for account_id in account_ids:
+            campaigns, adsets, insights = fetched[account_id]
+            campaigns, adsets = merge_dimensions(account_id, dimensions[account_id], campaigns, adsets)
+            cache_raw_responses(account_id, start_date, end_date, campaigns, adsets, insights)
+            frames.append(transform_meta_ads_data(account_id, start_date, end_date, campaigns, adsets, insights))
+        return combine_frames(frames)
+
+    except Exception as e:
+        logger.error(f"Error fetching data from Meta Ads API: {e}")
+        raise
+
+# === Dimension Cache ===
+# Campaign and adset metadata come from utils.dimension_cache while fresh; otherwise only
+# entities updated since the newest cached one are requested (a full fetch when due).
+
+def dimension_requests(account_id):
+    # Per edge: None when the cache is fresh, otherwise extra query params ({} for a full fetch)
+    from utils.meta_async_fetcher import DIMENSION_EDGES, updated_since_filter
+    dimensions = {}
+    for edge in DIMENSION_EDGES:
+        mode, newest = refresh_plan("meta_ads", account_id, edge)
+        if mode == "cached":
+            dimensions[edge] = None
+        elif mode == "delta":
+            dimensions[edge] = {"filtering": updated_since_filter(newest)}
+        else:
+            dimensions[edge] = {}
+    return dimensions
+
+def dimension_item(account_id, edge, dimensions):
+    # Checkpoint item for an edge's pages; deltas are kept apart so a resumed run never takes
+    # checkpointed delta pages for a full refresh
+    return f"{account_id}.{edge}" + (".delta" if dimensions[edge] else "")
+
+def merge_dimensions(account_id, dimensions, campaigns, adsets):
+    # Full campaign and adset lists: fetched entities merged into the cache, or the cache alone
+    merged = []
+    for edge, fetched in (("campaigns", campaigns), ("adsets", adsets)):
+        if dimensions[edge] is None:
+            merged.append(cached_entities("meta_ads", account_id, edge))
+        else:
+            merged.append(store_entities("meta_ads", account_id, edge, fetched, full=not dimensions[edge]))
+    return merged
+
+def resolve_account_ids():
+    # META_AD_ACCOUNT_IDS takes a comma-separated list or "discover"; falls back to META_AD_ACCOUNT_ID
+    configured = os.getenv("META_AD_ACCOUNT_IDS", "").strip()
+    if configured.lower() == "discover":
+        from utils.meta_batch_fetcher import discover_account_ids
+        return discover_account_ids()
+    if configured:
+        from utils.meta_batch_fetcher import normalize_account_id
+        return [normalize_account_id(a) for a in configured.split(",") if a.strip()]
+    return [os.getenv("META_AD_ACCOUNT_ID")]
+
+# === Raw Response Cache ===
+# Every fetched window is cached under PROCESSED_DIR/raw_cache so --replay can rerun
+# transform and load without calling the API.
+RAW_ENDPOINTS = ("campaigns", "adsets", "insights")
+
+def cache_raw_responses(account_id, start_date, end_date, campaigns, adsets, insights):
+    for endpoint, records in zip(RAW_ENDPOINTS, (campaigns, adsets, insights)):
+        store_records("meta_ads", account_id, endpoint, start_date, end_date, records)
+
+def replay_from_cache(start_date=None, end_date=None, account_ids=None):
+    replayed, frames = 0, []
+    for account_id, window_start, window_end, endpoints in list_windows("meta_ads"):
+        if account_ids and account_id not in account_ids:
+            continue
+        if (start_date and window_end < start_date) or (end_date and window_start > end_date):
+            continue
+        if not set(RAW_ENDPOINTS) <= endpoints:
+            logger.warning(f"Incomplete cache for {account_id} {window_start} to {window_end}; skipped.")
+            continue
+
+        campaigns, adsets, insights = (
+            read_records("meta_ads", account_id, endpoint, window_start, window_end)
+            for endpoint in RAW_ENDPOINTS
+        )
+        frames.append(transform_meta_ads_data(account_id, window_start, window_end, campaigns, adsets, insights))
+        replayed += 1
+        logger.info(f"Replayed {account_id} {window_start} to {window_end} from cache ({len(frames[-1])} rows).")
+
+    # One load for every window, so staging swaps copy the live table once
+    data = combine_frames(frames)
+    if not data.empty:
+        load_data_into_mysql(data, replay_strategy(FACT_TABLE, default="upsert"))
+    return replayed
+
+# === Transform Meta Ads API Responses ===
+# Insights, actions and ROAS are normalized into DataFrames and combined with column
+# operations, so large windows (ad level, daily breakdowns) avoid per-row Python loops.
+INSIGHT_FIELDS = ["campaign_id", "spend", "reach", "impressions", "clicks", "ctr", "cpc", "cpm", "purchase_roas", "actions"]
+ACTION_METRICS = {
+    "purchase": "conversions",
+    "offsite_conversion.fb_pixel_purchase": "conversions",
+    "link_click": "link_clicks",
+    "onsite_link_click": "link_clicks"
+}
+
+def explode_records(column, fields):
+    # One row per list entry, indexed by the insight row it came from
+    import pandas as pd
+    entries = column.explode().dropna()
+    return pd.DataFrame(entries.tolist(), index=entries.index, columns=fields)
+
+def action_metrics(actions):
+    # Pivots action types into conversions / link_clicks, keeping the first matching action in API order
+    import pandas as pd
+    records = explode_records(actions, ["action_type", "value"])
+    records["metric"] = records["action_type"].map(ACTION_METRICS)
+    records = records.dropna(subset=["metric"])
+    pivoted = records.groupby([records.index, "metric"])["value"].first().unstack("metric")
+    pivoted = pivoted.reindex(index=actions.index, columns=["conversions", "link_clicks"])
+    return pivoted.apply(pd.to_numeric).fillna(0).astype(int)
+
+def first_roas(purchase_roas):
+    import pandas as pd
+    records = explode_records(purchase_roas, ["value"])
+    first = records[~records.index.duplicated()]["value"]
+    return pd.to_numeric(first.reindex(purchase_roas.index)).fillna(0).astype(float)
+
+def campaign_dimension(all_campaigns, adsets):
+    # Campaign metadata and adset attribution keyed by campaign id (last entry wins, as the API pages)
+    import pandas as pd
+    campaigns = pd.DataFrame(all_campaigns, columns=["id", "name", "status", "daily_budget"])
+    campaigns = campaigns.rename(columns={"id": "campaign_key"}).astype({"campaign_key": str})
+    campaigns["daily_budget"] = pd.to_numeric(campaigns["daily_budget"]) / 100
+    attribution = pd.DataFrame(adsets, columns=["campaign_id", "attribution_setting"])
+    attribution = attribution.rename(columns={"campaign_id": "campaign_key"}).astype({"campaign_key": str})
+    return campaigns.drop_duplicates("campaign_key", keep="last").merge(
+        attribution.drop_duplicates("campaign_key", keep="last"), on="campaign_key", how="outer"
+    )
+
+def metric_columns(frame):
+    # Delivery, spend and conversion columns shared by the campaign and report transforms
+    import pandas as pd
+    spend = pd.to_numeric(frame["spend"]).fillna(0).astype(float)
+    roas_value = first_roas(frame["purchase_roas"])
+    actions = action_metrics(frame["actions"])
+    conversions = actions["conversions"]
+    return {
+        "amount_spent": spend,
+        "reach": frame["reach"].fillna(0),
+        "impressions": frame["impressions"].fillna(0),
+        "clicks": frame["clicks"].fillna(0),
+        "ctr": frame["ctr"].fillna(0),
+        "cpc": frame["cpc"].fillna(0),
+        "cpm": frame["cpm"].fillna(0),
+        "conversions": conversions,
+        "purchase_roas": roas_value,
+        "revenue": spend * roas_value,
+        "link_clicks": actions["link_clicks"],
+        "cost_per_result": (spend / conversions.where(conversions > 0)).fillna(0)
+    }
+
+def transform_meta_ads_data(account_id, start_date, end_date, all_campaigns, adsets, insights):
+    import pandas as pd
+    with stage("meta", "transform", account_id=account_id) as transform:
+        transform.add(rows_in=len(insights))
+        if not insights:
+            logger.info("0 campaigns fetched from Meta Ads API.")
+            return pd.DataFrame(columns=FACT_COLUMNS)
+
+        frame = pd.DataFrame(insights).reindex(columns=INSIGHT_FIELDS)
+        frame["campaign_key"] = frame["campaign_id"].astype(str)
+        frame = frame.merge(campaign_dimension(all_campaigns, adsets), on="campaign_key", how="left")
+
+        data = pd.DataFrame({
+            "campaign_id": frame["campaign_id"],
+            "customer_id": account_id.replace("act_", ""),
+            "campaign_name": frame["name"].fillna("MISSING_NAME"),
+            "status": frame["status"].fillna("MISSING_STATUS"),
+            "attribution_setting": frame["attribution_setting"].fillna("UNKNOWN"),
+            "start_date": start_date,
+            "end_date": end_date,
+            "budget": frame["daily_budget"].fillna(0).astype(float),
+            **metric_columns(frame)
+        }, columns=FACT_COLUMNS)
+
+        logger.info(
+            f"{len(data)} campaigns fetched from Meta Ads API | "
+            f"Spend: {data['amount_spent'].sum():.2f} | Revenue: {data['revenue'].sum():.2f}"
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE
-            campaign_name = VALUES(campaign_name),
-            status = VALUES(status),
-            budget = VALUES(budget),
-            amount_spent = VALUES(amount_spent),
-            reach = VALUES(reach),
-            impressions = VALUES(impressions),
-            clicks = VALUES(clicks),
-            ctr = VALUES(ctr),
-            cpc = VALUES(cpc),
-            cpm = VALUES(cpm),
-            conversions = VALUES(conversions),
-            purchase_roas = VALUES(purchase_roas),
-            revenue = VALUES(revenue),
-            link_clicks = VALUES(link_clicks),
-            cost_per_result = VALUES(cost_per_result);
-        """
-
-        insert_data = [
-            (
-                row.get("campaign_id"),
-                row.get("customer_id"),
-                row.get("campaign_name"),
-                row.get("status"),
-                row.get("attribution_setting"),
-                row.get("start_date"),
-                row.get("end_date"),
-                row.get("budget"),
-                row.get("amount_spent"),
-                row.get("reach"),
-                row.get("impressions"),
-                row.get("clicks"),
-                row.get("ctr"),
-                row.get("cpc"),
-                row.get("cpm"),
-                row.get("conversions"),
-                row.get("purchase_roas"),
-                row.get("revenue"),
-                row.get("link_clicks"),
-                row.get("cost_per_result")
-            )
-            for row in data
-        ]
-
-        cursor.executemany(insert_query, insert_data)
-        conn.commit()
-        logger.info(f"{cursor.rowcount} rows inserted/updated in meta_ads_campaigns_fact.")
-        cursor.close()
-        conn.close()
+        transform.add(rows_out=len(data))
+        return data
+
+def combine_frames(frames):
+    import pandas as pd
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=FACT_COLUMNS)
+
+# === Load Data into MySQL ===
+# META_ADS_CAMPAIGNS_FACT_LOAD_STRATEGY (or ETL_LOAD_STRATEGY) picks append, upsert or staging_swap
+FACT_TABLE = "meta_ads_campaigns_fact"
+FACT_COLUMNS = [
+    "campaign_id", "customer_id", "campaign_name", "status", "attribution_setting",
+    "start_date", "end_date", "budget", "amount_spent", "reach", "impressions", "clicks", "ctr", "cpc", "cpm",
+    "conversions", "purchase_roas", "revenue", "link_clicks", "cost_per_result"
+]
+KEY_COLUMNS = ["campaign_id", "start_date"]
+
+def frame_rows(data, columns):
+    # Plain Python values (None for NaN) so the connector can bind numpy-backed columns
+    values = data[columns].astype(object)
+    return list(values.where(data[columns].notna(), None).itertuples(index=False, name=None))
+
+def load_data_into_mysql(data, strategy=None):
+    try:
+        with stage("meta", "load", table=FACT_TABLE) as load:
+            strategy = strategy or table_strategy(FACT_TABLE, default="upsert")
+            conn = create_secure_db_connection()
+            try:
+                target = prepare_target(conn, FACT_TABLE, strategy)
+                cursor = conn.cursor()
+
+                insert_query = insert_statement(target, FACT_COLUMNS, strategy, KEY_COLUMNS)
+                insert_data = frame_rows(data, FACT_COLUMNS)
+
+                try:
+                    with bulk_session(conn, strategy):
+                        for batch in packet_chunks(conn, insert_data):
+                            cursor.executemany(insert_query, batch)
+                        conn.commit()
+                except Exception:
+                    abort_load(conn, FACT_TABLE, strategy)
+                    raise
+
+                # Staging swaps keep every live row outside the reloaded (account, window) slices
+                windows = sorted(set(data[["customer_id", "start_date", "end_date"]].itertuples(index=False, name=None)))
+                retained = merge_windows(windows)
+                slices = " OR ".join(["(customer_id = %s AND start_date >= %s AND end_date <= %s)"] * len(retained))
+                finish_load(conn, FACT_TABLE, strategy, f"NOT ({slices})" if retained else None,
+                            tuple(value for window in retained for value in window))
+                for start_date, end_date in sorted({window[1:] for window in windows}):
+                    record_loaded_range(FACT_TABLE, start_date, end_date, len(insert_data))
+
+                load.add(rows_in=len(data), rows_out=len(insert_data))
+                logger.info(f"{len(insert_data)} rows written to meta_ads_campaigns_fact ({strategy}).")
+                cursor.close()
+            finally:
+                conn.close()
 
     except Exception as e:
         logger.error(f"Error inserting data into MySQL: {e}")
         raise
 
-# === Main Pipeline ===
-def main():
+# === Async Report Mode ===
+# META_FETCH_MODE=report submits async insights report runs (utils.meta_report_jobs) at
+# META_REPORT_LEVEL (campaign, adset or ad), split by META_REPORT_TIME_INCREMENT days and
+# META_REPORT_BREAKDOWNS, and streams each finished result page into meta_ads_insights_fact.
+REPORT_TABLE = "meta_ads_insights_fact"
+REPORT_COLUMNS = [
+    "customer_id", "level", "campaign_id", "campaign_name", "adset_id", "adset_name", "ad_id", "ad_name",
+    "date_start", "date_stop", "breakdown_key", "amount_spent", "reach", "impressions", "clicks", "ctr", "cpc", "cpm",
+    "conversions", "purchase_roas", "revenue", "link_clicks", "cost_per_result"
+]
+REPORT_KEY_COLUMNS = [
+    "customer_id", "level", "campaign_id", "adset_id", "ad_id", "date_start", "date_stop", "breakdown_key"
+]
+REPORT_ENTITY_FIELDS = ["campaign_id", "campaign_name", "adset_id", "adset_name", "ad_id", "ad_name"]
+
+# Created on the first report load; the unique key is what the default upsert strategy updates on
+CREATE_REPORT_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {REPORT_TABLE} (
+        customer_id VARCHAR(32) NOT NULL,
+        level VARCHAR(16) NOT NULL,
+        campaign_id VARCHAR(32) NOT NULL,
+        campaign_name VARCHAR(255),
+        adset_id VARCHAR(32) NOT NULL,
+        adset_name VARCHAR(255),
+        ad_id VARCHAR(32) NOT NULL,
+        ad_name VARCHAR(255),
+        date_start DATE NOT NULL,
+        date_stop DATE NOT NULL,
+        breakdown_key VARCHAR(255) NOT NULL,
+        amount_spent DOUBLE,
+        reach DOUBLE,
+        impressions DOUBLE,
+        clicks DOUBLE,
+        ctr DOUBLE,
+        cpc DOUBLE,
+        cpm DOUBLE,
+        conversions DOUBLE,
+        purchase_roas DOUBLE,
+        revenue DOUBLE,
+        link_clicks DOUBLE,
+        cost_per_result DOUBLE,
+        CONSTRAINT uq_{REPORT_TABLE}_load UNIQUE ({", ".join(REPORT_KEY_COLUMNS)})
+    )
+"""
+
+def breakdown_keys(frame, breakdowns):
+    # "age=25-34|gender=female"; empty without breakdowns so it can sit in the unique key
+    import pandas as pd
+    keys = pd.Series("", index=frame.index)
+    for i, name in enumerate(breakdowns):
+        keys = keys + ("|" if i else "") + f"{name}=" + frame[name].fillna("").astype(str)
+    return keys
+
+def transform_report_rows(account_id, level, breakdowns, rows):
+    import pandas as pd
+    fields = list(dict.fromkeys([*REPORT_ENTITY_FIELDS, "date_start", "date_stop", *INSIGHT_FIELDS, *breakdowns]))
+    frame = pd.DataFrame(rows).reindex(columns=fields)
+    return pd.DataFrame({
+        "customer_id": account_id.replace("act_", ""),
+        "level": level,
+        # Ids above the report level are blank rather than NULL so the unique key still applies
+        **{field: frame[field].fillna("") for field in REPORT_ENTITY_FIELDS},
+        "date_start": frame["date_start"],
+        "date_stop": frame["date_stop"],
+        "breakdown_key": breakdown_keys(frame, breakdowns),
+        **metric_columns(frame)
+    }, columns=REPORT_COLUMNS)
+
+def load_report_pages(pages, level, breakdowns, windows):
+    # Loads (account_id, rows) pages as they arrive over one connection. Staging swaps keep
+    # every live row outside this level's reloaded (customer_id, start_date, end_date) windows.
+    # Waiting on report runs and pages is the extract stage; page transforms share one stage.
+    transform = Stage("meta", "transform", level=level)
     try:
-        logger.info("Starting Meta Ads data extraction.")
-        start_date = "2025-02-22"
-        end_date = "2025-02-28"
-        account_id = os.getenv("META_AD_ACCOUNT_ID")
+        with stage("meta", "load", table=REPORT_TABLE, level=level) as load:
+            strategy = table_strategy(REPORT_TABLE, default="upsert")
+            conn = create_secure_db_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(CREATE_REPORT_TABLE)
+                if strategy == "upsert":
+                    check_upsert_key(conn, REPORT_TABLE, REPORT_KEY_COLUMNS)
+                target = prepare_target(conn, REPORT_TABLE, strategy)
+                insert_query = insert_statement(target, REPORT_COLUMNS, strategy, REPORT_KEY_COLUMNS)
 
-        data = fetch_meta_ads_data(account_id, start_date, end_date)
-        if data:
-            logger.info("Loading data into MySQL.")
-            load_data_into_mysql(data)
-            logger.info("Meta Ads ETL pipeline completed successfully!")
+                total = 0
+                pages = timed(pages, "meta", "extract", size=lambda page: len(page[1]), level=level)
+                try:
+                    with bulk_session(conn, strategy):
+                        for account_id, rows in pages:
+                            with transform.measure():
+                                data = transform_report_rows(account_id, level, breakdowns, rows)
+                                insert_data = frame_rows(data, REPORT_COLUMNS)
+                                transform.add(rows_in=len(rows), rows_out=len(data))
+                            for batch in packet_chunks(conn, insert_data):
+                                cursor.executemany(insert_query, batch)
+                            conn.commit()
+                            total += len(data)
+                except Exception:
+                    abort_load(conn, REPORT_TABLE, strategy)
+                    raise
+
+                windows = merge_windows(windows)
+                slices = " OR ".join(["(customer_id = %s AND level = %s AND date_start >= %s AND date_stop <= %s)"] * len(windows))
+                finish_load(conn, REPORT_TABLE, strategy, f"NOT ({slices})" if windows else None,
+                            tuple(value for customer_id, start, end in windows for value in (customer_id, level, start, end)))
+
+                load.add(rows_in=total, rows_out=total)
+                logger.info(f"{total} {level} rows written to {REPORT_TABLE} ({strategy}).")
+                cursor.close()
+            finally:
+                conn.close()
+            return total
+
+    except Exception as e:
+        logger.error(f"Error loading report rows into MySQL: {e}")
+        raise
+    finally:
+        transform.emit()
+
+def fetch_and_load_reports(account_ids, start_date, end_date):
+    from utils.meta_report_jobs import fetch_report_pages, REPORT_LEVEL, REPORT_BREAKDOWNS
+
+    pages = fetch_report_pages(account_ids, start_date, end_date)
+    windows = [(account_id.replace("act_", ""), start_date, end_date) for account_id in account_ids]
+    return load_report_pages(pages, REPORT_LEVEL, REPORT_BREAKDOWNS, windows)
+
+# === Main Pipeline ===
+def fetch_window(account_ids, start_date, end_date, checkpoint=None):
+    if FETCH_MODE in ("async", "batch"):
+        return fetch_meta_ads_accounts(account_ids, start_date, end_date, checkpoint)
+    return combine_frames(
+        fetch_meta_ads_data(account_id, start_date, end_date, checkpoint) for account_id in account_ids
+    )
+
+def state_table_name():
+    # Report mode keeps a separate watermark per level
+    if FETCH_MODE == "report":
+        from utils.meta_report_jobs import REPORT_LEVEL
+        return f"{REPORT_TABLE}.{REPORT_LEVEL}"
+    return FACT_TABLE
+
+def run_accounts(account_ids=None, start_date=None, end_date=None, slice_unit=None, workers=BACKFILL_WORKERS):
+    # Loads the given (or configured) accounts; an explicit start/end date replaces the
+    # watermark windows, and a slice_unit backfills that range in date slices.
+    # Used by main and the orchestrator.
+    if account_ids:
+        from utils.meta_batch_fetcher import normalize_account_id
+        account_ids = [normalize_account_id(account_id) for account_id in account_ids]
+    else:
+        account_ids = resolve_account_ids()
+    if slice_unit and start_date and end_date:
+        return backfill_accounts(account_ids, start_date, end_date, slice_unit, workers)
+
+    state_table = state_table_name()
+
+    # Accounts sharing a watermark window are fetched together
+    windows = defaultdict(list)
+    for account_id in account_ids:
+        if start_date and end_date:
+            window = (start_date, end_date)
+        else:
+            window = incremental_window("meta_ads", account_id, state_table)
+        if window is None:
+            logger.info(f"{account_id} is already up to date.")
+            continue
+        windows[window].append(account_id)
+
+    for (window_start, window_end), window_accounts in windows.items():
+        logger.info(f"Fetching {len(window_accounts)} account(s) for {window_start} to {window_end}.")
+        # Fetched pages and accounts are checkpointed until the window is loaded, so a rerun
+        # after a crash or exhausted retries skips what was already fetched
+        checkpoint = None
+        if FETCH_MODE != "report":
+            checkpoint = job_checkpoint("meta_ads", f"{state_table}.{window_start}.{window_end}")
+        if FETCH_MODE == "report":
+            fetch_and_load_reports(window_accounts, window_start, window_end)
         else:
-            logger.info("No data found for the given period.")
+            # Sync mode transforms per account while fetching; those transform stages nest inside
+            with stage("meta", "extract", accounts=len(window_accounts), start_date=window_start) as extract:
+                data = fetch_window(window_accounts, window_start, window_end, checkpoint)
+                extract.add(rows_out=len(data))
+            if not data.empty:
+                logger.info("Loading data into MySQL.")
+                load_data_into_mysql(data)
+            else:
+                logger.info("No data found for the given period.")
+        for account_id in window_accounts:
+            set_watermark("meta_ads", account_id, state_table, window_end)
+        if checkpoint:
+            checkpoint.clear()
+
+# === Date-Sliced Backfill ===
+# --slice splits an explicit range into day, week or month slices (utils.backfill), so no
+# insights request spans the whole range. BACKFILL_WORKERS slices are fetched at a time and
+# loaded in date order as they complete. Loaded slices are checkpointed, so rerunning the same
+# backfill starts at the first slice that did not load. Staging swaps publish every slice in
+# one swap at the end; report mode runs one slice after another, as its report runs for the
+# accounts of a slice already execute in parallel.
+
+def extract_slice(account_ids, start_date, end_date):
+    checkpoint = job_checkpoint("meta_ads", f"{FACT_TABLE}.{start_date}.{end_date}")
+    with stage("meta", "extract", accounts=len(account_ids), start_date=start_date) as extract:
+        data = fetch_window(account_ids, start_date, end_date, checkpoint)
+        extract.add(rows_out=len(data))
+    return data, checkpoint
+
+def backfill_accounts(account_ids, start_date, end_date, unit, workers=BACKFILL_WORKERS):
+    state_table = state_table_name()
+    staged = FETCH_MODE != "report" and table_strategy(FACT_TABLE, default="upsert") == "staging_swap"
+    checkpoint = None if staged else job_checkpoint("meta_ads", f"backfill.{state_table}.{start_date}.{end_date}.{unit}")
+    slices = date_slices(start_date, end_date, unit)
+    todo = [window for window in slices if not (checkpoint and checkpoint.get(window[0]) is not None)]
+    logger.info(
+        f"Backfilling {len(account_ids)} account(s) from {start_date} to {end_date} in {len(slices)} {unit} slice(s); "
+        f"{len(todo)} to fetch with {workers if FETCH_MODE != 'report' else 1} workers."
+    )
+
+    def slice_loaded(window, rows):
+        for account_id in account_ids:
+            set_watermark("meta_ads", account_id, state_table, window[1])
+        if checkpoint:
+            checkpoint.save(window[0], rows)
+        logger.info(f"Slice {window[0]} to {window[1]}: {rows} rows loaded.")
+
+    # Started only when iterated, so report mode never fetches through it
+    results = ordered_results(lambda window: extract_slice(account_ids, *window), todo, workers)
+    if FETCH_MODE == "report":
+        for window in todo:
+            slice_loaded(window, fetch_and_load_reports(account_ids, *window))
+    elif staged:
+        results = list(results)
+        data = combine_frames(frame for _, (frame, _) in results)
+        if not data.empty:
+            load_data_into_mysql(data)
+        for window, (frame, slice_checkpoint) in results:
+            slice_loaded(window, len(frame))
+            if slice_checkpoint:
+                slice_checkpoint.clear()
+    else:
+        for window, (data, slice_checkpoint) in results:
+            if not data.empty:
+                load_data_into_mysql(data)
+            slice_loaded(window, len(data))
+            if slice_checkpoint:
+                slice_checkpoint.clear()
+
+    if checkpoint:
+        checkpoint.clear()
+    logger.info(f"Backfill of {len(account_ids)} account(s) from {start_date} to {end_date} completed.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Meta Ads ETL pipeline")
+    parser.add_argument("--replay", action="store_true",
+                        help="rerun transform and load from the raw cache without calling the API")
+    parser.add_argument("--start-date",
+                        help="load from this date instead of the watermark (with --replay: windows ending on or after it)")
+    parser.add_argument("--end-date",
+                        help="load up to this date (with --replay: windows starting on or before it)")
+    parser.add_argument("--account-id", action="append", default=[], help="only this account (repeatable)")
+    parser.add_argument("--slice", choices=SLICE_UNITS,
+                        help="backfill --start-date..--end-date in day, week or month slices fetched in parallel")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="slices fetched at the same time with --slice")
+    args = parser.parse_args(argv)
+    if not args.replay and bool(args.start_date) != bool(args.end_date):
+        parser.error("--start-date and --end-date must be given together")
+    if args.slice and (args.replay or not args.start_date):
+        parser.error("--slice needs --start-date and --end-date and cannot be used with --replay")
+
+    logger.info("Meta Ads ETL Pipeline started.")
+    try:
+        if args.replay:
+            logger.info("Replaying Meta Ads data from the raw cache.")
+            replayed = replay_from_cache(args.start_date, args.end_date, args.account_id)
+            logger.info(f"Meta Ads replay completed ({replayed} windows).")
+            return
+
+        logger.info("Starting Meta Ads data extraction.")
+        run_accounts(args.account_id, args.start_date, args.end_date, args.slice, args.workers)
+        logger.info("Meta Ads ETL pipeline completed successfully!")
 
     except Exception as e:
         logger.error(f"Meta Ads ETL pipeline failed: {e}")
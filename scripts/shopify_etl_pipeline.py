@@ -1,192 +1,709 @@
 # === Imports ===
 import os
+import io
 import csv
-import mysql.connector
+import time
+import shutil
+import fnmatch
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+from collections import defaultdict
 from dotenv import load_dotenv
 from config.logging_config import setup_logging  
-from utils.input_validator import validate_csv  
+from utils.input_validator import validate_csv, validated_rows, RejectFile
+from utils.state_store import (
+    incremental_start, set_watermark, loaded_file, record_loaded_file, record_loaded_range
+)
+from utils.db_pool import get_connection, bulk_session, packet_chunks
+from utils.metrics import Stage, stage, timed
+from utils.row_fingerprints import RowFingerprints
+from utils.load_strategy import (
+    table_strategy, insert_statement, load_data_modifier, prepare_target, finish_load,
+    abort_load, check_upsert_key
+)
 
 # === Load environment variables and setup logger ===
 load_dotenv()
 logger = setup_logging()
 
+# === Load Settings ===
+# "bulk" streams each file into a single LOAD DATA LOCAL INFILE per table;
+# "executemany" keeps the original batched INSERT path.
+LOAD_MODE = os.getenv("SHOPIFY_LOAD_MODE", "bulk").strip().lower()
+BATCH_SIZE = int(os.getenv("SHOPIFY_BATCH_SIZE", "100"))
+
+# "csv" parses rows with the csv module; "mmap" memory-maps staged files and parses them
+# into typed columns with pyarrow (see Memory-Mapped Reader below)
+CSV_READER = os.getenv("SHOPIFY_CSV_READER", "csv").strip().lower()
+
+# WORKERS > 1 loads tables in parallel, splitting files into CHUNK_BYTES byte ranges
+WORKERS = int(os.getenv("SHOPIFY_WORKERS", "1"))
+CHUNK_BYTES = int(os.getenv("SHOPIFY_CHUNK_BYTES", str(64 * 1024 * 1024)))
+
+# Dated tables only load days after the stored watermark, minus the lookback.
+# The lookback defaults to 0 because the default append strategy uses plain INSERTs;
+# raise it together with SHOPIFY tables' *_LOAD_STRATEGY=upsert or staging_swap.
+WATERMARK_ACCOUNT = os.getenv("SHOPIFY_STORE", "default")
+LOOKBACK_DAYS = int(os.getenv("SHOPIFY_LOOKBACK_DAYS", "0"))
+
+# Rows identical to ones already loaded into a table are dropped before MySQL (see
+# utils.row_fingerprints). Append tables only: the store remembers every row value ever
+# loaded, so an upserted row that changes and changes back would keep the middle value,
+# and staging_swap must rewrite every row it keeps.
+ROW_DEDUP = os.getenv("SHOPIFY_ROW_DEDUP", "1").strip() == "1"
+
+# MySQL errors raised when LOCAL INFILE is disabled on the client or server
+LOCAL_INFILE_ERRNOS = {1148, 2068, 3948, 3950}
+
 # === Connect to Database ===
-def create_db_connection():
+# Connections come from the shared pool (utils.db_pool); close() returns them to it
+def create_db_connection(allow_local_infile=False):
+    import mysql.connector
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv("MYSQL_HOST"),
-            port=os.getenv("MYSQL_PORT"),
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            database=os.getenv("MYSQL_DB")
-        )
+        connection = get_connection(allow_local_infile)
         logger.info("✅ Successfully connected to MySQL.")
         return connection
     except mysql.connector.Error as err:
         logger.error(f"❌ Database connection failed: {err}")
         raise
 
-# === ETL Processing Functions ===
+# === Load Engines ===
 
-def process_sales_summary():
-    try:
-        file_path = os.path.join(os.getenv("STAGING_DIR"), "feb_sales_summary.csv")
-        expected_columns = [
-            "Day", "Shipping region", "Shipping city", "Order UTM source", "Order UTM medium",
-            "Order UTM campaign", "Referring channel", "Total sales", "Gross sales",
-            "Discounts", "Shipping charges", "Taxes", "Net sales"
-        ]
-        validate_csv(file_path, expected_columns)
+def insert_rows_batched(conn, table, columns, rows, batch_size=BATCH_SIZE, strategy="append", key_columns=()):
+    insert_query = insert_statement(table, columns, strategy, key_columns)
 
-        conn = create_db_connection()
-        cursor = conn.cursor()
-        batch = []
-
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                batch.append((
-                    row["Day"], row["Shipping region"], row["Shipping city"],
-                    row["Order UTM source"], row["Order UTM medium"], row["Order UTM campaign"],
-                    row["Referring channel"], float(row["Total sales"].replace(',', '')),
-                    float(row["Gross sales"].replace(',', '')), float(row["Discounts"].replace(',', '')),
-                    float(row["Shipping charges"].replace(',', '')), float(row["Taxes"].replace(',', '')),
-                    float(row["Net sales"].replace(',', ''))
-                ))
-
-                if len(batch) == 100:
-                    cursor.executemany("""
-                        INSERT INTO sales_fact (
-                            day, shipping_region, shipping_city, order_utm_source, order_utm_medium,
-                            order_utm_campaign, referring_channel, total_sales, gross_sales,
-                            discounts, shipping_charges, taxes, net_sales
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, batch)
-                    conn.commit()
-                    batch.clear()
-
-            if batch:
-                cursor.executemany("""
-                    INSERT INTO sales_fact (
-                        day, shipping_region, shipping_city, order_utm_source, order_utm_medium,
-                        order_utm_campaign, referring_channel, total_sales, gross_sales,
-                        discounts, shipping_charges, taxes, net_sales
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, batch)
+    cursor = conn.cursor()
+    total = 0
+    try:
+        with bulk_session(conn, strategy):
+            for batch in packet_chunks(conn, rows, batch_size):
+                cursor.executemany(insert_query, batch)
                 conn.commit()
-
+                total += len(batch)
+    finally:
         cursor.close()
-        conn.close()
-        logger.info("✅ Sales summary ETL completed.")
 
-    except Exception as e:
-        logger.error(f"❌ Error in Sales Summary ETL: {e}")
+    return total
 
-def process_sessions_location():
+def bulk_load_rows(conn, table, columns, rows, strategy="append"):
+    # Sanitized rows are spooled to a temp CSV so the whole table goes over in one statement
+    import mysql.connector
+    load_query = f"""
+        LOAD DATA LOCAL INFILE %s {load_data_modifier(strategy)} INTO TABLE {table}
+        CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+        LINES TERMINATED BY '\\n'
+        ({', '.join(columns)})
+    """
+
+    spool = tempfile.NamedTemporaryFile(
+        mode='w', encoding='utf-8', newline='', suffix='.csv', delete=False
+    )
     try:
-        file_path = os.path.join(os.getenv("STAGING_DIR"), "feb_sessions_by_location.csv")
-        expected_columns = [
-            "Session country", "Session region", "Session city",
-            "Online store visitors", "Sessions"
-        ]
-        validate_csv(file_path, expected_columns)
+        total = 0
+        with spool:
+            writer = csv.writer(spool, lineterminator='\n')
+            for row in rows:
+                writer.writerow(row)
+                total += 1
 
-        conn = create_db_connection()
         cursor = conn.cursor()
-        batch = []
-
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                batch.append((
-                    row["Session country"], row["Session region"], row["Session city"],
-                    int(row["Online store visitors"].replace(',', '')),
-                    int(row["Sessions"].replace(',', ''))
-                ))
-
-                if len(batch) == 100:
-                    cursor.executemany("""
-                        INSERT INTO sessions_by_location_fact (
-                            session_country, session_region, session_city, 
-                            online_store_visitors, sessions
-                        ) VALUES (%s, %s, %s, %s, %s)
-                    """, batch)
-                    conn.commit()
-                    batch.clear()
-
-            if batch:
-                cursor.executemany("""
-                    INSERT INTO sessions_by_location_fact (
-                        session_country, session_region, session_city, 
-                        online_store_visitors, sessions
-                    ) VALUES (%s, %s, %s, %s, %s)
-                """, batch)
+        try:
+            with bulk_session(conn, strategy):
+                cursor.execute(load_query, (spool.name,))
                 conn.commit()
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    finally:
+        os.remove(spool.name)
 
-        cursor.close()
+    return total
+
+def load_rows(table, columns, make_rows, strategy="append", key_columns=(), conn=None):
+    # make_rows re-opens the source file, so the fallback path can stream it a second time.
+    # executemany loads reuse conn (the table's control connection) when given, so a table
+    # holds one connection from the default pool rather than two.
+    import mysql.connector
+    if LOAD_MODE == "bulk":
+        conn = create_db_connection(allow_local_infile=True)
+        try:
+            return bulk_load_rows(conn, table, columns, make_rows(), strategy)
+        except mysql.connector.Error as err:
+            if err.errno not in LOCAL_INFILE_ERRNOS:
+                raise
+            logger.warning(f"⚠️ LOCAL INFILE unavailable for {table} ({err}); falling back to executemany.")
+            return insert_rows_batched(conn, table, columns, make_rows(), BATCH_SIZE, strategy, key_columns)
+        finally:
+            conn.close()
+
+    if conn is not None:
+        return insert_rows_batched(conn, table, columns, make_rows(), BATCH_SIZE, strategy, key_columns)
+    conn = create_db_connection()
+    try:
+        return insert_rows_batched(conn, table, columns, make_rows(), BATCH_SIZE, strategy, key_columns)
+    finally:
         conn.close()
-        logger.info("✅ Sessions by location ETL completed.")
 
-    except Exception as e:
-        logger.error(f"❌ Error in Sessions by Location ETL: {e}")
+def begin_table_load(spec):
+    # Returns (control connection, strategy, table to write into)
+    strategy = table_strategy(spec["table"])
+    conn = create_db_connection()
+    try:
+        if strategy == "upsert":
+            check_upsert_key(conn, spec["table"], spec["key_columns"])
+        return conn, strategy, prepare_target(conn, spec["table"], strategy)
+    except Exception:
+        conn.close()
+        raise
 
-def process_page_sessions():
+def end_table_load(conn, spec, strategy, total, min_day=None, max_day=None, failed=False):
+    # Publishes (or discards) the load; an empty staging table is never swapped in
+    try:
+        if failed or not total:
+            abort_load(conn, spec["table"], strategy)
+            return
+
+        retain_where, retain_params = None, ()
+        if spec.get("date_column") and min_day:
+            retain_where = f"{spec['date_column']} NOT BETWEEN %s AND %s"
+            retain_params = (min_day, max_day)
+        finish_load(conn, spec["table"], strategy, retain_where, retain_params)
+        if max_day:
+            record_loaded_range(spec["table"], min_day, max_day, total)
+            set_watermark("shopify", WATERMARK_ACCOUNT, spec["table"], max_day)
+    finally:
+        conn.close()
+
+# === Column Converters ===
+
+def to_text(value):
+    return value
+
+def to_float(value):
     try:
-        file_path = os.path.join(os.getenv("STAGING_DIR"), "feb_sessions_by_day.csv")
-        expected_columns = [
-            "Day", "Landing page path", "Sessions", "Conversion rate"
+        return float(value)
+    except ValueError:
+        return float(value.replace(',', ''))
+
+def to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return int(value.replace(',', ''))
+
+def to_ratio(value):
+    return float(value.replace('%', '').strip()) / 100
+
+def to_day(value):
+    # Incremental loads compare days as strings, so only YYYY-MM-DD is accepted
+    if len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError(f"'{value}' is not a YYYY-MM-DD day")
+    return value
+
+# === Table Specs ===
+# Each column is (CSV header, MySQL column, converter); date_column names the
+# ISO-formatted day column used for incremental loads; key_columns identify a row for upserts.
+# file_pattern matches the spec's exports in watch mode, whatever month prefix they carry.
+
+SALES_SUMMARY_SPEC = {
+    "name": "Sales Summary",
+    "file_name": "feb_sales_summary.csv",
+    "file_pattern": "*sales_summary*.csv",
+    "table": "sales_fact",
+    "date_column": "day",
+    "key_columns": [
+        "day", "shipping_region", "shipping_city", "order_utm_source", "order_utm_medium",
+        "order_utm_campaign", "referring_channel"
+    ],
+    "columns": [
+        ("Day", "day", to_day),
+        ("Shipping region", "shipping_region", to_text),
+        ("Shipping city", "shipping_city", to_text),
+        ("Order UTM source", "order_utm_source", to_text),
+        ("Order UTM medium", "order_utm_medium", to_text),
+        ("Order UTM campaign", "order_utm_campaign", to_text),
+        ("Referring channel", "referring_channel", to_text),
+        ("Total sales", "total_sales", to_float),
+        ("Gross sales", "gross_sales", to_float),
+        ("Discounts", "discounts", to_float),
+        ("Shipping charges", "shipping_charges", to_float),
+        ("Taxes", "taxes", to_float),
+        ("Net sales", "net_sales", to_float)
+    ]
+}
+
+SESSIONS_LOCATION_SPEC = {
+    "name": "Sessions by Location",
+    "file_name": "feb_sessions_by_location.csv",
+    "file_pattern": "*sessions_by_location*.csv",
+    "table": "sessions_by_location_fact",
+    "key_columns": ["session_country", "session_region", "session_city"],
+    "columns": [
+        ("Session country", "session_country", to_text),
+        ("Session region", "session_region", to_text),
+        ("Session city", "session_city", to_text),
+        ("Online store visitors", "online_store_visitors", to_int),
+        ("Sessions", "sessions", to_int)
+    ]
+}
+
+PAGE_SESSIONS_SPEC = {
+    "name": "Page Sessions",
+    "file_name": "feb_sessions_by_day.csv",
+    "file_pattern": "*sessions_by_day*.csv",
+    "table": "page_sessions_fact",
+    "date_column": "day",
+    "key_columns": ["day", "landing_page_path"],
+    "columns": [
+        ("Day", "day", to_day),
+        ("Landing page path", "landing_page_path", to_text),
+        ("Sessions", "sessions", to_int),
+        ("Conversion rate", "conversion_rate", to_ratio)
+    ]
+}
+
+TABLE_SPECS = [SALES_SUMMARY_SPEC, SESSIONS_LOCATION_SPEC, PAGE_SESSIONS_SPEC]
+
+# === Generic Table Loader ===
+
+def build_row_converter(spec, header):
+    # Resolve header positions once into (position, converter) pairs, so each row is one
+    # pass over them instead of a dict build plus per-field lookups. Text columns pass through.
+    positions = []
+    for csv_column, _, _ in spec["columns"]:
+        if csv_column not in header:
+            raise ValueError(f"Column '{csv_column}' missing from {spec['file_name']}")
+        positions.append(header.index(csv_column))
+
+    fields = tuple(
+        (pos, None if converter is to_text else converter)
+        for pos, (_, _, converter) in zip(positions, spec["columns"])
+    )
+
+    def convert(row):
+        return tuple([row[pos] if converter is None else converter(row[pos]) for pos, converter in fields])
+    return convert
+
+def read_spec_rows(spec, file_path):
+    # Rows are validated as they are converted; bad ones go to a reject file (utils.input_validator)
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file, RejectFile(file_path) as rejects:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        if CSV_READER == "mmap":
+            yield from read_mmap_rows(spec, file_path, header, rejects)
+        else:
+            convert = build_row_converter(spec, header)
+            yield from validated_rows(reader, convert, len(header), rejects)
+    log_rejects(spec, rejects)
+
+def log_rejects(spec, rejects):
+    if rejects.count:
+        logger.warning(f"⚠️ {spec['name']}: {rejects.count} bad rows skipped; see {rejects.path}")
+
+# === Memory-Mapped Reader ===
+# pyarrow parses each newline-aligned chunk (utils.mmap_csv) into string columns, which are
+# converted column-wise with the same rules as the row converters. A chunk holding any value
+# those rules refuse is re-read row by row, so its bad rows are rejected exactly as in the
+# csv reader and the rest still load.
+
+def arrow_column(converter, column):
+    import pyarrow
+    import pyarrow.compute as pc
+
+    if converter is to_text:
+        return column
+    if converter is to_day:
+        if not pc.all(pc.match_substring_regex(column, r"^.{4}-.{2}-.{2}$")).as_py():
+            raise ValueError("non-ISO day")
+        return column
+    if converter is to_ratio:
+        values = pc.utf8_trim_whitespace(pc.replace_substring(column, "%", ""))
+        return pc.divide(pc.cast(values, pyarrow.float64()), 100)
+    target = {to_float: pyarrow.float64(), to_int: pyarrow.int64()}[converter]
+    return pc.cast(pc.replace_substring(column, ",", ""), target)
+
+def typed_columns(spec, header, table):
+    # Converted columns in spec order, or None when the chunk needs the row-by-row path
+    import pyarrow
+
+    try:
+        return [
+            arrow_column(converter, table.column(header.index(csv_column)))
+            for csv_column, _, converter in spec["columns"]
         ]
-        validate_csv(file_path, expected_columns)
+    except (pyarrow.ArrowInvalid, ValueError):
+        return None
 
-        conn = create_db_connection()
-        cursor = conn.cursor()
-        batch = []
-
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                batch.append((
-                    row["Day"], row["Landing page path"],
-                    int(row["Sessions"].replace(',', '')),
-                    float(row["Conversion rate"].replace('%', '').strip()) / 100
-                ))
-
-                if len(batch) == 100:
-                    cursor.executemany("""
-                        INSERT INTO page_sessions_fact (
-                            day, landing_page_path, sessions, conversion_rate
-                        ) VALUES (%s, %s, %s, %s)
-                    """, batch)
-                    conn.commit()
-                    batch.clear()
-
-            if batch:
-                cursor.executemany("""
-                    INSERT INTO page_sessions_fact (
-                        day, landing_page_path, sessions, conversion_rate
-                    ) VALUES (%s, %s, %s, %s)
-                """, batch)
-                conn.commit()
+def read_mmap_rows(spec, file_path, header, rejects, start=None, end=None):
+    from utils.mmap_csv import string_chunks
 
-        cursor.close()
-        conn.close()
-        logger.info("✅ Page sessions ETL completed.")
+    convert = build_row_converter(spec, header)
+    for line_offset, data, table, clean in string_chunks(file_path, header, start, end):
+        columns = typed_columns(spec, header, table) if clean else None
+        if columns is None:
+            reader = csv.reader(io.StringIO(data.decode('utf-8'), newline=''))
+            yield from validated_rows(reader, convert, len(header), rejects, line_offset)
+            continue
+        yield from zip(*[column.to_pylist() for column in columns])
+
+def timed_rows(spec, rows):
+    # CSV parsing and conversion is the extract stage; the load stage keeps only MySQL time
+    return timed(rows, "shopify", "extract", every=1000, table=spec["table"])
+
+def filter_new_rows(spec, rows, since, seen):
+    # Drops rows dated before `since` and records the latest day in seen["max_day"]
+    if not spec.get("date_column"):
+        yield from rows
+        return
+
+    index = [db_column for _, db_column, _ in spec["columns"]].index(spec["date_column"])
+    latest = seen.get("max_day", "")
+    earliest = seen.get("min_day")
+    for row in rows:
+        day = row[index]
+        if since and day < since:
+            continue
+        if day > latest:
+            latest = seen["max_day"] = day
+        if earliest is None or day < earliest:
+            earliest = seen["min_day"] = day
+        yield row
+
+def table_fingerprints(spec, strategy):
+    if not ROW_DEDUP or strategy != "append":
+        return None
+    return RowFingerprints("shopify", spec["table"])
+
+def dedup_rows(fingerprints, rows):
+    return rows if fingerprints is None else fingerprints.filter(rows)
+
+def save_fingerprints(spec, fingerprints, skipped):
+    # After the table load is committed, so a failed load never marks its rows as loaded
+    if fingerprints is None:
+        return
+    if skipped:
+        logger.info(f"⏭️ {spec['name']}: {skipped} rows already loaded were skipped.")
+    try:
+        fingerprints.save()
+    except OSError as e:
+        logger.warning(f"⚠️ Could not store row fingerprints for {spec['name']}: {e}")
+
+def table_since(spec):
+    if not spec.get("date_column"):
+        return None
+    return incremental_start("shopify", WATERMARK_ACCOUNT, spec["table"], LOOKBACK_DAYS)
+
+def process_table(spec, file_path=None):
+    # Loads spec["file_name"] from STAGING_DIR unless another export is given
+    try:
+        file_path = file_path or os.path.join(os.getenv("STAGING_DIR"), spec["file_name"])
+        validate_csv(file_path, [csv_column for csv_column, _, _ in spec["columns"]])
+
+        since = table_since(spec)
+        if since:
+            logger.info(f"👉 {spec['name']}: loading days from {since}.")
+        seen = {}
+
+        with stage("shopify", "load", table=spec["table"]) as load:
+            load.add(bytes_read=os.path.getsize(file_path))
+            conn, strategy, target = begin_table_load(spec)
+            fingerprints = table_fingerprints(spec, strategy)
+            db_columns = [db_column for _, db_column, _ in spec["columns"]]
+            try:
+                total = load_rows(target, db_columns, lambda: dedup_rows(fingerprints, filter_new_rows(
+                    spec, timed_rows(spec, read_spec_rows(spec, file_path)), since, seen
+                )), strategy, spec["key_columns"], conn)
+            except Exception:
+                end_table_load(conn, spec, strategy, 0, failed=True)
+                raise
+            end_table_load(conn, spec, strategy, total, seen.get("min_day"), seen.get("max_day"))
+            skipped = fingerprints.skipped if fingerprints else 0
+            save_fingerprints(spec, fingerprints, skipped)
+            load.add(rows_in=total + skipped, rows_out=total)
+        logger.info(f"✅ {spec['name']} ETL completed ({total} rows).")
+        return total
 
     except Exception as e:
-        logger.error(f"❌ Error in Page Sessions ETL: {e}")
+        logger.error(f"❌ Error in {spec['name']} ETL: {e}")
 
-# === Entry Point ===
-def main():
-    logger.info("🚀 Shopify ETL pipeline started.")
+# === Parallel Chunked Loading ===
+# Chunks are split on line boundaries, so quoted fields must not contain newlines
+# (true for Shopify analytics exports).
+
+def plan_chunks(file_path, chunk_bytes=CHUNK_BYTES):
+    size = os.path.getsize(file_path)
+    chunks = []
+    with open(file_path, mode='rb') as file:
+        file.readline()
+        start = file.tell()
+        while start < size:
+            file.seek(min(start + chunk_bytes, size))
+            file.readline()
+            end = file.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+def read_chunk_rows(spec, file_path, header, start, end):
+    # Reject line numbers count from the start of the chunk, which names the reject file
+    with RejectFile(file_path, chunk_start=start) as rejects:
+        if CSV_READER == "mmap":
+            yield from read_mmap_rows(spec, file_path, header, rejects, start, end)
+        else:
+            with open(file_path, mode='rb') as file:
+                file.seek(start)
+                text = file.read(end - start).decode('utf-8')
+            convert = build_row_converter(spec, header)
+            yield from validated_rows(csv.reader(io.StringIO(text, newline='')), convert, len(header), rejects)
+    log_rejects(spec, rejects)
+
+def load_chunk(spec, file_path, header, start, end, since=None, target=None, strategy="append"):
+    # Runs in a worker process with its own MySQL connection
+    started = time.perf_counter()
+    seen = {}
+    fingerprints = table_fingerprints(spec, strategy)
+    db_columns = [db_column for _, db_column, _ in spec["columns"]]
+    with stage("shopify", "load", table=spec["table"], chunk_start=start) as load:
+        load.add(bytes_read=end - start)
+        rows = load_rows(target or spec["table"], db_columns, lambda: dedup_rows(fingerprints, filter_new_rows(
+            spec, timed_rows(spec, read_chunk_rows(spec, file_path, header, start, end)), since, seen
+        )), strategy, spec["key_columns"])
+        skipped = fingerprints.skipped if fingerprints else 0
+        load.add(rows_in=rows + skipped, rows_out=rows)
+    # New fingerprints go back to the parent, which stores them once the table load is committed
+    return {
+        "table": spec["table"],
+        "start": start,
+        "end": end,
+        "rows": rows,
+        "skipped": skipped,
+        "fingerprints": fingerprints.new.tobytes() if fingerprints else b"",
+        "min_day": seen.get("min_day"),
+        "max_day": seen.get("max_day"),
+        "seconds": time.perf_counter() - started,
+        "pid": os.getpid()
+    }
+
+def finished_chunks_committed(spec, strategy, fingerprints, total, min_day, max_day):
+    # Outside staging swaps each chunk commits on its own, so a table with a failed chunk keeps
+    # the rows of the chunks that finished. The watermark stays put, as the failed chunk's days
+    # are still missing; under append the rerun skips the finished rows by fingerprint.
+    if max_day:
+        record_loaded_range(spec["table"], min_day, max_day, total)
+    if strategy == "append" and fingerprints is None:
+        logger.warning(
+            f"⚠️ {spec['name']}: {total} rows from finished chunks stay committed and "
+            f"SHOPIFY_ROW_DEDUP is off, so a rerun appends them again."
+        )
+
+def run_parallel(specs, workers=WORKERS, chunk_bytes=CHUNK_BYTES):
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    started = time.perf_counter()
+    totals = defaultdict(int)
+    skipped = defaultdict(int)
+    day_ranges = {}
+    fingerprints = {}
+    loads = {}
+    failed = set()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for spec in specs:
+            try:
+                file_path = os.path.join(os.getenv("STAGING_DIR"), spec["file_name"])
+                header = validate_csv(file_path, [csv_column for csv_column, _, _ in spec["columns"]])
+                chunks = plan_chunks(file_path, chunk_bytes)
+                since = table_since(spec)
+                loads[spec["name"]] = conn, strategy, target = begin_table_load(spec)
+                fingerprints[spec["name"]] = table_fingerprints(spec, strategy)
+            except Exception as e:
+                logger.error(f"❌ Error in {spec['name']} ETL: {e}")
+                failed.add(spec["name"])
+                continue
+
+            logger.info(f"👉 Queued {spec['name']} ETL in {len(chunks)} chunk(s).")
+            for start, end in chunks:
+                futures[pool.submit(load_chunk, spec, file_path, header, start, end, since, target, strategy)] = spec
+
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"❌ Error in {spec['name']} ETL chunk: {e}")
+                failed.add(spec["name"])
+                continue
+
+            totals[spec["name"]] += result["rows"]
+            skipped[spec["name"]] += result["skipped"]
+            if fingerprints[spec["name"]] is not None:
+                fingerprints[spec["name"]].extend(result["fingerprints"])
+            if result["max_day"]:
+                low, high = day_ranges.get(spec["name"], (result["min_day"], result["max_day"]))
+                day_ranges[spec["name"]] = (min(low, result["min_day"]), max(high, result["max_day"]))
+            logger.info(
+                f"📦 {spec['name']} bytes {result['start']}-{result['end']}: "
+                f"{result['rows']} rows in {result['seconds']:.2f}s (pid {result['pid']})"
+            )
+
+    for spec in specs:
+        if spec["name"] not in loads:
+            continue
+        conn, strategy, _ = loads[spec["name"]]
+        min_day, max_day = day_ranges.get(spec["name"], (None, None))
+        try:
+            end_table_load(conn, spec, strategy, totals[spec["name"]], min_day, max_day,
+                           failed=spec["name"] in failed)
+            if spec["name"] in failed and strategy != "staging_swap" and totals[spec["name"]]:
+                finished_chunks_committed(spec, strategy, fingerprints[spec["name"]], totals[spec["name"]], min_day, max_day)
+            # Only finished chunks' fingerprints were collected, and those chunks are committed
+            save_fingerprints(spec, fingerprints[spec["name"]], skipped[spec["name"]])
+        except Exception as e:
+            logger.error(f"❌ Error in {spec['name']} ETL: {e}")
+            failed.add(spec["name"])
+            continue
+        if spec["name"] not in failed:
+            logger.info(f"✅ {spec['name']} ETL completed ({totals[spec['name']]} rows).")
+    seconds = time.perf_counter() - started
+    logger.info(f"⏱️ Parallel load finished in {seconds:.2f}s with {workers} workers.")
+
+    # Chunk workers write their own extract/load lines; this one covers the whole run
+    summary = Stage("shopify", "parallel_load", workers=workers)
+    summary.seconds = summary.wall_seconds = seconds
+    summary.status = "failed" if failed else "ok"
+    summary.add(rows_out=sum(totals.values()))
+    summary.emit()
+    if failed:
+        raise RuntimeError(f"Tables failed: {', '.join(sorted(failed))}")
+    return dict(totals)
+
+# === Watch Mode ===
+# --watch polls STAGING_DIR for exports matching a spec's file_pattern. A file is taken once it
+# has been unchanged for WATCH_SETTLE_SECONDS, loaded incrementally (rows before the table's
+# watermark are skipped), recorded by SHA-256 in the state DB manifest and moved to
+# PROCESSED_DIR. A file whose hash is already in the manifest is moved without loading.
+WATCH_INTERVAL_SECONDS = int(os.getenv("SHOPIFY_WATCH_INTERVAL_SECONDS", "60"))
+WATCH_SETTLE_SECONDS = int(os.getenv("SHOPIFY_WATCH_SETTLE_SECONDS", "30"))
+WATCH_RETRY_SECONDS = int(os.getenv("SHOPIFY_WATCH_RETRY_SECONDS", "600"))
+
+def spec_for_file(file_name):
+    for spec in TABLE_SPECS:
+        if fnmatch.fnmatch(file_name.lower(), spec["file_pattern"]):
+            return spec
+    return None
+
+def file_sha256(file_path):
+    # Read in 1 MB blocks; hashlib.file_digest would need Python 3.11
+    digest = hashlib.sha256()
+    with open(file_path, mode='rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def move_to_processed(file_path):
+    processed_dir = os.getenv("PROCESSED_DIR")
+    os.makedirs(processed_dir, exist_ok=True)
+    target = os.path.join(processed_dir, os.path.basename(file_path))
+    if os.path.exists(target):
+        stem, extension = os.path.splitext(target)
+        target = f"{stem}.{datetime.now():%Y%m%d%H%M%S}{extension}"
+    shutil.move(file_path, target)
+    return target
+
+def ingest_file(spec, file_path):
+    # Returns False when the load failed and the file stays staged
+    file_name = os.path.basename(file_path)
+    sha256 = file_sha256(file_path)
+    previous = loaded_file(sha256)
+    if previous:
+        target = move_to_processed(file_path)
+        logger.info(f"⏭️ {file_name} matches {previous[0]} loaded at {previous[2]}; moved to {target} unloaded.")
+        return True
+
+    logger.info(f"👉 {file_name} -> {spec['name']}.")
+    total = process_table(spec, file_path)
+    if total is None:
+        return False
+    record_loaded_file(sha256, file_name, spec["table"], total)
+    target = move_to_processed(file_path)
+    logger.info(f"📁 {file_name} loaded ({total} rows) and moved to {target}.")
+    return True
+
+def scan_staging(failed):
+    # One pass, oldest export first so a table's watermark advances in order.
+    # `failed` maps paths whose load failed to ((mtime, size), retry time).
+    now = time.time()
+    entries = [entry for entry in os.scandir(os.getenv("STAGING_DIR")) if entry.is_file()]
+    for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+        spec = spec_for_file(entry.name)
+        if spec is None:
+            continue
+        stat = entry.stat()
+        if now - stat.st_mtime < WATCH_SETTLE_SECONDS:
+            continue
+        signature = (stat.st_mtime, stat.st_size)
+        retry = failed.get(entry.path)
+        if retry and retry[0] == signature and now < retry[1]:
+            continue
+
+        try:
+            loaded = ingest_file(spec, entry.path)
+        except Exception as e:
+            logger.error(f"❌ Error ingesting {entry.name}: {e}")
+            loaded = False
+        if loaded:
+            failed.pop(entry.path, None)
+        else:
+            failed[entry.path] = (signature, now + WATCH_RETRY_SECONDS)
+
+def watch(interval=WATCH_INTERVAL_SECONDS, once=False):
+    logger.info(f"👀 Watching {os.getenv('STAGING_DIR')} for Shopify exports every {interval}s.")
+    failed = {}
     try:
-        logger.info("👉 Starting Sales Summary ETL.")
-        process_sales_summary()
+        while True:
+            scan_staging(failed)
+            if once:
+                return
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logger.info("🛑 Watch stopped.")
+
+# === ETL Processing Functions ===
 
-        logger.info("👉 Starting Sessions by Location ETL.")
-        process_sessions_location()
+def process_sales_summary():
+    return process_table(SALES_SUMMARY_SPEC)
+
+def process_sessions_location():
+    return process_table(SESSIONS_LOCATION_SPEC)
 
-        logger.info("👉 Starting Page Sessions ETL.")
-        process_page_sessions()
+def process_page_sessions():
+    return process_table(PAGE_SESSIONS_SPEC)
+
+# === Entry Point ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shopify ETL pipeline")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep polling STAGING_DIR and load new exports as they arrive")
+    parser.add_argument("--once", action="store_true",
+                        help="with --watch: load whatever is staged now, then exit")
+    parser.add_argument("--interval", type=int, default=WATCH_INTERVAL_SECONDS, help="seconds between polls")
+    args = parser.parse_args(argv)
+
+    logger.info("🚀 Shopify ETL pipeline started.")
+    try:
+        if args.watch:
+            watch(args.interval, args.once)
+        elif WORKERS > 1:
+            run_parallel(TABLE_SPECS, WORKERS, CHUNK_BYTES)
+        else:
+            for spec in TABLE_SPECS:
+                logger.info(f"👉 Starting {spec['name']} ETL.")
+                process_table(spec)
 
         logger.info("✅ All ETL processes completed successfully!")
 
@@ -0,0 +1,82 @@
+# === Imports ===
+import os
+import time
+import random
+import logging
+import threading
+from utils.metrics import count
+
+logger = logging.getLogger("etl_api_limits")
+
+# === Retry Settings ===
+# Shared by every API client: retry n waits min(base * 2^n, max) plus up to `base` of jitter,
+# so workers that failed together do not retry in lockstep.
+RETRY_BASE_SECONDS = float(os.getenv("ETL_RETRY_BASE_SECONDS", "1"))
+RETRY_MAX_SECONDS = float(os.getenv("ETL_RETRY_MAX_SECONDS", "60"))
+
+def backoff_seconds(attempt, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS):
+    return min(base * 2 ** attempt, cap) + random.uniform(0, base)
+
+# === Rate Limiting ===
+# One token bucket per API, shared by every thread and event loop in the process.
+# <API>_RATE_PER_SECOND tokens refill continuously up to <API>_RATE_BURST; 0 disables the limit.
+DEFAULT_RATES = {"meta": (25, 50), "google": (10, 10)}
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        # Takes a token (going into debt when empty) and returns how long to wait before using it
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def wait(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def wait_async(self):
+        import asyncio
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def rate_limiter(api):
+    with _buckets_lock:
+        if api not in _buckets:
+            rate, burst = DEFAULT_RATES.get(api, (0, 1))
+            rate = float(os.getenv(f"{api.upper()}_RATE_PER_SECOND", str(rate)))
+            burst = int(os.getenv(f"{api.upper()}_RATE_BURST", str(burst)))
+            _buckets[api] = TokenBucket(rate, burst)
+        return _buckets[api]
+
+# === Retried Calls ===
+
+def call_with_retries(func, api, max_retries, retryable=lambda error: True, description="API call"):
+    # Runs func() under the API's rate limit, retrying errors retryable() accepts with backoff
+    limiter = rate_limiter(api)
+    for attempt in range(max_retries + 1):
+        limiter.wait()
+        try:
+            return func()
+        except Exception as e:
+            if attempt == max_retries or not retryable(e):
+                raise
+            count(retries=1)
+            delay = backoff_seconds(attempt)
+            logger.warning(f"{description} failed ({e}); retry {attempt + 1} in {delay:.1f}s.")
+            time.sleep(delay)
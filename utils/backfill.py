@@ -0,0 +1,62 @@
+# === Imports ===
+import os
+from collections import deque
+from datetime import date, timedelta
+
+# === Backfill Settings ===
+# A long explicit date range is split into day, week or month slices so no single API request
+# spans years. BACKFILL_WORKERS slices are extracted at a time; results come back in date
+# order, so each slice is loaded as soon as it and every earlier slice are ready.
+SLICE_UNITS = ("day", "week", "month")
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+
+# === Date Slices ===
+
+def slice_end(start, unit):
+    if unit == "day":
+        return start
+    if unit == "week":
+        return start + timedelta(days=6 - start.weekday())
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+def date_slices(start_date, end_date, unit="month"):
+    # [(start, end), ...] as ISO dates covering start_date..end_date. Weeks run Monday to
+    # Sunday and months follow the calendar, so only the first and last slice can be partial.
+    if unit not in SLICE_UNITS:
+        raise ValueError(f"Unknown slice unit '{unit}'; expected one of {', '.join(SLICE_UNITS)}")
+    start, end = date.fromisoformat(str(start_date)[:10]), date.fromisoformat(str(end_date)[:10])
+    slices = []
+    while start <= end:
+        stop = min(slice_end(start, unit), end)
+        slices.append((start.isoformat(), stop.isoformat()))
+        start = stop + timedelta(days=1)
+    return slices
+
+# === Parallel Extraction ===
+
+def ordered_results(func, items, workers=BACKFILL_WORKERS):
+    # Yields (item, func(item)) in item order while up to `workers` later items run on a
+    # thread pool, so only that many results wait in memory while the caller loads one.
+    # The first failure is raised in order; later items still queued are cancelled.
+    from concurrent.futures import ThreadPoolExecutor
+
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append((item, pool.submit(func, item)))
+                if len(pending) >= workers:
+                    break
+            while pending:
+                item, future = pending.popleft()
+                result = future.result()
+                # Keep the pool busy while the caller loads this result
+                for next_item in items:
+                    pending.append((next_item, pool.submit(func, next_item)))
+                    break
+                yield item, result
+        finally:
+            for _, future in pending:
+                future.cancel()
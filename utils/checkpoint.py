@@ -0,0 +1,92 @@
+# === Imports ===
+import os
+import json
+import time
+import shutil
+import logging
+
+logger = logging.getLogger("etl_checkpoint")
+
+# === Checkpoint Settings ===
+# Long extractions save each finished unit of work (a page, an account's responses) as JSON
+# under CHECKPOINT_DIR/<source>/<job>/ as soon as it completes, so a run that crashes or
+# gives up after retries resumes where it stopped instead of refetching everything.
+# A job's checkpoint is cleared once its rows are committed; one that has not progressed for
+# CHECKPOINT_MAX_AGE_HOURS is discarded, since the API data may have changed since.
+CHECKPOINT_DIR = os.getenv("ETL_CHECKPOINT_DIR") or os.path.join(os.getenv("PROCESSED_DIR") or ".", "checkpoints")
+CHECKPOINT_ENABLED = os.getenv("ETL_CHECKPOINT_ENABLED", "1").strip() == "1"
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv("ETL_CHECKPOINT_MAX_AGE_HOURS", "24"))
+
+def safe_name(value):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in str(value))
+
+class Checkpoint:
+    def __init__(self, source, job):
+        self.path = os.path.join(CHECKPOINT_DIR, safe_name(source), safe_name(job))
+        if os.path.isdir(self.path) and time.time() - os.path.getmtime(self.path) > CHECKPOINT_MAX_AGE_HOURS * 3600:
+            logger.info(f"Discarding stale checkpoint {self.path}")
+            self.clear()
+
+    def item_path(self, item, extension="json"):
+        return os.path.join(self.path, f"{safe_name(item)}.{extension}")
+
+    # --- Finished items ---
+
+    def get(self, item):
+        # The data saved for a finished item, or None
+        try:
+            with open(self.item_path(item), encoding="utf-8") as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+
+    def save(self, item, data):
+        os.makedirs(self.path, exist_ok=True)
+        path = self.item_path(item)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle)
+        os.replace(temp_path, path)
+
+    # --- Paged items ---
+    # One JSON line per fetched page with its rows and the cursor for the next page
+
+    def pages(self, item):
+        # Returns (rows so far, next page cursor or None, finished)
+        rows, cursor, finished = [], None, False
+        path = self.item_path(item, "pages.jsonl")
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return rows, cursor, finished
+
+        complete = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                page = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                page = None
+            if page is None:
+                break
+            complete += len(line)
+            rows.extend(page["rows"])
+            cursor = page["next"]
+            finished = cursor is None
+        if complete < len(data):
+            # A page cut off by the crash is dropped and fetched again
+            with open(path, "r+b") as handle:
+                handle.truncate(complete)
+        return rows, cursor, finished
+
+    def add_page(self, item, rows, cursor):
+        os.makedirs(self.path, exist_ok=True)
+        with open(self.item_path(item, "pages.jsonl"), "a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"rows": rows, "next": cursor}) + "\n")
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def job_checkpoint(source, job):
+    # None when checkpointing is disabled, so callers can skip it with one check
+    return Checkpoint(source, job) if CHECKPOINT_ENABLED else None
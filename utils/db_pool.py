@@ -0,0 +1,117 @@
+# === Imports ===
+import os
+import time
+import logging
+import threading
+from itertools import chain, islice
+from contextlib import contextmanager
+from utils.streaming import chunked
+
+logger = logging.getLogger("etl_db_pool")
+
+# === Pool Settings ===
+# One pool per process and connection flavour (LOCAL INFILE enabled or not), so loads
+# reuse authenticated (and TLS) sessions instead of reconnecting for every table or batch.
+# mysql.connector caps a pool at 32 connections.
+DATABASE = os.getenv("MYSQL_DB") or "shopify_etl"
+POOL_SIZE = min(int(os.getenv("MYSQL_POOL_SIZE", "5")), 32)
+POOL_TIMEOUT_SECONDS = float(os.getenv("MYSQL_POOL_TIMEOUT_SECONDS", "30"))
+
+# Bulk sessions skip foreign key checks, and unique checks for non-upsert loads
+BULK_SESSION = os.getenv("MYSQL_BULK_SESSION", "1").strip() == "1"
+
+_pools = {}
+_pools_lock = threading.Lock()
+_packet_sizes = {}
+
+def connection_config(allow_local_infile=False):
+    return {
+        "host": os.getenv("MYSQL_HOST"),
+        "port": os.getenv("MYSQL_PORT"),
+        "user": os.getenv("MYSQL_USER"),
+        "password": os.getenv("MYSQL_PASSWORD"),
+        "database": DATABASE,
+        "allow_local_infile": allow_local_infile,
+        "autocommit": False
+    }
+
+def get_pool(allow_local_infile=False):
+    # Keyed by pid as well: pools (and their sockets) must not be shared with forked workers
+    from mysql.connector import pooling
+    key = (os.getpid(), allow_local_infile)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = pooling.MySQLConnectionPool(
+                pool_name=f"etl_{os.getpid()}_{'infile' if allow_local_infile else 'default'}",
+                pool_size=POOL_SIZE,
+                pool_reset_session=True,
+                **connection_config(allow_local_infile)
+            )
+            logger.info(f"MySQL pool of {POOL_SIZE} connections opened for {DATABASE}.")
+        return _pools[key]
+
+def get_connection(allow_local_infile=False):
+    # Waits for a free pooled connection; close() hands it back to the pool
+    from mysql.connector import errors
+    pool = get_pool(allow_local_infile)
+    deadline = time.monotonic() + POOL_TIMEOUT_SECONDS
+    while True:
+        try:
+            return pool.get_connection()
+        except errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+# === Bulk Load Sessions ===
+
+@contextmanager
+def bulk_session(conn, strategy="append"):
+    # Explicit transactions and relaxed integrity checks for the duration of a load.
+    # Unique checks stay on for upserts, which rely on the unique key to find duplicates.
+    from mysql.connector import errors
+    settings = {"foreign_key_checks": 0}
+    if strategy != "upsert":
+        settings["unique_checks"] = 0
+    if not BULK_SESSION:
+        settings = {}
+
+    conn.autocommit = False
+    cursor = conn.cursor()
+    try:
+        for name, value in settings.items():
+            cursor.execute(f"SET SESSION {name} = {value}")
+        yield conn
+    finally:
+        try:
+            for name in settings:
+                cursor.execute(f"SET SESSION {name} = 1")
+            cursor.close()
+        except errors.Error as e:
+            # The pool resets the session when the connection is returned anyway
+            logger.warning(f"Could not restore session settings: {e}")
+
+def max_allowed_packet(conn):
+    # Read once per process; every pooled connection talks to the same server
+    pid = os.getpid()
+    if pid not in _packet_sizes:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT @@SESSION.max_allowed_packet")
+            _packet_sizes[pid] = int(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+    return _packet_sizes[pid]
+
+def packet_chunks(conn, rows, batch_size=None):
+    # Splits rows for executemany so each multi-row INSERT stays under half of
+    # max_allowed_packet; the row size is estimated from the first rows of the stream
+    iterator = iter(rows)
+    sample = list(islice(iterator, 100))
+    if not sample:
+        return
+    row_bytes = max(sum(len(str(value)) + 3 for value in row) for row in sample)
+    size = max(1, max_allowed_packet(conn) // 2 // row_bytes)
+    if batch_size:
+        size = min(size, batch_size)
+    yield from chunked(chain(sample, iterator), size)
@@ -0,0 +1,112 @@
+# === Imports ===
+import os
+import json
+import logging
+from contextlib import closing
+from datetime import datetime, timedelta
+from utils.state_store import connect_state_db
+
+logger = logging.getLogger("etl_dimensions")
+
+# === Dimension Cache Settings ===
+# Slow-changing metadata (Meta campaigns and adsets, the Google MCC client list) is cached in
+# the state database per (source, account, kind). Within DIMENSION_TTL_MINUTES of the last
+# refresh the cache is used without calling the API. After that, kinds that carry an
+# updated_time are refreshed with a delta (only entities changed since the newest one cached),
+# and a full refetch every DIMENSION_FULL_REFRESH_HOURS drops entities that were deleted.
+DIMENSION_CACHE_ENABLED = os.getenv("DIMENSION_CACHE_ENABLED", "1").strip() == "1"
+DIMENSION_TTL_MINUTES = float(os.getenv("DIMENSION_TTL_MINUTES", "60"))
+DIMENSION_FULL_REFRESH_HOURS = float(os.getenv("DIMENSION_FULL_REFRESH_HOURS", "24"))
+
+def connect_cache_db():
+    conn = connect_state_db()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_dimensions (
+            source TEXT NOT NULL,
+            account TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            updated_time TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (source, account, kind, entity_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_dimension_refreshes (
+            source TEXT NOT NULL,
+            account TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            refreshed_at TEXT NOT NULL,
+            full_refreshed_at TEXT NOT NULL,
+            PRIMARY KEY (source, account, kind)
+        )
+    """)
+    return conn
+
+# === Refresh Planning ===
+
+def refresh_plan(source, account, kind, delta=True):
+    # ("cached", None) within the TTL, ("delta", newest updated_time) when only changes need
+    # fetching, ("full", None) otherwise. delta=False is for kinds without an updated_time.
+    if not DIMENSION_CACHE_ENABLED:
+        return "full", None
+    with closing(connect_cache_db()) as conn, conn:
+        row = conn.execute(
+            "SELECT refreshed_at, full_refreshed_at FROM etl_dimension_refreshes WHERE source = ? AND account = ? AND kind = ?",
+            (source, str(account), kind)
+        ).fetchone()
+        if row is None:
+            return "full", None
+        now = datetime.now()
+        refreshed_at, full_refreshed_at = map(datetime.fromisoformat, row)
+        if now - refreshed_at < timedelta(minutes=DIMENSION_TTL_MINUTES):
+            return "cached", None
+        if not delta or now - full_refreshed_at >= timedelta(hours=DIMENSION_FULL_REFRESH_HOURS):
+            return "full", None
+        newest = conn.execute(
+            "SELECT MAX(updated_time) FROM etl_dimensions WHERE source = ? AND account = ? AND kind = ?",
+            (source, str(account), kind)
+        ).fetchone()[0]
+    return ("delta", newest) if newest else ("full", None)
+
+# === Cached Entities ===
+
+def cached_entities(source, account, kind):
+    with closing(connect_cache_db()) as conn, conn:
+        rows = conn.execute(
+            "SELECT data FROM etl_dimensions WHERE source = ? AND account = ? AND kind = ? ORDER BY entity_id",
+            (source, str(account), kind)
+        ).fetchall()
+    return [json.loads(data) for data, in rows]
+
+def store_entities(source, account, kind, entities, full, key="id", updated_field="updated_time"):
+    # Upserts fetched entities and returns every cached entity of the kind. A full refresh
+    # replaces the kind's entities; a delta only adds or updates the ones it fetched.
+    if not DIMENSION_CACHE_ENABLED:
+        return entities
+    now = datetime.now().isoformat(timespec="seconds")
+    with closing(connect_cache_db()) as conn, conn:
+        if full:
+            conn.execute(
+                "DELETE FROM etl_dimensions WHERE source = ? AND account = ? AND kind = ?",
+                (source, str(account), kind)
+            )
+        conn.executemany("""
+            INSERT INTO etl_dimensions (source, account, kind, entity_id, updated_time, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (source, account, kind, entity_id) DO UPDATE SET
+                updated_time = excluded.updated_time,
+                data = excluded.data
+        """, [
+            (source, str(account), kind, str(entity[key]), entity.get(updated_field), json.dumps(entity))
+            for entity in entities
+        ])
+        conn.execute("""
+            INSERT INTO etl_dimension_refreshes (source, account, kind, refreshed_at, full_refreshed_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (source, account, kind) DO UPDATE SET
+                refreshed_at = excluded.refreshed_at,
+                full_refreshed_at = CASE WHEN ? THEN excluded.full_refreshed_at ELSE full_refreshed_at END
+        """, (source, str(account), kind, now, now, int(full)))
+    logger.info(f"{len(entities)} {kind} cached for {source}/{account} ({'full' if full else 'delta'} refresh).")
+    return cached_entities(source, account, kind)
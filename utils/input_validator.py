@@ -0,0 +1,83 @@
+# === Imports ===
+import os
+import csv
+from utils.metrics import RUN_ID, count
+
+# === Validation Settings ===
+# Only the header is checked up front; rows are validated inline as they are converted for
+# loading, so each staged file is read once. Bad rows go to REJECT_DIR and the rest load.
+# A file with more than MAX_REJECTS bad rows (0 = no limit) fails its table load instead.
+REJECT_DIR = os.getenv("REJECT_DIR") or os.path.join(os.getenv("PROCESSED_DIR") or ".", "rejects")
+MAX_REJECTS = int(os.getenv("ETL_MAX_REJECTS", "1000"))
+
+# === Header Check ===
+
+def check_header(header, expected_columns, file_name):
+    missing = [column for column in expected_columns if column not in header]
+    if missing:
+        raise ValueError(f"{file_name} is missing expected columns: {missing}")
+    return header
+
+def validate_csv(file_path, expected_columns):
+    # Reads just the header line and returns it
+    if not os.path.isfile(file_path):
+        raise FileNotFoundError(f"Input file not found: {file_path}")
+    with open(file_path, mode='r', encoding='utf-8', newline='') as file:
+        header = next(csv.reader(file), [])
+    return check_header(header, expected_columns, os.path.basename(file_path))
+
+# === Reject Files ===
+
+class RejectFile:
+    # <file>.<run id>[.<chunk offset>].rejects.csv with the CSV line number, the reason and
+    # the raw fields. Opened on the first bad row, so clean files leave nothing behind.
+    def __init__(self, file_path, chunk_start=None):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        suffix = f".{chunk_start}" if chunk_start is not None else ""
+        self.path = os.path.join(REJECT_DIR, f"{name}.{RUN_ID}{suffix}.rejects.csv")
+        self.source = os.path.basename(file_path)
+        self.count = 0
+        self.handle = None
+        self.writer = None
+
+    def write(self, line_number, reason, row):
+        if self.handle is None:
+            os.makedirs(REJECT_DIR, exist_ok=True)
+            self.handle = open(self.path, mode='w', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.handle)
+            self.writer.writerow(["line", "reason", "fields"])
+        self.writer.writerow([line_number, reason, *row])
+        self.count += 1
+        count(rows_rejected=1)
+        if MAX_REJECTS and self.count > MAX_REJECTS:
+            raise ValueError(f"More than {MAX_REJECTS} bad rows in {self.source}; see {self.path}")
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# === Row Validation ===
+
+def validated_rows(reader, convert, width, rejects, line_offset=0):
+    # Yields convert(row) for each well-formed row of a csv.reader. Rows with the wrong
+    # number of fields, or values the column converters reject (blank or malformed
+    # numbers, non-ISO days), are written to `rejects` with their line number instead;
+    # line_offset is added when the reader starts part-way through a file.
+    for row in reader:
+        if not row:
+            continue
+        if len(row) != width:
+            rejects.write(line_offset + reader.line_num, f"expected {width} fields, found {len(row)}", row)
+            continue
+        try:
+            values = convert(row)
+        except (ValueError, TypeError) as e:
+            rejects.write(line_offset + reader.line_num, str(e), row)
+            continue
+        yield values
@@ -0,0 +1,138 @@
+# === Imports ===
+import os
+import logging
+from datetime import date, timedelta
+
+logger = logging.getLogger("etl_load_strategy")
+
+# === Load Strategies ===
+# append       - plain INSERT (re-runs duplicate rows)
+# upsert       - INSERT ... ON DUPLICATE KEY UPDATE / LOAD DATA ... REPLACE; needs a unique key
+# staging_swap - load into <table>__staging, carry over untouched rows, then atomically
+#                RENAME TABLE (or EXCHANGE PARTITION) so readers never wait on the load
+STRATEGIES = ("append", "upsert", "staging_swap")
+
+def table_strategy(table, default="append"):
+    # <TABLE>_LOAD_STRATEGY overrides ETL_LOAD_STRATEGY, which overrides the loader's default
+    strategy = (
+        os.getenv(f"{table.upper()}_LOAD_STRATEGY") or os.getenv("ETL_LOAD_STRATEGY") or default
+    ).strip().lower()
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown load strategy '{strategy}' for {table}; expected one of {STRATEGIES}")
+    return strategy
+
+def replay_strategy(table, default="append"):
+    # Replays reload windows that are already in the table, so an append would duplicate them;
+    # append tables are replayed through a staging swap that replaces just those windows
+    strategy = table_strategy(table, default)
+    return "staging_swap" if strategy == "append" else strategy
+
+def swap_partition(table):
+    # Optional partition name to EXCHANGE instead of renaming the whole table
+    return os.getenv(f"{table.upper()}_SWAP_PARTITION") or None
+
+def staging_table(table):
+    return f"{table}__staging"
+
+# === Statements ===
+
+def insert_statement(table, columns, strategy="append", key_columns=()):
+    placeholders = ", ".join(["%s"] * len(columns))
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    if strategy == "upsert":
+        updates = ", ".join(f"{c} = VALUES({c})" for c in columns if c not in key_columns)
+        query += f" ON DUPLICATE KEY UPDATE {updates}"
+    return query
+
+def load_data_modifier(strategy):
+    # Duplicate-key handling keyword for LOAD DATA ... INTO TABLE
+    return "REPLACE" if strategy == "upsert" else ""
+
+def merge_windows(windows):
+    # (key..., start_date, end_date) windows with overlapping or adjacent dates merged per key,
+    # so a daily-sliced backfill keeps one staging-swap retain condition per account, not per day
+    def day(value):
+        return date.fromisoformat(str(value)[:10])
+
+    spans = []
+    for window in sorted(windows, key=lambda w: (tuple(map(str, w[:-2])), day(w[-2]))):
+        key, start, end = tuple(window[:-2]), day(window[-2]), day(window[-1])
+        if spans and spans[-1][0] == key and start <= spans[-1][2] + timedelta(days=1):
+            spans[-1][2] = max(spans[-1][2], end)
+        else:
+            spans.append([key, start, end])
+    return [(*key, start.isoformat(), end.isoformat()) for key, start, end in spans]
+
+# === Staging Lifecycle ===
+
+def prepare_target(conn, table, strategy):
+    # Returns the table rows should be written to for this strategy
+    if strategy != "staging_swap":
+        return table
+
+    staging = staging_table(table)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(f"CREATE TABLE {staging} LIKE {table}")
+        if swap_partition(table):
+            cursor.execute(f"ALTER TABLE {staging} REMOVE PARTITIONING")
+    finally:
+        cursor.close()
+    logger.info(f"Staging table {staging} ready.")
+    return staging
+
+def finish_load(conn, table, strategy, retain_where=None, retain_params=()):
+    # Publishes a staging load. Rows of the live table matching retain_where are copied
+    # into staging first, so only the reloaded slice is replaced.
+    if strategy != "staging_swap":
+        return
+
+    staging = staging_table(table)
+    partition = swap_partition(table)
+    cursor = conn.cursor()
+    try:
+        if partition:
+            cursor.execute(f"ALTER TABLE {table} EXCHANGE PARTITION {partition} WITH TABLE {staging}")
+            cursor.execute(f"DROP TABLE {staging}")
+            logger.info(f"Partition {partition} of {table} exchanged with {staging}.")
+            return
+
+        if retain_where:
+            cursor.execute(f"INSERT INTO {staging} SELECT * FROM {table} WHERE {retain_where}", retain_params)
+            conn.commit()
+        cursor.execute(f"DROP TABLE IF EXISTS {table}__old")
+        cursor.execute(f"RENAME TABLE {table} TO {table}__old, {staging} TO {table}")
+        cursor.execute(f"DROP TABLE {table}__old")
+        logger.info(f"{staging} swapped into {table}.")
+    finally:
+        cursor.close()
+
+def abort_load(conn, table, strategy):
+    if strategy != "staging_swap":
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging_table(table)}")
+    finally:
+        cursor.close()
+
+def check_upsert_key(conn, table, key_columns):
+    # Upserts silently degrade to appends without a unique index, so warn when none covers the key
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX)
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+            GROUP BY INDEX_NAME
+        """, (table,))
+        unique_keys = [set(columns.lower().split(",")) for _, columns in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+    if not any(key <= {c.lower() for c in key_columns} for key in unique_keys):
+        logger.warning(
+            f"{table} has no unique key within ({', '.join(key_columns)}); upserts will append. "
+            f"Add one with: ALTER TABLE {table} ADD UNIQUE KEY uq_{table}_load ({', '.join(key_columns)})"
+        )
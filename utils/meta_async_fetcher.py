@@ -0,0 +1,188 @@
+# === Imports ===
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+from utils.metrics import count
+from utils.api_limits import backoff_seconds, rate_limiter
+
+logger = logging.getLogger("meta_ads_etl")
+
+# === Fetch Settings ===
+GRAPH_BASE_URL = os.getenv("META_GRAPH_BASE_URL", "https://graph.facebook.com/v22.0")
+MAX_CONCURRENCY_PER_ACCOUNT = int(os.getenv("META_MAX_CONCURRENCY_PER_ACCOUNT", "3"))
+MAX_CONNECTIONS = int(os.getenv("META_MAX_CONNECTIONS", "20"))
+MAX_RETRIES = int(os.getenv("META_MAX_RETRIES", "5"))
+PAGE_LIMIT = int(os.getenv("META_PAGE_LIMIT", "500"))
+USAGE_THRESHOLD = float(os.getenv("META_USAGE_THRESHOLD", "90"))
+
+CAMPAIGN_FIELDS = "id,name,status,daily_budget,updated_time"
+ADSET_FIELDS = "id,campaign_id,attribution_setting,updated_time"
+# Edges cached by utils.dimension_cache; fetchers take {edge: extra params or None} per account,
+# where None means the cached copy is fresh and the edge is not requested
+DIMENSION_EDGES = ("campaigns", "adsets")
+INSIGHTS_FIELDS = "campaign_id,spend,reach,impressions,clicks,ctr,cpc,cpm,purchase_roas,actions"
+
+# Graph API error codes for app, user, and ad account throttling
+RATE_LIMIT_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+TRANSIENT_CODES = {1, 2}
+
+def updated_since_filter(updated_time):
+    # Graph API filtering for entities changed after an updated_time like "2025-01-01T00:00:00+0000";
+    # an edit within that same second is picked up by the next full refresh
+    since = int(datetime.strptime(updated_time, "%Y-%m-%dT%H:%M:%S%z").timestamp())
+    return json.dumps([{"field": "updated_time", "operator": "GREATER_THAN", "value": since}])
+
+# === Rate-Limit Handling ===
+
+def usage_pause_seconds(headers):
+    # Reads X-App-Usage, X-Ad-Account-Usage and X-Business-Use-Case-Usage and
+    # returns how long to hold off before the next call (0 when below threshold).
+    pause = 0.0
+    peak = 0.0
+
+    app_usage = headers.get("X-App-Usage")
+    if app_usage:
+        usage = json.loads(app_usage)
+        peak = max(peak, *(float(usage.get(k, 0)) for k in ("call_count", "total_cputime", "total_time")))
+
+    account_usage = headers.get("X-Ad-Account-Usage")
+    if account_usage:
+        usage = json.loads(account_usage)
+        peak = max(peak, float(usage.get("acc_id_util_pct", 0)))
+        if peak >= USAGE_THRESHOLD:
+            pause = max(pause, float(usage.get("reset_time_duration", 0)))
+
+    business_usage = headers.get("X-Business-Use-Case-Usage")
+    if business_usage:
+        for entries in json.loads(business_usage).values():
+            for usage in entries:
+                peak = max(peak, *(float(usage.get(k, 0)) for k in ("call_count", "total_cputime", "total_time")))
+                pause = max(pause, float(usage.get("estimated_time_to_regain_access", 0)) * 60)
+
+    if peak >= USAGE_THRESHOLD:
+        pause = max(pause, 5.0 * (peak - USAGE_THRESHOLD + 1))
+    return pause
+
+def retryable_error(status, error):
+    # Throttling, server errors and Graph API transient codes; None means a network error
+    code = (error or {}).get("code")
+    return status is None or status == 429 or status >= 500 or code in RATE_LIMIT_CODES or code in TRANSIENT_CODES
+
+# === Async Requests ===
+
+async def get_json(session, url, params, semaphore, method="GET"):
+    import aiohttp
+
+    limiter = rate_limiter("meta")
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.wait_async()
+        try:
+            async with semaphore:
+                async with session.request(method, url, params=params) as response:
+                    body = await response.read()
+                    try:
+                        payload = json.loads(body) if body.strip() else None
+                    except ValueError:
+                        payload = {}
+                    pause = usage_pause_seconds(response.headers)
+                    status = response.status
+            count(api_calls=1, bytes_read=len(body))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Dropped connections and timeouts are retried like 5xx responses
+            payload, pause, status = {"error": {"message": str(e) or type(e).__name__}}, 0, None
+
+        if pause:
+            logger.warning(f"Graph API usage near limit, pausing {pause:.0f}s.")
+            await asyncio.sleep(pause)
+
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if status is not None and status < 400 and not error:
+            return payload
+
+        code = (error or {}).get("code")
+        if not retryable_error(status, error) or attempt == MAX_RETRIES:
+            message = (error or {}).get("message", f"HTTP {status}")
+            # paging.next URLs carry the access token, so only the path is logged
+            raise RuntimeError(f"Graph API request to {url.split('?')[0]} failed: {message}")
+
+        count(retries=1)
+        delay = backoff_seconds(attempt)
+        logger.warning(f"Graph API call failed ({status}, code {code}); retry {attempt + 1} in {delay:.1f}s.")
+        await asyncio.sleep(delay)
+
+async def iter_pages(session, url, params, semaphore):
+    # Starts the request for the next cursor page before handing back the current one
+    pending = asyncio.ensure_future(get_json(session, url, params, semaphore))
+    while pending is not None:
+        payload = await pending
+        next_url = payload.get("paging", {}).get("next")
+        pending = asyncio.ensure_future(get_json(session, next_url, None, semaphore)) if next_url else None
+        yield payload.get("data", [])
+
+async def collect_pages(session, url, params, semaphore):
+    rows = []
+    async for page in iter_pages(session, url, params, semaphore):
+        rows.extend(page)
+    return rows
+
+async def no_pages():
+    return []
+
+async def fetch_account(session, account_id, start_date, end_date, access_token, dimensions=None):
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY_PER_ACCOUNT)
+    base_url = f"{GRAPH_BASE_URL}/{account_id}"
+
+    def dimension_pages(edge, fields):
+        extra = (dimensions or {}).get(edge, {})
+        if extra is None:
+            return no_pages()
+        return collect_pages(session, f"{base_url}/{edge}", {
+            "fields": fields,
+            "limit": PAGE_LIMIT,
+            "access_token": access_token,
+            **extra
+        }, semaphore)
+
+    campaigns, adsets, insights = await asyncio.gather(
+        dimension_pages("campaigns", CAMPAIGN_FIELDS),
+        dimension_pages("adsets", ADSET_FIELDS),
+        collect_pages(session, f"{base_url}/insights", {
+            "fields": INSIGHTS_FIELDS,
+            "time_range": json.dumps({"since": start_date, "until": end_date}),
+            "level": "campaign",
+            "limit": PAGE_LIMIT,
+            "access_token": access_token
+        }, semaphore)
+    )
+    logger.info(
+        f"{account_id}: {len(campaigns)} campaigns, {len(adsets)} adsets, "
+        f"{len(insights)} insight rows fetched."
+    )
+    return account_id, campaigns, adsets, insights
+
+async def fetch_accounts(account_ids, start_date, end_date, access_token, on_fetched=None, dimensions=None):
+    import aiohttp
+
+    async def fetch_and_report(session, account_id):
+        result = await fetch_account(
+            session, account_id, start_date, end_date, access_token, (dimensions or {}).get(account_id)
+        )
+        if on_fetched:
+            on_fetched(*result)
+        return result
+
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        return await asyncio.gather(*(fetch_and_report(session, account_id) for account_id in account_ids))
+
+# === Entry Point ===
+
+def fetch_raw_accounts(account_ids, start_date, end_date, access_token=None, on_fetched=None, dimensions=None):
+    # Returns [(account_id, campaigns, adsets, insights), ...] in account order; on_fetched is
+    # called with each account's results as soon as that account is complete. dimensions maps
+    # account ids to their campaigns/adsets requests (see DIMENSION_EDGES).
+    access_token = access_token or os.getenv("META_ACCESS_TOKEN")
+    return asyncio.run(fetch_accounts(account_ids, start_date, end_date, access_token, on_fetched, dimensions))
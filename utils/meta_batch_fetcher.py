@@ -0,0 +1,200 @@
+# === Imports ===
+import os
+import json
+import time
+import logging
+from collections import deque
+from urllib.parse import urlencode, urlparse
+from utils.metrics import count
+from utils.meta_async_fetcher import (
+    GRAPH_BASE_URL, CAMPAIGN_FIELDS, ADSET_FIELDS, INSIGHTS_FIELDS, PAGE_LIMIT, MAX_RETRIES,
+    usage_pause_seconds, backoff_seconds, retryable_error, rate_limiter
+)
+
+logger = logging.getLogger("meta_ads_etl")
+
+# === Batch Settings ===
+# The Graph API accepts at most 50 sub-requests per batch call
+BATCH_LIMIT = min(int(os.getenv("META_BATCH_SIZE", "50")), 50)
+
+# === Sync Requests ===
+
+def graph_get(url, params=None, session=None):
+    # Rate limited and retried like the async fetcher: throttling, 5xx, transient Graph API
+    # codes and network errors back off; anything else raises
+    import requests
+
+    limiter = rate_limiter("meta")
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait()
+        try:
+            response = (session or requests).get(url, params=params, timeout=300)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            payload, pause, status = {"error": {"message": str(e) or type(e).__name__}}, 0, None
+        else:
+            count(api_calls=1, bytes_read=len(response.content))
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {}
+            pause, status = usage_pause_seconds(response.headers), response.status_code
+
+        if pause:
+            logger.warning(f"Graph API usage near limit, pausing {pause:.0f}s.")
+            time.sleep(pause)
+
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if status is not None and status < 400 and not error:
+            return payload
+        if not retryable_error(status, error) or attempt == MAX_RETRIES:
+            # paging.next URLs carry the access token, so only the path is logged
+            message = (error or {}).get("message", f"HTTP {status}")
+            raise RuntimeError(f"Graph API request to {url.split('?')[0]} failed: {message}")
+        count(retries=1)
+        time.sleep(backoff_seconds(attempt))
+
+# === Account Discovery ===
+
+def normalize_account_id(account_id):
+    account_id = account_id.strip()
+    return account_id if account_id.startswith("act_") else f"act_{account_id}"
+
+def discover_account_ids(access_token=None):
+    # Active ad accounts (account_status 1) visible to the token
+    import requests
+    access_token = access_token or os.getenv("META_ACCESS_TOKEN")
+    url = f"{GRAPH_BASE_URL}/me/adaccounts"
+    params = {"fields": "id,account_status", "limit": PAGE_LIMIT, "access_token": access_token}
+    account_ids = []
+    with requests.Session() as session:
+        while url:
+            payload = graph_get(url, params, session)
+            account_ids.extend(a["id"] for a in payload.get("data", []) if a.get("account_status") == 1)
+            url = payload.get("paging", {}).get("next")
+            params = None
+    logger.info(f"Discovered {len(account_ids)} active ad accounts.")
+    return account_ids
+
+# === Batched Extraction ===
+
+def relative_url(url):
+    # Turns a paging.next URL into the version-relative form the batch endpoint expects
+    parsed = urlparse(url)
+    prefix = urlparse(GRAPH_BASE_URL).path.rstrip("/") + "/"
+    path = parsed.path[len(prefix):] if parsed.path.startswith(prefix) else parsed.path.lstrip("/")
+    return f"{path}?{parsed.query}" if parsed.query else path
+
+def initial_requests(account_id, start_date, end_date, dimensions=None):
+    # Cached edges (None in dimensions) are not requested
+    calls = []
+    for edge, fields in (("campaigns", CAMPAIGN_FIELDS), ("adsets", ADSET_FIELDS)):
+        extra = (dimensions or {}).get(edge, {})
+        if extra is not None:
+            calls.append((edge, f"{account_id}/{edge}?" + urlencode({"fields": fields, "limit": PAGE_LIMIT, **extra})))
+    return calls + [
+        ("insights", f"{account_id}/insights?" + urlencode({
+            "fields": INSIGHTS_FIELDS,
+            "time_range": json.dumps({"since": start_date, "until": end_date}),
+            "level": "campaign",
+            "limit": PAGE_LIMIT
+        }))
+    ]
+
+def fetch_raw_accounts_batched(account_ids, start_date, end_date, access_token=None, on_fetched=None, dimensions=None):
+    # Returns [(account_id, campaigns, adsets, insights), ...] in account order; on_fetched is
+    # called with each account's results as soon as its last page arrives. dimensions maps
+    # account ids to their campaigns/adsets requests (see DIMENSION_EDGES).
+    import requests
+    access_token = access_token or os.getenv("META_ACCESS_TOKEN")
+    limiter = rate_limiter("meta")
+    results = {account_id: {"campaigns": [], "adsets": [], "insights": []} for account_id in account_ids}
+    pending = deque(
+        (account_id, edge, url, 0)
+        for account_id in account_ids
+        for edge, url in initial_requests(account_id, start_date, end_date, (dimensions or {}).get(account_id))
+    )
+    # Requests still queued per account, including next pages
+    outstanding = {account_id: 0 for account_id in account_ids}
+    for account_id, _, _, _ in pending:
+        outstanding[account_id] += 1
+    batch_calls = 0
+    sub_requests = 0
+
+    def account_done(account_id):
+        outstanding[account_id] -= 1
+        if outstanding[account_id] == 0 and on_fetched:
+            edges = results[account_id]
+            on_fetched(account_id, edges["campaigns"], edges["adsets"], edges["insights"])
+
+    with requests.Session() as session:
+        while pending:
+            chunk = [pending.popleft() for _ in range(min(BATCH_LIMIT, len(pending)))]
+            limiter.wait()
+            try:
+                response = session.post(f"{GRAPH_BASE_URL}/", data={
+                    "access_token": access_token,
+                    "include_headers": "true",
+                    "batch": json.dumps([{"method": "GET", "relative_url": url} for _, _, url, _ in chunk])
+                }, timeout=300)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Treated like a 5xx: the whole chunk is retried with backoff
+                response, network_error = None, e
+            batch_calls += 1
+            sub_requests += len(chunk)
+
+            if response is not None:
+                count(api_calls=1, bytes_read=len(response.content))
+            pause = usage_pause_seconds(response.headers) if response is not None else 0
+            if response is None or response.status_code >= 400:
+                attempt = max(item[3] for item in chunk)
+                try:
+                    error = response.json().get("error", {}) if response is not None else {"message": str(network_error)}
+                except ValueError:
+                    error = {}
+                status = response.status_code if response is not None else None
+                if attempt >= MAX_RETRIES or not retryable_error(status, error):
+                    raise RuntimeError(f"Graph API batch call failed: {error.get('message', status)}")
+                pending.extendleft((a, e, u, n + 1) for a, e, u, n in reversed(chunk))
+                count(retries=len(chunk))
+                time.sleep(max(pause, backoff_seconds(attempt)))
+                continue
+
+            # Next-page URLs carry the access token, so errors only name the path
+            retry_attempt = None
+            for (account_id, edge, url, attempt), result in zip(chunk, response.json()):
+                if result is not None:
+                    body = json.loads(result.get("body") or "{}")
+                    headers = {h["name"]: h["value"] for h in result.get("headers", [])}
+                    pause = max(pause, usage_pause_seconds(headers))
+                    if result.get("code") == 200 and "error" not in body:
+                        results[account_id][edge].extend(body.get("data", []))
+                        next_url = body.get("paging", {}).get("next")
+                        if next_url:
+                            pending.append((account_id, edge, relative_url(next_url), 0))
+                            outstanding[account_id] += 1
+                        account_done(account_id)
+                        continue
+                    error = body.get("error", {})
+                    if not retryable_error(result.get("code", 500), error) or attempt >= MAX_RETRIES:
+                        raise RuntimeError(f"Graph API request {url.split('?')[0]} failed: {error.get('message', result.get('code'))}")
+                elif attempt >= MAX_RETRIES:
+                    raise RuntimeError(f"Graph API request {url.split('?')[0]} kept timing out inside batch calls")
+
+                # A null entry means the sub-request timed out inside the batch
+                pending.append((account_id, edge, url, attempt + 1))
+                count(retries=1)
+                retry_attempt = max(retry_attempt or 0, attempt)
+
+            if retry_attempt is not None:
+                pause = max(pause, backoff_seconds(retry_attempt))
+            if pause:
+                logger.warning(f"Pausing {pause:.0f}s before the next Graph API batch.")
+                time.sleep(pause)
+
+    logger.info(
+        f"{len(account_ids)} accounts fetched with {sub_requests} sub-requests in {batch_calls} batch calls."
+    )
+    return [
+        (account_id, results[account_id]["campaigns"], results[account_id]["adsets"], results[account_id]["insights"])
+        for account_id in account_ids
+    ]
@@ -0,0 +1,152 @@
+# === Imports ===
+import os
+import json
+import asyncio
+import logging
+from utils.meta_async_fetcher import (
+    GRAPH_BASE_URL, MAX_CONCURRENCY_PER_ACCOUNT, MAX_CONNECTIONS, MAX_RETRIES, PAGE_LIMIT,
+    get_json, iter_pages, backoff_seconds
+)
+from utils.streaming import prefetch
+
+logger = logging.getLogger("meta_ads_etl")
+
+# === Report Settings ===
+# Async insights report runs (POST /act_<id>/insights) for daily and ad-level
+# breakdowns that time out on the synchronous insights endpoint.
+REPORT_LEVEL = os.getenv("META_REPORT_LEVEL", "campaign").strip().lower()
+REPORT_BREAKDOWNS = [b.strip() for b in os.getenv("META_REPORT_BREAKDOWNS", "").split(",") if b.strip()]
+REPORT_TIME_INCREMENT = os.getenv("META_REPORT_TIME_INCREMENT", "1").strip()
+MAX_CONCURRENT_REPORTS = int(os.getenv("META_MAX_CONCURRENT_REPORTS", "10"))
+POLL_SECONDS = float(os.getenv("META_REPORT_POLL_SECONDS", "5"))
+REPORT_TIMEOUT_SECONDS = float(os.getenv("META_REPORT_TIMEOUT_SECONDS", "3600"))
+PREFETCH_PAGES = int(os.getenv("META_REPORT_PREFETCH_PAGES", "8"))
+
+LEVELS = ("campaign", "adset", "ad")
+LEVEL_FIELDS = {
+    "campaign": "campaign_id,campaign_name",
+    "adset": "campaign_id,campaign_name,adset_id,adset_name",
+    "ad": "campaign_id,campaign_name,adset_id,adset_name,ad_id,ad_name"
+}
+METRIC_FIELDS = "spend,reach,impressions,clicks,ctr,cpc,cpm,purchase_roas,actions"
+FINISHED_STATUSES = ("Job Completed", "Job Failed", "Job Skipped")
+
+def report_params(start_date, end_date, level, breakdowns, time_increment, access_token):
+    if level not in LEVELS:
+        raise ValueError(f"Unknown insights level '{level}'; expected one of {LEVELS}")
+    params = {
+        "fields": f"{LEVEL_FIELDS[level]},{METRIC_FIELDS}",
+        "level": level,
+        "time_range": json.dumps({"since": start_date, "until": end_date}),
+        "time_increment": time_increment,
+        "access_token": access_token
+    }
+    if breakdowns:
+        params["breakdowns"] = ",".join(breakdowns)
+    return params
+
+# === Report Runs ===
+
+async def wait_for_report(session, report_run_id, access_token, semaphore):
+    # Polls with a growing interval until the run finishes; returns its final async_status
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + REPORT_TIMEOUT_SECONDS
+    delay = POLL_SECONDS
+    while True:
+        status = await get_json(session, f"{GRAPH_BASE_URL}/{report_run_id}", {
+            "fields": "async_status,async_percent_completion",
+            "access_token": access_token
+        }, semaphore)
+        async_status = status.get("async_status")
+        # Completed runs can briefly report less than 100% before results are readable
+        if async_status in FINISHED_STATUSES and (
+            async_status != "Job Completed" or int(status.get("async_percent_completion", 100)) >= 100
+        ):
+            return async_status
+        if loop.time() >= deadline:
+            raise TimeoutError(f"Report run {report_run_id} still '{async_status}' after {REPORT_TIMEOUT_SECONDS:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, 60)
+
+async def run_report(session, account_id, params, semaphore):
+    # Submits a report run and waits for it; failed or skipped runs are resubmitted
+    for attempt in range(MAX_RETRIES + 1):
+        run = await get_json(session, f"{GRAPH_BASE_URL}/{account_id}/insights", params, semaphore, method="POST")
+        report_run_id = run["report_run_id"]
+        async_status = await wait_for_report(session, report_run_id, params["access_token"], semaphore)
+        if async_status == "Job Completed":
+            return report_run_id
+        if attempt == MAX_RETRIES:
+            raise RuntimeError(f"{account_id}: report run {report_run_id} ended with '{async_status}'")
+        delay = backoff_seconds(attempt)
+        logger.warning(f"{account_id}: report run {report_run_id} ended with '{async_status}'; resubmitting in {delay:.1f}s.")
+        await asyncio.sleep(delay)
+
+async def account_pages(session, account_id, params, report_slots, pages):
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY_PER_ACCOUNT)
+    async with report_slots:
+        report_run_id = await run_report(session, account_id, params, semaphore)
+        rows = 0
+        async for page in iter_pages(session, f"{GRAPH_BASE_URL}/{report_run_id}/insights", {
+            "limit": PAGE_LIMIT,
+            "access_token": params["access_token"]
+        }, semaphore):
+            rows += len(page)
+            await pages.put((account_id, page))
+    logger.info(f"{account_id}: report run {report_run_id} returned {rows} {params['level']} rows.")
+
+async def stream_reports(account_ids, params):
+    # Yields (account_id, rows) as result pages arrive from any account's finished run
+    import aiohttp
+
+    pages = asyncio.Queue(maxsize=PREFETCH_PAGES)
+    report_slots = asyncio.Semaphore(MAX_CONCURRENT_REPORTS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = [
+            asyncio.ensure_future(account_pages(session, account_id, params, report_slots, pages))
+            for account_id in account_ids
+        ]
+        finished = asyncio.gather(*tasks)
+        try:
+            while True:
+                getter = asyncio.ensure_future(pages.get())
+                await asyncio.wait({getter, finished}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                finished.result()
+                while not pages.empty():
+                    yield pages.get_nowait()
+                return
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if finished.done() and not finished.cancelled():
+                finished.exception()
+
+def iterate_async(agen):
+    # Drives an async generator from synchronous code on a private event loop
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
+
+# === Entry Point ===
+
+def fetch_report_pages(account_ids, start_date, end_date, level=REPORT_LEVEL, breakdowns=REPORT_BREAKDOWNS,
+                       time_increment=REPORT_TIME_INCREMENT, access_token=None):
+    # Yields (account_id, rows) per result page. The event loop runs on a background thread,
+    # so report polling and paging continue while the caller loads the previous page.
+    access_token = access_token or os.getenv("META_ACCESS_TOKEN")
+    params = report_params(start_date, end_date, level, breakdowns, time_increment, access_token)
+    return prefetch(iterate_async(stream_reports(account_ids, params)), PREFETCH_PAGES)
@@ -0,0 +1,203 @@
+# === Imports ===
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from itertools import islice
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# === Metrics Settings ===
+# Every stage writes one JSON line to ETL_METRICS_FILE (default LOG_DIR/etl_metrics.jsonl).
+# With ETL_METRICS_TEXTFILE_DIR set, per-pipeline totals for the run are also written as
+# etl_<pipeline>.prom for node_exporter's textfile collector.
+METRICS_ENABLED = os.getenv("ETL_METRICS_ENABLED", "1").strip() == "1"
+RUN_ID = os.getenv("ETL_RUN_ID") or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + f"-{os.getpid()}"
+# Spawned worker processes inherit the environment, so their records share the run id
+os.environ["ETL_RUN_ID"] = RUN_ID
+
+COUNTERS = ("rows_in", "rows_out", "rows_rejected", "bytes_read", "api_calls", "retries")
+
+logger = logging.getLogger("etl_metrics")
+
+_current = contextvars.ContextVar("etl_stage", default=None)
+_lock = threading.Lock()
+_totals = {}
+
+def metrics_file():
+    return os.getenv("ETL_METRICS_FILE") or os.path.join(os.getenv("LOG_DIR") or ".", "etl_metrics.jsonl")
+
+def peak_rss_mb():
+    # Process peak so far: ru_maxrss is KiB on Linux and bytes on macOS; Windows needs psutil
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+# === Stages ===
+# A stage is one extract, transform or load step. Stages nest: "seconds" excludes time spent
+# in stages measured inside it on the same thread (so a load that pulls rows from a timed
+# extract reports MySQL time only), while "wall_seconds" includes it.
+
+class Stage:
+    def __init__(self, pipeline, name, **labels):
+        self.pipeline = pipeline
+        self.name = name
+        self.labels = labels
+        self.seconds = 0.0
+        self.wall_seconds = 0.0
+        self.status = "ok"
+        self.counts = dict.fromkeys(COUNTERS, 0)
+
+    def add(self, **counts):
+        with _lock:
+            for key, value in counts.items():
+                self.counts[key] += value
+
+    def enter(self):
+        # Returns the frame exit() needs; counts made until then land on this stage
+        child = [0.0, threading.get_ident()]
+        return _current.get(), child, _current.set((self, child)), time.perf_counter()
+
+    def exit(self, frame):
+        parent, child, token, started = frame
+        elapsed = time.perf_counter() - started
+        _current.reset(token)
+        self.wall_seconds += elapsed
+        self.seconds += elapsed - child[0]
+        # Producers on prefetch threads overlap their consumer, so only same-thread time nests
+        if parent is not None and parent[1][1] == child[1]:
+            parent[1][0] += elapsed
+
+    @contextmanager
+    def measure(self):
+        frame = self.enter()
+        try:
+            yield self
+        except BaseException:
+            self.status = "failed"
+            raise
+        finally:
+            self.exit(frame)
+
+    def timed(self, iterable, size=None, every=1):
+        # Charges only the producer's time to this stage: the caller's work between items is
+        # not. rows_out counts items, or size(item) of each (e.g. len for batches). every > 1
+        # pulls items in groups, keeping per-row overhead small for row-at-a-time sources.
+        iterator = iter(iterable)
+        rows = 0
+        try:
+            while True:
+                frame = self.enter()
+                try:
+                    items = list(islice(iterator, every))
+                except BaseException:
+                    self.status = "failed"
+                    raise
+                finally:
+                    self.exit(frame)
+                if not items:
+                    return
+                for item in items:
+                    rows += size(item) if size else 1
+                    yield item
+        finally:
+            self.add(rows_out=rows)
+
+    def emit(self):
+        peak = peak_rss_mb()
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "run_id": RUN_ID,
+            "pipeline": self.pipeline,
+            "stage": self.name,
+            "status": self.status,
+            "seconds": round(self.seconds, 3),
+            "wall_seconds": round(self.wall_seconds, 3),
+            **self.counts,
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            **self.labels
+        }
+        if METRICS_ENABLED:
+            write_record(record)
+        return record
+
+@contextmanager
+def stage(pipeline, name, **labels):
+    record = Stage(pipeline, name, **labels)
+    try:
+        with record.measure():
+            yield record
+    finally:
+        record.emit()
+
+def timed(iterable, pipeline, name, size=None, every=1, **labels):
+    # A stage covering one iterable, emitted once it is exhausted or closed
+    record = Stage(pipeline, name, **labels)
+    try:
+        yield from record.timed(iterable, size, every)
+    finally:
+        record.emit()
+
+def count(**counts):
+    # Adds to the innermost stage active in this context (e.g. api_calls=1); no-op outside one
+    current = _current.get()
+    if current is not None:
+        current[0].add(**counts)
+
+# === Writers ===
+
+def write_record(record):
+    line = json.dumps(record, default=str)
+    with _lock:
+        try:
+            with open(metrics_file(), "a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {metrics_file()}: {e}")
+        totals = _totals.setdefault(record["pipeline"], {})
+        stage_totals = totals.setdefault(record["stage"], dict.fromkeys(("seconds", "failures", *COUNTERS), 0))
+        stage_totals["seconds"] += record["seconds"]
+        stage_totals["failures"] += record["status"] != "ok"
+        for key in COUNTERS:
+            stage_totals[key] += record[key]
+    # Worker processes only append JSON lines; the parent owns the textfile
+    if os.getenv("ETL_METRICS_TEXTFILE_DIR"):
+        import multiprocessing
+        if multiprocessing.parent_process() is None:
+            write_textfile(record["pipeline"])
+
+def write_textfile(pipeline):
+    with _lock:
+        stages = {name: dict(values) for name, values in _totals.get(pipeline, {}).items()}
+    lines = []
+    for metric in ("seconds", "failures", *COUNTERS):
+        lines.append(f"# TYPE etl_stage_{metric} gauge")
+        for name, values in stages.items():
+            lines.append(f'etl_stage_{metric}{{pipeline="{pipeline}",stage="{name}"}} {values[metric]}')
+    lines.append("# TYPE etl_peak_rss_bytes gauge")
+    lines.append(f'etl_peak_rss_bytes{{pipeline="{pipeline}"}} {int((peak_rss_mb() or 0) * 1024 * 1024)}')
+    lines.append("# TYPE etl_last_stage_timestamp_seconds gauge")
+    lines.append(f'etl_last_stage_timestamp_seconds{{pipeline="{pipeline}"}} {time.time():.0f}')
+
+    # Written beside the target and renamed so the collector never reads a partial file
+    directory = os.getenv("ETL_METRICS_TEXTFILE_DIR")
+    path = os.path.join(directory, f"etl_{pipeline}.prom")
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            handle.write("\n".join(lines) + "\n")
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics textfile {path}: {e}")
@@ -0,0 +1,59 @@
+# === Imports ===
+import os
+import mmap
+
+# === Reader Settings ===
+# Staged files are memory-mapped and parsed by pyarrow.csv in newline-aligned chunks, so
+# peak memory follows CSV_MMAP_CHUNK_BYTES rather than the file size. Chunks are split on
+# line boundaries, so quoted fields must not contain newlines (true for Shopify exports).
+CHUNK_BYTES = int(os.getenv("CSV_MMAP_CHUNK_BYTES", str(16 * 1024 * 1024)))
+
+def newline_chunks(view, start, end, chunk_bytes=CHUNK_BYTES):
+    while start < end:
+        stop = min(start + chunk_bytes, end)
+        if stop < end:
+            newline = view.find(b"\n", stop - 1, end)
+            stop = end if newline == -1 else newline + 1
+        yield start, stop
+        start = stop
+
+# === Chunk Parsing ===
+
+def string_chunks(file_path, header, start=None, end=None, chunk_bytes=CHUNK_BYTES):
+    # Yields (line_offset, data, table, clean) per chunk of the byte range [start, end)
+    # (default: everything after the header line). Every column of `table` is a string
+    # column named from `header`; line_offset + 1 is the chunk's first line within the
+    # range. `clean` is False when pyarrow skipped rows with the wrong number of fields,
+    # in which case callers re-read `data` row by row to report them.
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+
+    skipped = []
+    read_options = pyarrow_csv.ReadOptions(column_names=header)
+    convert_options = pyarrow_csv.ConvertOptions(
+        column_types={name: pyarrow.string() for name in header},
+        strings_can_be_null=False,
+        quoted_strings_can_be_null=False
+    )
+    parse_options = pyarrow_csv.ParseOptions(invalid_row_handler=lambda row: skipped.append(row) or "skip")
+
+    with open(file_path, mode='rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if start is None:
+                start = view.find(b"\n") + 1 or len(view)
+                line_offset = 1
+            else:
+                line_offset = 0
+            end = len(view) if end is None else end
+
+            for chunk_start, chunk_end in newline_chunks(view, start, end, chunk_bytes):
+                data = view[chunk_start:chunk_end]
+                skipped.clear()
+                table = pyarrow_csv.read_csv(
+                    pyarrow.py_buffer(data), read_options=read_options,
+                    parse_options=parse_options, convert_options=convert_options
+                )
+                yield line_offset, data, table, not skipped
+                line_offset += data.count(b"\n")
@@ -0,0 +1,153 @@
+# === Imports ===
+import os
+import json
+import logging
+
+logger = logging.getLogger("etl_raw_cache")
+
+# === Cache Settings ===
+# Raw API responses are kept as zstd-compressed Parquet under PROCESSED_DIR/raw_cache,
+# one file per (source, account, endpoint, date window), evicted least-recently-used
+# once the directory grows past RAW_CACHE_MAX_MB. Requires pyarrow; without it caching is skipped.
+CACHE_DIR = os.getenv("RAW_CACHE_DIR") or os.path.join(os.getenv("PROCESSED_DIR") or ".", "raw_cache")
+CACHE_ENABLED = os.getenv("RAW_CACHE_ENABLED", "1").strip() == "1"
+CACHE_MAX_BYTES = int(os.getenv("RAW_CACHE_MAX_MB", "2048")) * 1024 * 1024
+COMPRESSION = "zstd"
+
+# Nested records (e.g. Graph API objects) are stored as one JSON column so replays
+# see exactly what the API returned
+JSON_COLUMN = "_json"
+
+_pyarrow_missing = False
+
+def _pyarrow():
+    global _pyarrow_missing
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        if not _pyarrow_missing:
+            logger.warning("pyarrow is not installed; raw response caching is disabled.")
+            _pyarrow_missing = True
+        return None
+
+# === Keys and Paths ===
+
+def cache_path(source, account, endpoint, start_date, end_date):
+    account = str(account).replace(os.sep, "_")
+    return os.path.join(CACHE_DIR, source, account, endpoint, f"{start_date}_{end_date}.parquet")
+
+def list_windows(source, account=None):
+    # Returns sorted [(account, start_date, end_date, endpoints)] for cached windows
+    windows = {}
+    source_dir = os.path.join(CACHE_DIR, source)
+    if not os.path.isdir(source_dir):
+        return []
+    for cached_account in os.listdir(source_dir):
+        if account is not None and cached_account != str(account):
+            continue
+        for endpoint in os.listdir(os.path.join(source_dir, cached_account)):
+            for file_name in os.listdir(os.path.join(source_dir, cached_account, endpoint)):
+                if not file_name.endswith(".parquet"):
+                    continue
+                start_date, end_date = file_name[:-len(".parquet")].split("_", 1)
+                windows.setdefault((cached_account, start_date, end_date), set()).add(endpoint)
+    return sorted((a, s, e, endpoints) for (a, s, e), endpoints in windows.items())
+
+# === Writing ===
+
+def _to_table(pa, records, nested):
+    if nested:
+        return pa.table({JSON_COLUMN: [json.dumps(r, separators=(",", ":")) for r in records]})
+    return pa.Table.from_pylist(records)
+
+def store_records(source, account, endpoint, start_date, end_date, records, nested=True):
+    pa = _pyarrow() if CACHE_ENABLED else None
+    if pa is None:
+        return
+    path = cache_path(source, account, endpoint, start_date, end_date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        pa.parquet.write_table(_to_table(pa, records, nested), path + ".tmp", compression=COMPRESSION)
+        os.replace(path + ".tmp", path)
+    except Exception as e:
+        logger.warning(f"Could not cache {path}: {e}")
+        return
+    evict()
+
+def cache_batches(batches, source, account, endpoint, start_date, end_date, to_records, nested=False):
+    # Passes batches through unchanged while writing each one as a Parquet row group;
+    # the file only becomes visible once the stream is fully consumed.
+    pa = _pyarrow() if CACHE_ENABLED else None
+    if pa is None:
+        yield from batches
+        return
+
+    path = cache_path(source, account, endpoint, start_date, end_date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer = None
+    try:
+        for batch in batches:
+            records = to_records(batch)
+            if records:
+                table = _to_table(pa, records, nested)
+                if writer is None:
+                    writer = pa.parquet.ParquetWriter(path + ".tmp", table.schema, compression=COMPRESSION)
+                writer.write_table(table)
+            yield batch
+        if writer is None:
+            return
+        writer.close()
+        writer = None
+        os.replace(path + ".tmp", path)
+        evict()
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+
+# === Reading ===
+
+def read_batches(source, account, endpoint, start_date, end_date):
+    # Yields lists of record dicts, one per Parquet row group
+    pa = _pyarrow()
+    if pa is None:
+        raise RuntimeError("pyarrow is required to replay from the raw cache")
+    path = cache_path(source, account, endpoint, start_date, end_date)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No cached {endpoint} for {source}/{account} {start_date} to {end_date}")
+
+    # Reads count as use for LRU eviction
+    os.utime(path)
+    parquet_file = pa.parquet.ParquetFile(path)
+    for i in range(parquet_file.num_row_groups):
+        table = parquet_file.read_row_group(i)
+        if table.column_names == [JSON_COLUMN]:
+            yield [json.loads(value) for value in table.column(JSON_COLUMN).to_pylist()]
+        else:
+            yield table.to_pylist()
+
+def read_records(source, account, endpoint, start_date, end_date):
+    return [r for batch in read_batches(source, account, endpoint, start_date, end_date) for r in batch]
+
+# === Eviction ===
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    # Deletes least-recently-used files (by mtime, refreshed on read) until under max_bytes
+    files = []
+    for root, _, file_names in os.walk(CACHE_DIR):
+        for file_name in file_names:
+            if file_name.endswith(".parquet"):
+                path = os.path.join(root, file_name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        logger.info(f"Evicted {path} from raw cache.")
@@ -0,0 +1,73 @@
+# === Imports ===
+import os
+import heapq
+import hashlib
+import logging
+from array import array
+from bisect import bisect_left
+
+logger = logging.getLogger("etl_fingerprints")
+
+# === Fingerprint Settings ===
+# Each loaded row is hashed to a 64-bit fingerprint of its converted values, and every table
+# keeps the fingerprints of rows already in MySQL as one sorted array of uint64 (8 bytes per
+# row) in FINGERPRINT_DIR/<source>.<table>.fp. Rows whose fingerprint is known are dropped
+# before they reach MySQL. Delete a table's file after truncating or rebuilding that table.
+FINGERPRINT_DIR = os.getenv("ROW_FINGERPRINT_DIR") or os.path.join(os.getenv("PROCESSED_DIR") or ".", "fingerprints")
+
+def row_fingerprint(row):
+    # Values are joined as converted, so "1,234.50" and "1234.5" in two exports hash the same
+    key = "\x1f".join(map(str, row)).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+# === Fingerprint Store ===
+
+class RowFingerprints:
+    def __init__(self, source, table):
+        self.path = os.path.join(FINGERPRINT_DIR, f"{source}.{table}.fp")
+        self.known = array("Q")
+        self.new = array("Q")
+        self.skipped = 0
+        if os.path.exists(self.path):
+            with open(self.path, mode='rb') as file:
+                self.known.frombytes(file.read())
+
+    def __contains__(self, fingerprint):
+        position = bisect_left(self.known, fingerprint)
+        return position < len(self.known) and self.known[position] == fingerprint
+
+    def filter(self, rows):
+        # Yields rows not loaded before; their fingerprints are kept until save(). Each call
+        # starts over, so a load that re-reads its rows after a fallback counts them once.
+        self.new = array("Q")
+        self.skipped = 0
+        for row in rows:
+            fingerprint = row_fingerprint(row)
+            if fingerprint in self:
+                self.skipped += 1
+                continue
+            self.new.append(fingerprint)
+            yield row
+
+    def extend(self, fingerprints):
+        # Adds new fingerprints collected elsewhere (e.g. the bytes of a worker's `new`)
+        self.new.frombytes(fingerprints)
+
+    def save(self):
+        # Call only once the rows are committed; merges `new` into the sorted file
+        if not self.new:
+            return
+        merged = array("Q")
+        previous = None
+        for fingerprint in heapq.merge(self.known, sorted(self.new)):
+            if fingerprint != previous:
+                merged.append(fingerprint)
+                previous = fingerprint
+
+        os.makedirs(FINGERPRINT_DIR, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, mode='wb') as file:
+            merged.tofile(file)
+        os.replace(temp_path, self.path)
+        self.known, self.new = merged, array("Q")
+        logger.info(f"{len(merged)} row fingerprints stored in {self.path}")
@@ -0,0 +1,139 @@
+# === Imports ===
+import os
+import sqlite3
+import logging
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger("etl_state")
+
+# === State Settings ===
+# Local SQLite file shared by every pipeline; one row per (source, account, table)
+STATE_DB_PATH = os.getenv("ETL_STATE_DB") or os.path.join(os.getenv("PROCESSED_DIR") or ".", "etl_state.sqlite3")
+# The Meta and Google fact tables hold one total row per campaign and date window, so a
+# lookback window overlaps the previous one and its days would be counted twice. Keep the
+# lookback at 0 unless the ad facts are loaded at daily grain.
+LOOKBACK_DAYS = int(os.getenv("ETL_LOOKBACK_DAYS", "0"))
+INITIAL_WINDOW_DAYS = int(os.getenv("ETL_INITIAL_WINDOW_DAYS", "7"))
+
+# === State Database ===
+
+def connect_state_db(path=None):
+    conn = sqlite3.connect(path or STATE_DB_PATH, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_watermarks (
+            source TEXT NOT NULL,
+            account TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            last_loaded_date TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (source, account, table_name)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_file_manifest (
+            sha256 TEXT PRIMARY KEY,
+            file_name TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_loaded_ranges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            loaded_at TEXT NOT NULL,
+            refreshed_at TEXT
+        )
+    """)
+    return conn
+
+# === Watermarks ===
+
+def get_watermark(source, account, table):
+    with closing(connect_state_db()) as conn, conn:
+        row = conn.execute(
+            "SELECT last_loaded_date FROM etl_watermarks WHERE source = ? AND account = ? AND table_name = ?",
+            (source, str(account), table)
+        ).fetchone()
+    return row[0] if row else None
+
+def set_watermark(source, account, table, loaded_date):
+    # Never moves backwards, so re-running an older window keeps the newer mark
+    with closing(connect_state_db()) as conn, conn:
+        conn.execute("""
+            INSERT INTO etl_watermarks (source, account, table_name, last_loaded_date, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (source, account, table_name) DO UPDATE SET
+                last_loaded_date = MAX(last_loaded_date, excluded.last_loaded_date),
+                updated_at = excluded.updated_at
+        """, (source, str(account), table, str(loaded_date), datetime.now().isoformat(timespec="seconds")))
+    logger.info(f"Watermark {source}/{account}/{table} -> {loaded_date}")
+
+# === Loaded File Manifest ===
+# Content hashes of staged files that were loaded, so a re-delivered export is never loaded twice
+
+def loaded_file(sha256):
+    # Returns (file_name, table_name, loaded_at) for a known hash, else None
+    with closing(connect_state_db()) as conn, conn:
+        return conn.execute(
+            "SELECT file_name, table_name, loaded_at FROM etl_file_manifest WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+
+def record_loaded_file(sha256, file_name, table, row_count):
+    with closing(connect_state_db()) as conn, conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO etl_file_manifest (sha256, file_name, table_name, row_count, loaded_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (sha256, file_name, table, row_count, datetime.now().isoformat(timespec="seconds")))
+
+# === Loaded Date Ranges ===
+# Every committed load of a dated table logs the days it touched, so downstream aggregates
+# (scripts/attribution_mart.py) recompute just those days instead of rescanning the facts
+
+def record_loaded_range(table, start_date, end_date, row_count):
+    with closing(connect_state_db()) as conn, conn:
+        conn.execute("""
+            INSERT INTO etl_loaded_ranges (table_name, start_date, end_date, row_count, loaded_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (table, str(start_date), str(end_date), row_count, datetime.now().isoformat(timespec="seconds")))
+
+def pending_ranges(tables):
+    # (id, table_name, start_date, end_date) logged for `tables` and not refreshed yet
+    with closing(connect_state_db()) as conn, conn:
+        return conn.execute(f"""
+            SELECT id, table_name, start_date, end_date FROM etl_loaded_ranges
+            WHERE refreshed_at IS NULL AND table_name IN ({", ".join("?" * len(tables))})
+            ORDER BY id
+        """, tuple(tables)).fetchall()
+
+def mark_ranges_refreshed(ids):
+    with closing(connect_state_db()) as conn, conn:
+        conn.executemany(
+            "UPDATE etl_loaded_ranges SET refreshed_at = ? WHERE id = ?",
+            [(datetime.now().isoformat(timespec="seconds"), range_id) for range_id in ids]
+        )
+
+# === Incremental Windows ===
+
+def incremental_start(source, account, table, lookback_days=LOOKBACK_DAYS):
+    # First day to (re)load: the day after the watermark minus the lookback, or None without a watermark
+    watermark = get_watermark(source, account, table)
+    if watermark is None:
+        return None
+    start = date.fromisoformat(watermark) + timedelta(days=1) - timedelta(days=lookback_days)
+    return start.isoformat()
+
+def incremental_window(source, account, table, lookback_days=LOOKBACK_DAYS, end_date=None):
+    # Returns (start_date, end_date) as ISO strings, or None when the source is already up to date.
+    # end_date defaults to yesterday so partial days are never marked as loaded.
+    end = date.fromisoformat(end_date) if end_date else date.today() - timedelta(days=1)
+    start = incremental_start(source, account, table, lookback_days)
+    start = date.fromisoformat(start) if start else end - timedelta(days=INITIAL_WINDOW_DAYS - 1)
+    if start > end:
+        return None
+    return start.isoformat(), end.isoformat()
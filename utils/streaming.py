@@ -0,0 +1,56 @@
+# === Imports ===
+import queue
+import threading
+import contextvars
+from itertools import islice
+
+_DONE = object()
+
+# === Streaming Helpers ===
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def prefetch(iterable, depth=4):
+    # Drains `iterable` on a background thread into a queue of at most `depth` items,
+    # so the producer (e.g. an API stream) keeps running while the caller loads.
+    # Producer errors are re-raised in the caller; abandoning the generator stops the thread.
+    # The producer runs in a copy of the caller's context, so metrics stages follow it.
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(produce,), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
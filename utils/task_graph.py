@@ -0,0 +1,62 @@
+# === Imports ===
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger("etl_orchestrator")
+
+# === Task Graph ===
+# tasks maps name -> (callable, [dependency names]). A task starts once every dependency
+# succeeded; it is skipped when one failed or was skipped. Independent tasks run
+# concurrently on a thread pool, so they share the process's MySQL pools and API sessions.
+
+def check_graph(tasks):
+    for name, (_, deps) in tasks.items():
+        missing = [dep for dep in deps if dep not in tasks]
+        if missing:
+            raise ValueError(f"Task {name} depends on unknown tasks {missing}")
+
+    # Kahn's algorithm: anything left unordered sits on a cycle
+    remaining = {name: set(deps) for name, (_, deps) in tasks.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Task dependencies form a cycle: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+def run_graph(tasks, workers=4):
+    # Returns {name: (status, result or error, seconds)} with status ok, failed or skipped
+    check_graph(tasks)
+    results = {}
+    running = {}
+    pending = dict(tasks)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            for name, (func, deps) in list(pending.items()):
+                if any(results.get(dep, ("ok",))[0] != "ok" for dep in deps if dep in results):
+                    del pending[name]
+                    results[name] = ("skipped", None, 0.0)
+                    logger.warning(f"Task {name} skipped: a dependency did not succeed.")
+                elif all(dep in results for dep in deps):
+                    del pending[name]
+                    logger.info(f"Task {name} started.")
+                    running[pool.submit(func)] = (name, time.perf_counter())
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started = running.pop(future)
+                seconds = time.perf_counter() - started
+                try:
+                    results[name] = ("ok", future.result(), seconds)
+                    logger.info(f"Task {name} finished in {seconds:.1f}s.")
+                except Exception as e:
+                    results[name] = ("failed", e, seconds)
+                    logger.error(f"Task {name} failed after {seconds:.1f}s: {e}")
+
+    return results